@@ -0,0 +1,98 @@
+"""Compares loading an Arrow table through pandas with the direct Arrow ingestion.
+
+    python benchmarks/arrow_ingest.py [--rows 1000000 4000000] [--chunks 4] [--runs 3] [--device]
+
+Runs on the host by default: the target is pyblazing.arrow.HostTarget, which
+copies into numpy arrays the way DeviceTarget uploads, so what is measured is
+the host side of both paths. The pandas path is what _load_arrow_table did
+before: to_pandas() and then a contiguous copy per column, the staging copy
+cudf.DataFrame.from_pandas makes before its upload. With --device (needs cudf
+and a GPU) table_to_frame is compared against cudf.DataFrame.from_pandas.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from pyblazing import arrow
+
+
+def make_column(kind, rows, chunks):
+    rng = np.random.default_rng(0)
+    if kind == 'int64':
+        values = pa.array(rng.integers(0, 1 << 40, rows))
+    elif kind == 'float64':
+        values = pa.array(rng.random(rows))
+    elif kind == 'bool':
+        values = pa.array(rng.random(rows) > 0.5)
+    elif kind == 'timestamp':
+        values = pa.array(rng.integers(0, 1 << 40, rows)).cast(pa.timestamp('ms'))
+    elif kind == 'nulls':
+        values = pa.array(rng.random(rows), mask=rng.random(rows) < 0.1)
+    elif kind == 'string':
+        values = pa.array(np.char.mod('value-%d', rng.integers(0, 1 << 20, rows)).astype(object))
+    elif kind == 'dictionary':
+        values = pa.array(np.char.mod('key-%d', rng.integers(0, 100, rows)).astype(object)).dictionary_encode()
+    else:
+        raise ValueError(kind)
+    step = (rows + chunks - 1) // chunks
+    return pa.chunked_array([values.slice(start, step) for start in range(0, rows, step)])
+
+
+def through_pandas(table, chunk_bytes):
+    pandas_df = table.to_pandas()
+    return [np.ascontiguousarray(pandas_df[name].values) for name in pandas_df.columns]
+
+
+def direct(table, chunk_bytes):
+    return arrow.ingest_table(table, arrow.HostTarget(), chunk_bytes)
+
+
+def device_through_pandas(table, chunk_bytes):
+    import cudf
+
+    return cudf.DataFrame.from_pandas(table.to_pandas())
+
+
+def device_direct(table, chunk_bytes):
+    return arrow.table_to_frame(table, chunk_bytes)
+
+
+def measure(load, table, args):
+    times = []
+    for i in range(args.runs):
+        begin = time.perf_counter()
+        load(table, args.chunk_bytes)
+        if args.device:
+            from numba import cuda
+
+            cuda.synchronize()
+        times.append(time.perf_counter() - begin)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arrow table ingestion benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 4000000])
+    parser.add_argument('--chunks', type=int, default=4)
+    parser.add_argument('--chunk-bytes', type=int, default=arrow.DEFAULT_CHUNK_BYTES)
+    parser.add_argument('--kinds', nargs='+', default=['int64', 'float64', 'bool', 'timestamp', 'nulls', 'string', 'dictionary'])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--device', action='store_true')
+    args = parser.parse_args()
+
+    paths = (('pandas', device_through_pandas), ('direct', device_direct)) if args.device else (('pandas', through_pandas), ('direct', direct))
+    print('%-12s %10s %10s %12s %12s %8s' % ('column', 'rows', 'MB', 'pandas ms', 'direct ms', 'speedup'))
+    for kind in args.kinds:
+        for rows in args.rows:
+            table = pa.table({kind: make_column(kind, rows, args.chunks)})
+            times = [measure(load, table, args) for name, load in paths]
+            print('%-12s %10d %10.1f %12.1f %12.1f %7.1fx' % (kind, rows, table.nbytes / 2**20,
+                                                                 times[0] * 1000, times[1] * 1000, times[0] / times[1]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
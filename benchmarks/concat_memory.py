@@ -0,0 +1,147 @@
+"""Measures the peak device memory of get_all() on a result spread over several nodes.
+
+    python benchmarks/concat_memory.py [--nodes 4] [--rows 2000000] [--columns 8] [--runs 3]
+
+Needs cudf and a GPU, and no RMM pool (the pool hides allocations from the
+driver). The node results are device arrays allocated by this process: CUDA
+IPC handles can not be opened by the process that created them, so
+_open_ipc_array hands out those arrays and free_result drops them, the way the
+engine frees a result. Device memory in use is sampled every millisecond
+while the results are concatenated. The numbers are relative to what the node
+results use before the call: the peak during the call and what is still in use
+once it returns, for the concatenation pyblazing used before (open every node,
+cudf concat, node results never freed) and for the streaming one.
+"""
+import argparse
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from numba import cuda
+
+from pyblazing import api
+from pyblazing.api import gdf_dtype
+from pyblazing.timing import QueryTiming
+
+
+class LocalIpcHandle:
+
+    def close(self):
+        pass
+
+
+class LocalEngine:
+    """Node results as device arrays, keyed on a fake IPC handle."""
+
+    def __init__(self, nodes, rows, columns):
+        self.arrays = {}
+        self.tokens = {}
+        self.results = {}
+        for node in range(nodes):
+            token = node + 1
+            handles = []
+            for column in range(columns):
+                handle = ('%d-%d' % (token, column)).encode('utf-8')
+                self.arrays[handle] = cuda.to_device(np.arange(rows, dtype=np.float64))
+                handles.append(handle)
+            self.tokens[token] = handles
+            self.results[token] = (rows, handles)
+
+    def get_result(self, resultToken, interpreter_path, interpreter_port, timing=None):
+        rows, handles = self.results[resultToken]
+        return SimpleNamespace(
+            columns=[SimpleNamespace(dtype=gdf_dtype.GDF_FLOAT64, size=rows, null_count=0, data=handle, valid=b'', custrings_data=None)
+                     for handle in handles],
+            columnNames=[('column_%d' % i).encode('utf-8') for i in range(len(handles))],
+            metadata=SimpleNamespace(time=0))
+
+    def open_ipc_array(self, handle, shape, dtype, strides=None, offset=0):
+        return LocalIpcHandle(), self.arrays[handle]
+
+    def free_result(self, resultToken, interpreter_path, interpreter_port):
+        for handle in self.tokens.pop(resultToken, []):
+            del self.arrays[handle]
+
+
+class MemorySampler:
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def used(self):
+        free, total = cuda.current_context().get_memory_info()
+        return total - free
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.used())
+            time.sleep(0.001)
+
+    def __enter__(self):
+        self.peak = self.used()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.used())
+
+
+# the concatenation before the streaming one, kept to compare against
+def legacy_concat(entry_list, client, timing):
+    from cudf.multi import concat
+
+    return concat([api._open_node_result(entry, timing) for entry in entry_list], ignore_index=True)
+
+
+def measure(concat, args):
+    engine = LocalEngine(args.nodes, args.rows, args.columns)
+    client = SimpleNamespace(free_result=engine.free_result, _pool=SimpleNamespace(max_size=8))
+    tokens = [api.DMLResult(token, SimpleNamespace(path=b'127.0.0.1', port=9000 + token), 0) for token in engine.results]
+
+    with mock.patch.object(api, '_private_get_result_metadata', side_effect=engine.get_result), \
+         mock.patch.object(api, '_open_ipc_array', side_effect=engine.open_ipc_array), \
+         mock.patch.object(api, '_get_client', return_value=client):
+        timing = QueryTiming()
+        entries = api._get_node_results(tokens, time.time(), timing, open_columns=False)
+        cuda.synchronize()
+        with MemorySampler() as sampler:
+            start = sampler.peak
+            begin = time.perf_counter()
+            gdf = concat(entries, client, timing)
+            cuda.synchronize()
+            seconds = time.perf_counter() - begin
+        retained = sampler.used() - start
+        assert len(gdf) == args.nodes * args.rows
+    del gdf, entries, engine
+    return sampler.peak - start, retained, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='multi node result concatenation peak memory benchmark')
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    result_bytes = args.nodes * args.rows * args.columns * 8
+    print('result: %d nodes x %d rows x %d float64 columns = %.1f MB' % (args.nodes, args.rows, args.columns, result_bytes / 2**20))
+    print('%-10s %14s %14s %10s' % ('concat', 'peak MB', 'retained MB', 'ms'))
+    for name, concat in (('legacy', legacy_concat), ('streaming', api._concat_node_results)):
+        runs = [measure(concat, args) for i in range(args.runs)]
+        peak = max(run[0] for run in runs)
+        retained = max(run[1] for run in runs)
+        seconds = min(run[2] for run in runs)
+        print('%-10s %14.1f %14.1f %10.1f' % (name, peak / 2**20, retained / 2**20, seconds * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
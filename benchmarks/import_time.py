@@ -0,0 +1,59 @@
+"""Measures how long `import blazingsql` takes in a fresh interpreter.
+
+    python benchmarks/import_time.py [--runs 10] [--max-seconds 0.5]
+
+Exits with 1 when the median import time is over --max-seconds or when the
+import loaded one of the heavy modules that must only be imported on first
+use (see HEAVY_MODULES).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('cudf', 'nvstrings', 'numba', 'pandas', 'pyarrow', 'dask', 'blazingdb', 'pyblazing.api')
+
+_probe = '''
+import json, sys, time
+start = time.perf_counter()
+import blazingsql
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': [name for name in %r if name in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+
+def measure(runs):
+    seconds = []
+    modules = set()
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', _probe])
+        sample = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        seconds.append(sample['seconds'])
+        modules.update(sample['modules'])
+    return seconds, sorted(modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import blazingsql benchmark')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args()
+
+    seconds, modules = measure(args.runs)
+    median = statistics.median(seconds)
+    print('import blazingsql: median %.1f ms, min %.1f ms, max %.1f ms (%d runs)' %
+          (median * 1000, min(seconds) * 1000, max(seconds) * 1000, args.runs))
+
+    failed = False
+    if modules:
+        print('ERROR: heavy modules imported eagerly: ' + ', '.join(modules))
+        failed = True
+    if args.max_seconds is not None and median > args.max_seconds:
+        print('ERROR: median import time is over %.1f ms' % (args.max_seconds * 1000))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Measures how long turning a GetResult response into a cudf DataFrame takes for wide results.
+
+    python benchmarks/materialize_wide.py [--columns 10 100 1000 4000] [--rows 1000] [--runs 5]
+
+Needs cudf and a GPU. CUDA IPC handles can not be opened by the process that
+created them, so _open_ipc_array is replaced by a plain device allocation: the
+numbers are the per column Python overhead of the materializer (dtype
+dispatch, column build and DataFrame assembly), not the cost of the IPC
+opens. The column by column loop pyblazing used before is measured too, as a
+reference. Both assemble the DataFrame one column at a time (the DataFrame
+constructor of this cudf adds its columns one by one), so the difference is
+the dtype dispatch and column build, not the assembly.
+"""
+import argparse
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from numba import cuda
+
+from pyblazing import api
+from pyblazing.api import gdf_dtype
+
+DTYPES = (gdf_dtype.GDF_INT64, gdf_dtype.GDF_FLOAT64, gdf_dtype.GDF_INT32, gdf_dtype.GDF_DATE64)
+
+
+class LocalIpcHandle:
+
+    def close(self):
+        pass
+
+
+def local_ipc_array(handle, shape, dtype, strides=None, offset=0):
+    return LocalIpcHandle(), cuda.device_array(shape, dtype=dtype)
+
+
+def make_result_set(columns, rows):
+    return SimpleNamespace(
+        columns=[SimpleNamespace(dtype=DTYPES[i % len(DTYPES)], size=rows, null_count=0, data=bytes(64), valid=b'', custrings_data=None)
+                 for i in range(columns)],
+        columnNames=[('column_%d' % i).encode('utf-8') for i in range(columns)])
+
+
+# the materializer before the table driven one, kept to compare against
+def legacy_open_result_columns(resultSet):
+    from cudf import DataFrame
+    from cudf.dataframe.buffer import Buffer
+    from cudf.dataframe.columnops import build_column
+
+    gdf_columns = []
+    ipchandles = []
+    for c in resultSet.columns:
+        if c.dtype == gdf_dtype.GDF_DATE32:
+            c.dtype = gdf_dtype.GDF_INT32
+        if c.dtype == gdf_dtype.GDF_DATE64:
+            np_dtype = api.np.dtype('datetime64[ms]')
+        else:
+            np_dtype = api.gdf_to_np_dtype(c.dtype)
+        ipch_data, data_ptr = api._open_ipc_array(c.data, shape=c.size, dtype=np_dtype)
+        ipchandles.append(ipch_data)
+        gdf_columns.append(build_column(Buffer(data_ptr), np_dtype))
+
+    gdf = DataFrame()
+    for k, v in zip(resultSet.columnNames, gdf_columns):
+        gdf[k.decode("utf-8")] = v
+    resultSet.columns = gdf
+    return ipchandles
+
+
+def measure(materialize, columns, rows, runs):
+    seconds = []
+    for i in range(runs):
+        resultSet = make_result_set(columns, rows)
+        start = time.perf_counter()
+        materialize(resultSet)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='result materializer benchmark')
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 100, 1000, 4000])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with mock.patch.object(api, '_open_ipc_array', side_effect=local_ipc_array):
+        # warm up cudf, numba and the column readers
+        api._open_result_columns(make_result_set(4, args.rows))
+
+        print('%8s %14s %14s %8s' % ('columns', 'legacy ms', 'current ms', 'speedup'))
+        for columns in args.columns:
+            legacy = measure(legacy_open_result_columns, columns, args.rows, args.runs)
+            current = measure(api._open_result_columns, columns, args.rows, args.runs)
+            print('%8d %14.2f %14.2f %7.2fx' % (columns, legacy * 1000, current * 1000, legacy / current))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
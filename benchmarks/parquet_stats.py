@@ -0,0 +1,94 @@
+"""Builds the parquet statistics index of a many file dataset and prunes queries with it.
+
+    python benchmarks/parquet_stats.py [--files 5000] [--rows 2000] [--row-groups 4] [--workers 1 16]
+
+Runs on the CPU. Writes --files small parquet files (an increasing id, a date
+per file and a random float) to a temporary directory, then reports how long
+building the index takes cold (every footer read) with each number of worker
+threads, warm from the on-disk cache in a new index, and how many files and
+row groups a few queries keep.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pyblazing.apiv2.listing import LocalLister
+from pyblazing.apiv2.partitions import column_filters
+from pyblazing.apiv2.statistics import StatisticsIndex
+
+QUERIES = [
+    "select * from t where id = 123456",
+    "select * from t where id between 1000000 and 1100000",
+    "select * from t where day >= DATE '2026-09-01'",
+    "select * from t where score > 0.5",
+]
+
+
+def write_dataset(directory, args):
+    rng = np.random.default_rng(0)
+    paths = []
+    first_day = datetime.date(2026, 10, 1) - datetime.timedelta(days=args.files // 10)
+    for i in range(args.files):
+        table = pa.table({'id': pa.array(np.arange(i * args.rows, (i + 1) * args.rows)),
+                          'day': pa.array([first_day + datetime.timedelta(days=i // 10)] * args.rows),
+                          'score': pa.array(rng.random(args.rows))})
+        path = os.path.join(directory, 'part-%05d.parquet' % i)
+        pq.write_table(table, path, row_group_size=max(args.rows // args.row_groups, 1))
+        paths.append(path)
+    return paths
+
+
+def build(paths, cache_dir, workers):
+    lister = LocalLister()
+    index = StatisticsIndex(cache_dir, max_workers=workers)
+    begin = time.perf_counter()
+    statistics = index.build(paths, lambda path: (lister, path))
+    return statistics, time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parquet statistics index benchmark')
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--row-groups', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 16])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        begin = time.perf_counter()
+        paths = write_dataset(directory, args)
+        print('wrote %d files in %.1f s' % (len(paths), time.perf_counter() - begin))
+
+        for workers in args.workers:
+            cache_dir = tempfile.mkdtemp(dir=directory)
+            statistics, seconds = build(paths, cache_dir, workers)
+            print('cold index, %2d workers: %8.1f ms' % (workers, seconds * 1000))
+        statistics, seconds = build(paths, cache_dir, args.workers[-1])
+        print('warm index (disk cache): %8.1f ms' % (seconds * 1000))
+
+        print('%-55s %8s %12s %8s' % ('query', 'files', 'row groups', 'ms'))
+        total_row_groups = len(paths) * args.row_groups
+        for sql in QUERIES:
+            begin = time.perf_counter()
+            pruned = column_filters(sql, 't', statistics)
+            row_groups = statistics.row_groups(pruned.filters)
+            seconds = time.perf_counter() - begin
+            kept = sum(len(indices) for indices in row_groups.values())
+            print('%-55s %8s %12s %8.1f' % (sql[:55], '%d/%d' % (len(row_groups), len(paths)),
+                                            '%d/%d' % (kept, total_row_groups), seconds * 1000))
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
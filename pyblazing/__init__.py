@@ -1,19 +1,53 @@
-from .api import run_query_get_token
-from .api import convert_to_dask
-from .api import run_query_get_results
-from .api import run_query_get_concat_results
-from .api import register_file_system
-from .api import deregister_file_system
-from .api  import FileSystemType, DriverType, EncryptionType
-from .api import SchemaFrom
-from .api import create_table
-
-from .api import ResultSetHandle
-from .api import _get_client
-from .api import gdf_dtype
-from .api import get_dtype_values
-from .api import get_np_dtype_to_gdf_dtype
-from .api import SetupOrchestratorConnection
+# pyblazing.api is imported when one of its names is first used (the first
+# query, table or filesystem registration), so `import pyblazing` stays cheap
+_api_names = (
+    'run_query_get_token',
+    'run_query_get_planned_token',
+    'convert_to_dask',
+    'dask_result_meta',
+    'run_query_get_results',
+    'run_query_get_concat_results',
+    'iter_query_batches',
+    'result_batches',
+    'iter_query_arrow_batches',
+    'frame_arrow_batches',
+    'write_arrow_stream',
+    'run_query_get_token_async',
+    'run_query_get_results_async',
+    'register_file_system',
+    'deregister_file_system',
+    'FileSystemType', 'DriverType', 'EncryptionType',
+    'SchemaFrom',
+    'create_table',
+    'drop_table',
+
+    'ResultSetHandle',
+    '_get_client',
+    '_get_async_client',
+    'AsyncPyConnector',
+    'gdf_dtype',
+    'get_dtype_values',
+    'get_np_dtype_to_gdf_dtype',
+    'SetupOrchestratorConnection',
+    'service_probe_requests',
+)
+
+
+def __getattr__(name):
+    if name not in _api_names:
+        raise AttributeError("module 'pyblazing' has no attribute '%s'" % name)
+    from . import api
+    value = getattr(api, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_api_names))
+
 
 from .apiv2.context import make_default_orc_arg
 from .apiv2.context import make_default_csv_arg
+from pyblazing.apiv2 import context 
+
+BlazingContext = context.BlazingContext
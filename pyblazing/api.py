@@ -1,8 +1,7 @@
-import cudf as gd
-
 import blazingdb.protocol
 import blazingdb.protocol.interpreter
 import blazingdb.protocol.orchestrator
+import blazingdb.protocol.calcite
 import blazingdb.protocol.transport.channel
 from blazingdb.protocol.errors import Error
 from blazingdb.protocol.calcite.errors import SyntaxError
@@ -12,39 +11,24 @@ from blazingdb.protocol.interpreter import InterpreterMessage
 from blazingdb.protocol.orchestrator import OrchestratorMessageType
 from blazingdb.protocol.gdf import gdf_columnSchema
 
-import pyarrow as pa
-from cudf.bindings.cudf_cpp import *
-
-from cudf.dataframe.string import StringColumn
-from cudf import DataFrame
-from cudf.dataframe.buffer import Buffer
-from cudf.dataframe.columnops import build_column
-from cudf.utils.utils import calc_chunk_size, mask_dtype, mask_bitsize
-
 import numpy as np
-import pandas as pd
 
 import time
-import nvstrings
-from collections import OrderedDict
-
-# NDarray device helper
-from numba import cuda
-from numba.cuda.cudadrv import driver, devices
-require_context = devices.require_context
-current_context = devices.get_context
-gpus = devices.gpus
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict, namedtuple
+from types import SimpleNamespace
 
-#Todo Rommel Percy : avoid using global variables, i.e. move these properties with the free function _to_table_group
-dataColumnTokens = {}
-validColumnTokens = {}
+from .transport import ConnectionPool, AsyncConnectionPool
+from .timing import QueryTiming
+from .tokens import ColumnTokenRegistry, DATA, VALID
+from .release import ResultReaper
 
 
 # connection_path is a ip/host when tcp and can be unix socket when ipc
 def _send_request(connection_path, connection_port, requestBuffer):
-    connection = blazingdb.protocol.TcpSocketConnection(connection_path, connection_port)
-    client = blazingdb.protocol.Client(connection)
-    return client.send(requestBuffer)
+    return _get_client()._send_request(connection_path, connection_port, requestBuffer)
 
 class Singleton(type):
     _instances = {}
@@ -58,17 +42,66 @@ class PyConnector(metaclass=Singleton):
     def __init__(self):
         self._orchestrator_path = '127.0.0.1'
         self._orchestrator_port = 8889
+        self._algebra_path = '127.0.0.1'
+        self._algebra_port = 8890
         self._accessToken = None
+        # node connection of the engine when the orchestrator answered the last query with a single node, see
+        # single_engine
+        self._single_engine = None
+        self._pool = ConnectionPool()
+        # result column buffer -> RAL column token, see pyblazing.tokens
+        self._column_tokens = ColumnTokenRegistry()
+        # live results, freed on a background thread when released, see pyblazing.release
+        self._results = ResultReaper(self.free_result)
+        # copies sent to dask workers use the session of the client, they do not close it
+        self._owns_session = True
 
     def __del__(self):
-        self.close_connection()
+        if self._owns_session:
+            self.close_connection()
+        else:
+            self._pool.close_all()
+
+    # dask workers get the endpoints and the session of the connector, the pool, the token registry and
+    # the reaper hold locks and threads of this process, a copy builds its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_pool', '_column_tokens', '_results'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pool = ConnectionPool()
+        self._column_tokens = ColumnTokenRegistry()
+        self._results = ResultReaper(self.free_result)
+        self._owns_session = False
 
+    def configure_pool(self, **kwargs):
+        self._pool.configure(**kwargs)
+
+    def pool_stats(self):
+        return self._pool.stats()
+
+    def column_token_stats(self):
+        return self._column_tokens.stats()
+
+    def live_results(self):
+        return self._results.live()
+
+    # connections are kept open in the pool and reused for the next request to the same host and port
+    def _send_request(self, connection_path, connection_port, requestBuffer):
+        return self._pool.send(connection_path, connection_port, requestBuffer)
 
     def connect(self, orchestrator_path, orchestrator_port):
         # TODO find a way to print only for debug mode (add verbose arg)
         #print("open connection")
         self._orchestrator_path = orchestrator_path
         self._orchestrator_port = orchestrator_port
+        # the algebra service a context starts runs on the orchestrator host, see run_dml_plan
+        if not orchestrator_path.startswith('/'):
+            self._algebra_path = orchestrator_path
+        self._single_engine = None
 
         if self._accessToken is not None:
             print("Already connected to the Orchestrator")
@@ -79,7 +112,7 @@ class PyConnector(metaclass=Singleton):
         requestBuffer = blazingdb.protocol.transport.channel.MakeAuthRequestBuffer(
             OrchestratorMessageType.AuthOpen, authSchema)
 
-        responseBuffer = _send_request(self._orchestrator_path,
+        responseBuffer = self._send_request(self._orchestrator_path,
             self._orchestrator_port, requestBuffer)
 
         response = blazingdb.protocol.transport.channel.ResponseSchema.From(
@@ -104,7 +137,7 @@ class PyConnector(metaclass=Singleton):
         requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(
             OrchestratorMessageType.AuthClose, self._accessToken, authSchema)
 
-        responseBuffer = _send_request(
+        responseBuffer = self._send_request(
             self._orchestrator_path, self._orchestrator_port, requestBuffer)
         response = blazingdb.protocol.transport.channel.ResponseSchema.From(
             responseBuffer)
@@ -116,51 +149,20 @@ class PyConnector(metaclass=Singleton):
 
         print('Successfully disconnected')
         self._accessToken = None
+        self._pool.close_all()
 
     def is_connected(self):
         return self._accessToken is not None
 
     def run_ddl_create_table(self, tableName, columnNames, columnTypes, dbName, schemaType, blazing_table, files, resultToken, csv_args, jsonLines, orc_args):
 
-        dmlRequestSchema = blazingdb.protocol.orchestrator.BuildDDLCreateTableRequestSchema(name=tableName,
-                                                                                       dbName=dbName,
-                                                                                       schemaType=schemaType,
-                                                                                       gdf=blazing_table,
-                                                                                       files=files,
-                                                                                       resultToken=resultToken,
-                                                                                       columnNames=columnNames,
-                                                                                       columnTypes=columnTypes,
-                                                                                       csvDelimiter=csv_args.delimiter,
-                                                                                       csvLineTerminator=csv_args.lineterminator,
-                                                                                       csvSkipRows=csv_args.skiprows,
-                                                                                       csvHeader=csv_args.header,
-                                                                                       csvNrows=csv_args.nrows,
-                                                                                       csvSkipinitialspace=csv_args.skipinitialspace,
-                                                                                       csvDelimWhitespace=csv_args.delim_whitespace,
-                                                                                       csvSkipBlankLines=csv_args.skip_blank_lines,
-                                                                                       csvQuotechar=csv_args.quotechar,
-                                                                                       csvQuoting=csv_args.quoting,
-                                                                                       csvDoublequote=csv_args.doublequote,
-                                                                                       csvDecimal=csv_args.decimal,
-                                                                                       csvSkipfooter=csv_args.skipfooter,
-                                                                                       csvNaFilter=csv_args.na_filter,
-                                                                                       csvKeepDefaultNa=csv_args.keep_default_na,
-                                                                                       csvDayfirst=csv_args.dayfirst,
-                                                                                       csvThousands=csv_args.thousands,
-                                                                                       csvComment=csv_args.comment,
-                                                                                       csvTrueValues=csv_args.true_values,
-                                                                                       csvFalseValues=csv_args.false_values,
-                                                                                       csvNaValues=csv_args.na_values,
-                                                                                       jsonLines=jsonLines,
-                                                                                       orcStripe=orc_args.stripe,
-                                                                                       orcSkipRows=orc_args.skip_rows,
-                                                                                       orcNumRows=orc_args.num_rows,
-                                                                                       orcUseIndex=orc_args.use_index)
+        dmlRequestSchema = blazingdb.protocol.orchestrator.BuildDDLCreateTableRequestSchema(**_table_fields(tableName, columnNames, columnTypes,
+                                                                                       dbName, schemaType, blazing_table, files, resultToken, csv_args, jsonLines, orc_args))
 
         requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(OrchestratorMessageType.DDL_CREATE_TABLE,
                                                                                self._accessToken, dmlRequestSchema)
 
-        responseBuffer = _send_request(
+        responseBuffer = self._send_request(
             self._orchestrator_path, self._orchestrator_port, requestBuffer)
         response = blazingdb.protocol.transport.channel.ResponseSchema.From(
             responseBuffer)
@@ -172,11 +174,29 @@ class PyConnector(metaclass=Singleton):
         return response.status
 
     def run_dml_query_token(self, query, tableGroup):
-        dmlRequestSchema = blazingdb.protocol.io.BuildFileSystemDMLRequestSchema(query, tableGroup)
-        requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(OrchestratorMessageType.DML_FS,
-                                                                               self._accessToken, dmlRequestSchema)
-        responseBuffer = _send_request(
+        requestBuffer = _make_dml_query_request(self._accessToken, query, tableGroup)
+        responseBuffer = self._send_request(
             self._orchestrator_path, self._orchestrator_port, requestBuffer)
+        dist_token = _parse_dml_query_response(responseBuffer)
+        self._count_engines(dist_token)
+        return dist_token
+
+    # the orchestrator answers a query with the result of every engine of the cluster
+    def _count_engines(self, dist_token):
+        self._single_engine = dist_token[0].nodeConnection if len(dist_token) == 1 else None
+
+    # the node connection of the engine when the cluster has only one as far as the last query through the
+    # orchestrator tells, None when it has more or no query told yet
+    def single_engine(self):
+        return self._single_engine
+
+    # asks the algebra service for the logical plan of a query, returns the plan and the planning time
+    def run_dml_plan(self, query):
+        dmlRequestSchema = blazingdb.protocol.calcite.DMLRequestSchema(query=query)
+        requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(blazingdb.protocol.calcite.MessageType.DML,
+                                                                               self._accessToken, dmlRequestSchema)
+        responseBuffer = self._send_request(
+            self._algebra_path, self._algebra_port, requestBuffer)
         response = blazingdb.protocol.transport.channel.ResponseSchema.From(
             responseBuffer)
         if response.status == Status.Error:
@@ -188,9 +208,29 @@ class PyConnector(metaclass=Singleton):
                raise ValueError(errorResponse.errors.decode('utf-8'))
             raise RuntimeError(errorResponse.errors.decode('utf-8'))
 
-        distributed_response = blazingdb.protocol.orchestrator.DMLDistributedResponseSchema.From(response.payload)
+        dmlResponse = blazingdb.protocol.calcite.DMLResponseSchema.From(response.payload)
+        return dmlResponse.logicalPlan, dmlResponse.time
 
-        return list(item for item in distributed_response.responses)
+    # executes an already planned query on engine (a node connection, see single_engine), skipping the
+    # orchestrator and the algebra service. tableGroup has the tables of the query, the engine can not look
+    # them up in the orchestrator. Only valid when there is a single engine
+    def run_dml_logical_plan_token(self, logicalPlan, tableGroup, calciteTime, engine):
+        dmlRequestSchema = blazingdb.protocol.io.BuildFileSystemDMLRequestSchema(logicalPlan, tableGroup)
+        requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(InterpreterMessage.ExecutePlanFileSystem,
+                                                                               self._accessToken, dmlRequestSchema)
+        responseBuffer = self._send_request(
+            engine.path.decode('utf8'), engine.port, requestBuffer)
+        response = blazingdb.protocol.transport.channel.ResponseSchema.From(
+            responseBuffer)
+        if response.status == Status.Error:
+            errorResponse = blazingdb.protocol.transport.channel.ResponseErrorSchema.From(
+                response.payload)
+            raise RuntimeError(errorResponse.errors.decode('utf-8'))
+
+        executePlanResponse = blazingdb.protocol.interpreter.ExecutePlanResponseSchema.From(response.payload)
+
+        # same shape as the entries of a DMLDistributedResponse
+        return [DMLResult(executePlanResponse.resultToken, executePlanResponse.nodeConnection, calciteTime)]
 
 
     def run_ddl_drop_table(self, tableName, dbName):
@@ -201,7 +241,7 @@ class PyConnector(metaclass=Singleton):
             name=tableName, dbName=dbName)
         requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(OrchestratorMessageType.DDL_DROP_TABLE,
                                                                                self._accessToken, dmlRequestSchema)
-        responseBuffer = _send_request(
+        responseBuffer = self._send_request(
             self._orchestrator_path, self._orchestrator_port, requestBuffer)
         response = blazingdb.protocol.transport.channel.ResponseSchema.From(
             responseBuffer)
@@ -219,70 +259,223 @@ class PyConnector(metaclass=Singleton):
 
 
     def free_result(self, result_token, interpreter_path, interpreter_port):
-        getResultRequest = blazingdb.protocol.interpreter.GetResultRequestSchema(
-            resultToken=result_token)
+        requestBuffer = _make_result_request(InterpreterMessage.FreeResult, self._accessToken, result_token)
 
-        requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(
-            InterpreterMessage.FreeResult, self._accessToken, getResultRequest)
-
-        responseBuffer = _send_request(
+        responseBuffer = self._send_request(
             interpreter_path, interpreter_port, requestBuffer)
 
-        response = blazingdb.protocol.transport.channel.ResponseSchema.From(
-            responseBuffer)
-
-        if response.status == Status.Error:
-            raise ValueError('Error status')
+        _parse_free_result_response(responseBuffer)
 
         # TODO find a way to print only for debug mode (add verbose arg)
         #print('free result OK!')
 
     def _get_result(self, result_token, interpreter_path, interpreter_port):
-        getResultRequest = blazingdb.protocol.interpreter.GetResultRequestSchema(
-            resultToken=result_token)
-
-        requestBuffer = blazingdb.protocol.transport.channel.MakeRequestBuffer(
-            InterpreterMessage.GetResult, self._accessToken, getResultRequest)
+        requestBuffer = _make_result_request(InterpreterMessage.GetResult, self._accessToken, result_token)
 
-        responseBuffer = _send_request(
+        responseBuffer = self._send_request(
             interpreter_path, interpreter_port, requestBuffer)
 
-        response = blazingdb.protocol.transport.channel.ResponseSchema.From(
-            responseBuffer)
+        return _parse_get_result_response(responseBuffer)
+
+
+# The request builders and response parsers below are shared by PyConnector and AsyncPyConnector
+
+# the fields of a table in the DDL create table request and in the tables of a table group
+def _table_fields(tableName, columnNames, columnTypes, dbName, schemaType, blazing_table, files, resultToken, csv_args, jsonLines, orc_args):
+    return OrderedDict([
+        ('name', tableName),
+        ('dbName', dbName),
+        ('schemaType', schemaType),
+        ('gdf', blazing_table),
+        ('files', files),
+        ('resultToken', resultToken),
+        ('columnNames', columnNames),
+        ('columnTypes', columnTypes),
+        ('csvDelimiter', csv_args.delimiter),
+        ('csvLineTerminator', csv_args.lineterminator),
+        ('csvSkipRows', csv_args.skiprows),
+        ('csvHeader', csv_args.header),
+        ('csvNrows', csv_args.nrows),
+        ('csvSkipinitialspace', csv_args.skipinitialspace),
+        ('csvDelimWhitespace', csv_args.delim_whitespace),
+        ('csvSkipBlankLines', csv_args.skip_blank_lines),
+        ('csvQuotechar', csv_args.quotechar),
+        ('csvQuoting', csv_args.quoting),
+        ('csvDoublequote', csv_args.doublequote),
+        ('csvDecimal', csv_args.decimal),
+        ('csvSkipfooter', csv_args.skipfooter),
+        ('csvNaFilter', csv_args.na_filter),
+        ('csvKeepDefaultNa', csv_args.keep_default_na),
+        ('csvDayfirst', csv_args.dayfirst),
+        ('csvThousands', csv_args.thousands),
+        ('csvComment', csv_args.comment),
+        ('csvTrueValues', csv_args.true_values),
+        ('csvFalseValues', csv_args.false_values),
+        ('csvNaValues', csv_args.na_values),
+        ('jsonLines', jsonLines),
+        ('orcStripe', orc_args.stripe),
+        ('orcSkipRows', orc_args.skip_rows),
+        ('orcNumRows', orc_args.num_rows),
+        ('orcUseIndex', orc_args.use_index)
+    ])
+
+def _make_dml_query_request(accessToken, query, tableGroup):
+    dmlRequestSchema = blazingdb.protocol.io.BuildFileSystemDMLRequestSchema(query, tableGroup)
+    return blazingdb.protocol.transport.channel.MakeRequestBuffer(OrchestratorMessageType.DML_FS,
+                                                                  accessToken, dmlRequestSchema)
+
+def _parse_dml_query_response(responseBuffer):
+    response = blazingdb.protocol.transport.channel.ResponseSchema.From(
+        responseBuffer)
+    if response.status == Status.Error:
+        errorResponse = blazingdb.protocol.transport.channel.ResponseErrorSchema.From(
+            response.payload)
+        if b'SqlSyntaxException' in errorResponse.errors:
+            raise SyntaxError(errorResponse.errors.decode('utf-8'))
+        elif b'SqlValidationException' in errorResponse.errors:
+           raise ValueError(errorResponse.errors.decode('utf-8'))
+        raise RuntimeError(errorResponse.errors.decode('utf-8'))
+
+    distributed_response = blazingdb.protocol.orchestrator.DMLDistributedResponseSchema.From(response.payload)
+
+    return list(item for item in distributed_response.responses)
+
+# GetResult and FreeResult share the same request schema
+def _make_result_request(messageType, accessToken, result_token):
+    getResultRequest = blazingdb.protocol.interpreter.GetResultRequestSchema(
+        resultToken=result_token)
+
+    return blazingdb.protocol.transport.channel.MakeRequestBuffer(
+        messageType, accessToken, getResultRequest)
+
+# requests a starting service answers once it handles requests, see pyblazing.transport.probe. None of them
+# does any work: the algebra service fails to parse an empty query, the orchestrator closes a session that
+# was never opened and the engine frees a result it does not have
+def service_probe_requests():
+    noSession = 0
+    return {
+        'algebra': blazingdb.protocol.transport.channel.MakeRequestBuffer(blazingdb.protocol.calcite.MessageType.DML,
+            noSession, blazingdb.protocol.calcite.DMLRequestSchema(query='')),
+        'orchestrator': blazingdb.protocol.transport.channel.MakeRequestBuffer(OrchestratorMessageType.AuthClose,
+            noSession, blazingdb.protocol.orchestrator.AuthRequestSchema()),
+        'engine': _make_result_request(InterpreterMessage.FreeResult, noSession, 0),
+    }
 
-        if response.status == Status.Error:
-            raise ValueError('Error status')
+def _parse_free_result_response(responseBuffer):
+    response = blazingdb.protocol.transport.channel.ResponseSchema.From(
+        responseBuffer)
 
-        queryResult = blazingdb.protocol.interpreter.GetQueryResultFrom(
-            response.payload)
+    if response.status == Status.Error:
+        raise ValueError('Error status')
+
+def _parse_get_result_response(responseBuffer):
+    response = blazingdb.protocol.transport.channel.ResponseSchema.From(
+        responseBuffer)
+
+    if response.status == Status.Error:
+        raise ValueError('Error status')
+
+    queryResult = blazingdb.protocol.interpreter.GetQueryResultFrom(
+        response.payload)
+
+    if queryResult.metadata.status.decode() == "Error":
+        raise RuntimeError(queryResult.metadata.message.decode('utf-8'))
+
+    return queryResult
+
+
+class AsyncPyConnector:
+    """asyncio counterpart of PyConnector for the query path.
+
+    It shares the session of the connected PyConnector and sends requests over
+    non-blocking sockets, so many queries can be in flight on one event loop.
+    An instance is bound to the event loop it was created on.
+    """
+
+    def __init__(self, connector, pool=None):
+        self._connector = connector
+        self._pool = pool if pool is not None else AsyncConnectionPool()
 
-        if queryResult.metadata.status.decode() == "Error":
-            raise RuntimeError(queryResult.metadata.message.decode('utf-8'))
+    # the session is read from the PyConnector on every request, it changes when it reconnects
+    @property
+    def _orchestrator_path(self):
+        return self._connector._orchestrator_path
 
-        return queryResult
+    @property
+    def _orchestrator_port(self):
+        return self._connector._orchestrator_port
+
+    @property
+    def _accessToken(self):
+        return self._connector._accessToken
+
+    async def _send_request(self, connection_path, connection_port, requestBuffer):
+        return await self._pool.send(connection_path, connection_port, requestBuffer)
+
+    async def run_dml_query_token(self, query, tableGroup):
+        requestBuffer = _make_dml_query_request(self._accessToken, query, tableGroup)
+        responseBuffer = await self._send_request(
+            self._orchestrator_path, self._orchestrator_port, requestBuffer)
+        dist_token = _parse_dml_query_response(responseBuffer)
+        self._connector._count_engines(dist_token)
+        return dist_token
+
+    async def free_result(self, result_token, interpreter_path, interpreter_port):
+        requestBuffer = _make_result_request(InterpreterMessage.FreeResult, self._accessToken, result_token)
+        responseBuffer = await self._send_request(
+            interpreter_path, interpreter_port, requestBuffer)
+        _parse_free_result_response(responseBuffer)
+
+    async def _get_result(self, result_token, interpreter_path, interpreter_port):
+        requestBuffer = _make_result_request(InterpreterMessage.GetResult, self._accessToken, result_token)
+        responseBuffer = await self._send_request(
+            interpreter_path, interpreter_port, requestBuffer)
+        return _parse_get_result_response(responseBuffer)
+
+    async def close(self):
+        await self._pool.close_all()
 
 
 def _get_client():
     return PyConnector()
 
+DMLResult = namedtuple('DMLResult', ['resultToken', 'nodeConnection', 'calciteTime'])
+
+# one AsyncPyConnector per event loop, asyncio streams can not be shared between loops
+_async_clients = weakref.WeakKeyDictionary()
+
+# called from the coroutines of the loop the connector is for. asyncio is imported by the async helpers that use
+# it, like pyblazing.transport does: it is loaded once an event loop runs them
+def _get_async_client():
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        sync_client = _get_client()
+        pool = AsyncConnectionPool(max_size=sync_client._pool.max_size,
+                                   idle_timeout=sync_client._pool.idle_timeout)
+        client = AsyncPyConnector(sync_client, pool)
+        _async_clients[loop] = client
+    return client
+
 class ResultSetHandle:
 
-    def __init__(self, columns, columnTokens, resultToken, interpreter_path, interpreter_port, handle, client, calciteTime, ralTime, totalTime, error_message, total_nodes, n_crashed_nodes):
+    def __init__(self, columns, columnTokens, resultToken, interpreter_path, interpreter_port, handle, client, calciteTime, ralTime, totalTime, error_message, total_nodes, n_crashed_nodes, timing=None):
         self.columns = columns
         self.columnTokens = columnTokens
 
-        self._buffer_ids = []
+        self._token_keys = []
         if columns is not None:
             if columns.columns.size>0 and columnTokens is not None:
                for idx, column in enumerate(self.columns.columns):
                     dataframe_column = self.columns._cols[column]
-                    data_id = id(dataframe_column._column._data)
-                    dataColumnTokens[data_id] = columnTokens[idx]
-                    self._buffer_ids.append(data_id)
+                    if columnTokens[idx] == 0:
+                        # not a whole engine column, see _select_result_columns
+                        continue
+                    self._token_keys.append(client._column_tokens.register(dataframe_column._column._data, columnTokens[idx], DATA))
                     if dataframe_column.null_count > 0:
-                        nulmask_id = id(dataframe_column._column._mask)
-                        validColumnTokens[nulmask_id] = columnTokens[idx]
-                        self._buffer_ids.append(nulmask_id)
+                        self._token_keys.append(client._column_tokens.register(dataframe_column._column._mask, columnTokens[idx], VALID))
             else:
                 self.columns.resultToken = resultToken
 
@@ -297,17 +490,39 @@ class ResultSetHandle:
         self.error_message = error_message
         self.total_nodes =  total_nodes
         self.n_crashed_nodes = n_crashed_nodes 
+        # per phase breakdown, see pyblazing.timing
+        self.timing = timing
 
-    def __del__(self):
-        for key in self._buffer_ids:
-            dataColumnTokens.pop(key, None)
-            validColumnTokens.pop(key, None)
+        self._live_key = None
+        if handle is not None:
+            from .apiv2.cache import frame_nbytes
+
+            self._live_key = client._results.track(resultToken, interpreter_path, interpreter_port, frame_nbytes(columns))
+
+    # Frees the engine result now instead of when the handle is garbage collected (also on leaving a with
+    # block). The columns use its memory, so they are dropped too. The FreeResult request is sent in the
+    # background, see pyblazing.release
+    def release(self):
+        # the tokens are not valid anymore once the result is freed, even if its columns are still used
+        for key in self._token_keys:
+            self.client._column_tokens.discard(key)
+        self._token_keys = []
 
         if self.handle is not None:
             for ipch in self.handle: #todo add NVStrings handles
                 ipch.close()
-            del self.handle
-            self.client.free_result(self.resultToken,self.interpreter_path,self.interpreter_port)
+            self.handle = None
+            self.columns = None
+            self.client._results.release(self._live_key, self.timing)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __del__(self):
+        self.release()
 
 
     def __str__(self):
@@ -338,7 +553,7 @@ class ResultSetHandle:
 
 def get_ipc_handle_for_data(dataframe_column):
 
-    if id(dataframe_column._column._data) in dataColumnTokens:
+    if _get_client()._column_tokens.lookup(dataframe_column._column._data, DATA) is not None:
         return None
     else:
         if get_np_dtype_to_gdf_dtype(dataframe_column.dtype) == gdf_dtype.GDF_STRING:
@@ -349,7 +564,7 @@ def get_ipc_handle_for_data(dataframe_column):
 
 def get_ipc_handle_for_valid(dataframe_column):
 
-    if id(dataframe_column._column._mask) in validColumnTokens:
+    if _get_client()._column_tokens.lookup(dataframe_column._column._mask, VALID) is not None:
         return None
     elif dataframe_column.null_count > 0:
         ipch = dataframe_column._column._mask.mem.get_ipc_handle()
@@ -359,7 +574,7 @@ def get_ipc_handle_for_valid(dataframe_column):
 
 def get_ipc_handle_for_strings(dataframe_column):
 
-    if id(dataframe_column._column._data) in dataColumnTokens:
+    if _get_client()._column_tokens.lookup(dataframe_column._column._data, DATA) is not None:
         return None
     elif get_np_dtype_to_gdf_dtype(dataframe_column.dtype) == gdf_dtype.GDF_STRING:
         return dataframe_column._column._data.get_ipc_data()
@@ -383,6 +598,29 @@ class gdf_dtype(object):
     GDF_STRING_CATEGORY = 13
     N_GDF_TYPES = 14
 
+_gdf_to_np_dtypes = {
+    gdf_dtype.GDF_FLOAT64: np.dtype(np.float64),
+    gdf_dtype.GDF_FLOAT32: np.dtype(np.float32),
+    gdf_dtype.GDF_INT64: np.dtype(np.int64),
+    gdf_dtype.GDF_INT32: np.dtype(np.int32),
+    gdf_dtype.GDF_INT16: np.dtype(np.int16),
+    gdf_dtype.GDF_INT8: np.dtype(np.int8),
+    gdf_dtype.GDF_BOOL8: np.dtype(np.bool_),
+    gdf_dtype.GDF_DATE64: np.dtype(np.datetime64),
+    gdf_dtype.GDF_TIMESTAMP: np.dtype(np.datetime64),
+    gdf_dtype.GDF_CATEGORY: np.dtype(np.int32),
+    gdf_dtype.GDF_STRING_CATEGORY: np.dtype(np.object_),
+    gdf_dtype.GDF_STRING: np.dtype(np.object_),
+    gdf_dtype.N_GDF_TYPES: np.dtype(np.int32)
+}
+
+# dtypes of the columns built from GetResult responses
+_result_np_dtypes = dict(_gdf_to_np_dtypes)
+# todo: remove this when C gdf struct is replaced by pyarrow object
+# this workaround is only for the python object. The RAL knows the column_token and will know what its dtype actually is
+_result_np_dtypes[gdf_dtype.GDF_DATE32] = np.dtype(np.int32)
+_result_np_dtypes[gdf_dtype.GDF_DATE64] = np.dtype('datetime64[ms]')
+
 def get_np_dtype_to_gdf_dtype_str(dtype):
 
     dtypes = {
@@ -467,6 +705,8 @@ def get_dtype_values(dtypes):
             'int': gdf_dtype.GDF_INT32,
             'int32': gdf_dtype.GDF_INT32,
             'int64': gdf_dtype.GDF_INT64,
+            'int8': gdf_dtype.GDF_INT8,
+            'bool': gdf_dtype.GDF_BOOL8,
         }
         if dicc.get(type_name):
             return dicc[type_name]
@@ -525,11 +765,8 @@ def gdf_to_BlazingTable(gdf):
             #custrings_data
             blazing_column['custrings_data'] = ipc_data
 
-        column_data_id = id(dataframe_column._column._data)
-        if column_data_id in dataColumnTokens:
-            columnTokens.append(dataColumnTokens[column_data_id])
-        else:
-            columnTokens.append(0)
+        columnToken = _get_client()._column_tokens.lookup(dataframe_column._column._data, DATA)
+        columnTokens.append(columnToken if columnToken is not None else 0)
 
         blazing_columns.append(blazing_column)
 
@@ -555,6 +792,9 @@ def SetupOrchestratorConnection(orchestrator_host_ip, orchestrator_port):
     client.connect(orchestrator_host_ip, orchestrator_port)
 
 def _open_ipc_array(handle, shape, dtype, strides=None, offset=0):
+    # numba initializes the CUDA driver on import, only pay for it when a result is opened
+    from numba.cuda.cudadrv import driver, devices
+
     dtype = np.dtype(dtype)
     # compute size
     size = np.prod(shape) * dtype.itemsize
@@ -562,78 +802,165 @@ def _open_ipc_array(handle, shape, dtype, strides=None, offset=0):
     handle = driver.drvapi.cu_ipc_mem_handle(*handle)
     # use *IpcHandle* to open the IPC memory
     ipchandle = driver.IpcHandle(None, handle, size, offset=offset)
-    return ipchandle, ipchandle.open_array(current_context(), shape=shape,
+    return ipchandle, ipchandle.open_array(devices.get_context(), shape=shape,
                                            strides=strides, dtype=dtype)
 
+def _node_name(interpreter_path, interpreter_port):
+    if interpreter_port is None:
+        return str(interpreter_path)
+    return '%s:%s' % (interpreter_path, interpreter_port)
+
+# the orchestrator runs Calcite before dispatching the plan to the nodes, the
+# round trip is split using the calcite time it reports
+def _record_plan_and_dispatch(timing, dist_token, dispatchStart):
+    if timing is None or not dist_token:
+        return
+    now = time.time()
+    planEnd = min(dispatchStart + dist_token[0].calciteTime / 1000, now)
+    timing.record('plan', dispatchStart, planEnd)
+    timing.record('dispatch', planEnd, now)
+
+# the engine reports how long it took to execute the query, which ended before its result was requested
+def _record_fetch(timing, resultSet, fetchStart, node):
+    if timing is None:
+        return
+    timing.record('execute', fetchStart - resultSet.metadata.time / 1000, fetchStart, node=node)
+    timing.record('fetch', fetchStart, time.time(), node=node)
+
 # interpreter_path is the TCP protocol port for RAL
-def _private_get_result(resultToken, interpreter_path, interpreter_port, calciteTime):
+def _private_get_result(resultToken, interpreter_path, interpreter_port, calciteTime, timing=None):
+    resultSet = _private_get_result_metadata(resultToken, interpreter_path, interpreter_port, timing)
+
+    ipchandles = _open_result_columns(resultSet, timing, _node_name(interpreter_path, interpreter_port))
+    return resultSet, ipchandles
+
+# only the GetResult response (names, dtypes, sizes and IPC handles), nothing is opened
+def _private_get_result_metadata(resultToken, interpreter_path, interpreter_port, timing=None):
     client = _get_client()
 
+    fetchStart = time.time()
     resultSet = client._get_result(resultToken, interpreter_path, interpreter_port)
+    _record_fetch(timing, resultSet, fetchStart, _node_name(interpreter_path, interpreter_port))
+    return resultSet
+
+_column_readers = None
+
+# gdf dtype -> (reader, numpy dtype) of the result columns, built on first use because the readers need cudf.
+# A reader returns the cudf column, the IPC handles it opened and the time it spent opening them
+def _get_column_readers():
+    global _column_readers
+    if _column_readers is not None:
+        return _column_readers
+
+    from cudf.dataframe.buffer import Buffer
+    from cudf.dataframe.columnops import build_column
+    from cudf.dataframe.string import StringColumn
+    from cudf.utils.utils import calc_chunk_size, mask_bitsize
+    import nvstrings
+
+    def read_fixed_width(c, np_dtype):
+        if c.size == 0:
+            return build_column(Buffer.null(np_dtype), np_dtype), (), 0
+
+        assert len(c.data) == 64,"Data ipc handle was not 64 bytes"
+
+        ipcStart = time.time()
+        ipch_data, data_ptr = _open_ipc_array(c.data, shape=c.size, dtype=np_dtype)
+        if c.null_count == 0:
+            ipcTime = time.time() - ipcStart
+            return build_column(Buffer(data_ptr), np_dtype), (ipch_data,), ipcTime
+
+        assert len(c.valid) == 64,"Valid ipc handle was not 64 bytes"
+        ipch_valid, valid_ptr = _open_ipc_array(
+            c.valid, shape=calc_chunk_size(c.size, mask_bitsize), dtype=np.int8)
+        ipcTime = time.time() - ipcStart
+        if c.null_count is None and _mask_null_count(valid_ptr.copy_to_host(), c.size) == 0:
+            # a limited column (see _select_result_columns) whose nulls are all past the limit
+            return build_column(Buffer(data_ptr), np_dtype), (ipch_data, ipch_valid), ipcTime
+        return build_column(Buffer(data_ptr), np_dtype, Buffer(valid_ptr)), (ipch_data, ipch_valid), ipcTime
+
+    def read_strings(c, np_dtype):
+        if c.size == 0:
+            return StringColumn(nvstrings.to_device([])), (), 0
+
+        ipcStart = time.time()
+        new_strs = nvstrings.create_from_ipc(c.custrings_data)
+        ipcTime = time.time() - ipcStart
+        if new_strs.size() > c.size:
+            # a limited column (see _select_result_columns), the handle covers all the strings
+            new_strs = new_strs.sublist(list(range(c.size)))
+        return StringColumn(new_strs).view(StringColumn, dtype='object'), (), ipcTime
+
+    def read_string_category(c, np_dtype):
+        if c.size != 0:
+            print("ERROR _private_get_result received a GDF_STRING_CATEGORY")
+        return read_fixed_width(c, np_dtype)
+
+    readers = {dtype: (read_fixed_width, np_dtype) for dtype, np_dtype in _result_np_dtypes.items()}
+    readers[gdf_dtype.GDF_STRING] = (read_strings, _result_np_dtypes[gdf_dtype.GDF_STRING])
+    readers[gdf_dtype.GDF_STRING_CATEGORY] = (read_string_category, _result_np_dtypes[gdf_dtype.GDF_STRING_CATEGORY])
+
+    _column_readers = readers
+    return readers
+
+# opens the IPC memory of every column of a GetResult response and replaces resultSet.columns with a DataFrame.
+# Used by every path that fetches results (local, async, concat, iter_batches and dask)
+def _open_result_columns(resultSet, timing=None, node=None):
+    gdf_columns, ipchandles = _read_result_columns(resultSet, timing, node)
+
+    assembleStart = time.time()
+    resultSet.columns = _make_result_frame(resultSet.columnNames, gdf_columns)
+
+    if timing is not None:
+        timing.record('assemble', assembleStart, time.time(), node=node)
+    return ipchandles
+
+# the cudf columns of a GetResult response and the IPC handles opened for them
+def _read_result_columns(resultSet, timing=None, node=None):
+    readers = _get_column_readers()
+
+    openStart = time.time()
+    ipcTime = 0
 
     gdf_columns = []
     ipchandles = []
-    for i, c in enumerate(resultSet.columns):
-
-        # todo: remove this if when C gdf struct is replaced by pyarrow object
-        # this workaround is only for the python object. The RAL knows the column_token and will know what its dtype actually is
-        if c.dtype == gdf_dtype.GDF_DATE32:
-            c.dtype = gdf_dtype.GDF_INT32
-
-        if c.dtype == gdf_dtype.GDF_DATE64:
-            np_dtype = np.dtype('datetime64[ms]')
-        else:
-            np_dtype = gdf_to_np_dtype(c.dtype)
-
-        if c.size != 0 :
-            if c.dtype == gdf_dtype.GDF_STRING:
-                new_strs = nvstrings.create_from_ipc(c.custrings_data)
-                newcol = StringColumn(new_strs)
-
-                gdf_columns.append(newcol.view(StringColumn, dtype='object'))
-            else:
-                if c.dtype == gdf_dtype.GDF_STRING_CATEGORY:
-                    print("ERROR _private_get_result received a GDF_STRING_CATEGORY")
-
-                assert len(c.data) == 64,"Data ipc handle was not 64 bytes"
-
-                ipch_data, data_ptr = _open_ipc_array(
-                        c.data, shape=c.size, dtype=np_dtype)
-                ipchandles.append(ipch_data)
-
-                valid_ptr = None
-                if (c.null_count > 0):
-                    assert len(c.valid) == 64,"Valid ipc handle was not 64 bytes"
-                    ipch_valid, valid_ptr = _open_ipc_array(
-                        c.valid, shape=calc_chunk_size(c.size, mask_bitsize), dtype=np.int8)
-                    ipchandles.append(ipch_valid)
-
-                if (valid_ptr is None):
-                    gdf_columns.append(build_column(Buffer(data_ptr), np_dtype))
-                else:
-                    gdf_columns.append(build_column(Buffer(data_ptr), np_dtype, Buffer(valid_ptr)))
-
-        else:
-            if c.dtype == gdf_dtype.GDF_STRING:
-                gdf_columns.append(StringColumn(nvstrings.to_device([])))
-            else:
-                if c.dtype == gdf_dtype.GDF_DATE32:
-                    c.dtype = gdf_dtype.GDF_INT32
+    for c in resultSet.columns:
+        read, np_dtype = readers[c.dtype]
+        column, handles, columnIpcTime = read(c, np_dtype)
+        gdf_columns.append(column)
+        ipchandles.extend(handles)
+        ipcTime = ipcTime + columnIpcTime
+
+    if timing is not None:
+        # IPC opens and column builds are interleaved per column, each span
+        # covers their added up time starting where the loop started
+        timing.record('ipc_open', openStart, openStart + ipcTime, node=node)
+        timing.record('column_build', openStart + ipcTime, time.time(), node=node)
+    return gdf_columns, ipchandles
+
+def _make_result_frame(columnNames, gdf_columns):
+    from cudf import DataFrame
+
+    names = []
+    for k in columnNames:
+        assert k != "", "Column name was an empty string"
+        names.append(k.decode("utf-8"))
 
-                gdf_columns.append(build_column(Buffer.null(np_dtype), np_dtype))
+    if len(set(names)) == len(names):
+        # the constructor of this cudf still adds the columns one at a time, the
+        # frame is not built in one step. It only saves the __setitem__ calls
+        return DataFrame(list(zip(names, gdf_columns)))
 
+    # repeated names (e.g. select a, a) keep the last column, like assigning them one by one does
     gdf = DataFrame()
-    for k, v in zip(resultSet.columnNames, gdf_columns):
-        assert k != "", "Column name was an empty string"
-        gdf[k.decode("utf-8")] = v
+    for k, v in zip(names, gdf_columns):
+        gdf[k] = v
+    return gdf
 
-    resultSet.columns = gdf
-    return resultSet, ipchandles
-
-def run_query_get_token(sql):
-    return _run_query_get_token(sql)
+def run_query_get_token(sql, timing=None):
+    return _run_query_get_token(sql, timing)
 
-def _run_query_get_token(sql):
+def _run_query_get_token(sql, timing=None):
     startTime = time.time()
 
     resultToken = 0
@@ -647,7 +974,9 @@ def _run_query_get_token(sql):
 
         tableGroup = _create_dummy_table_group()
 
+        dispatchStart = time.time()
         dist_token = client.run_dml_query_token(sql, tableGroup)
+        _record_plan_and_dispatch(timing, dist_token, dispatchStart)
 
         return dist_token
     except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
@@ -665,45 +994,367 @@ def _run_query_get_token(sql):
 
     # TODO make distributed result set if there is error
 
-def run_query_get_results(metaToken, startTime):
-    return _run_query_get_results(metaToken, startTime)
+def run_query_get_planned_token(sql, plan_cache, catalog_version, tables, timing=None):
+    return _run_query_get_planned_token(sql, plan_cache, catalog_version, tables, timing)
 
-def _run_query_get_results(distMetaToken, startTime):
+# like _run_query_get_token but reuses the logical plan of a previous run of the same query. Cached plans are
+# only sent straight to the engine when the orchestrator said there is a single one (see PyConnector.single_engine),
+# other queries go through the orchestrator, which also tells it. The engine gets the tables of the query (see
+# _create_table_group) with the plan, it can not look them up in the orchestrator
+def _run_query_get_planned_token(sql, plan_cache, catalog_version, tables, timing=None):
     error_message = ''
 
+    try:
+        client = _get_client()
+
+        planStart = time.time()
+        engine = client.single_engine()
+        logicalPlan = None
+        if engine is not None:
+            logicalPlan = plan_cache.get(sql, catalog_version)
+
+        if logicalPlan is None:
+            dispatchStart = time.time()
+            dist_token = client.run_dml_query_token(sql, _create_dummy_table_group())
+            _record_plan_and_dispatch(timing, dist_token, dispatchStart)
+            if client.single_engine() is not None:
+                # the next runs of the query skip the orchestrator
+                logicalPlan, _ = client.run_dml_plan(sql)
+                plan_cache.put(sql, catalog_version, logicalPlan)
+            return dist_token
+
+        tableGroup = _create_table_group(tables)
+        dispatchStart = time.time()
+        dist_token = client.run_dml_logical_plan_token(logicalPlan, tableGroup, 0, engine)
+        if timing is not None:
+            timing.record('plan', planStart, dispatchStart, cached=True)
+            timing.record('dispatch', dispatchStart, time.time())
+
+        return dist_token
+    except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
+        error_message = error
+    except Error as error:
+        error_message = str(error)
+    except Exception:
+        error_message = "Unexpected error on " + _run_query_get_planned_token.__name__
+
+    if error_message != '':
+        print(error_message)
+
+# columns and limit (see ResultSet.get) only open the given columns and the first limit rows
+def run_query_get_results(metaToken, startTime, timing=None, columns=None, limit=None):
+    if columns is None and limit is None:
+        return _run_query_get_results(metaToken, startTime, timing)
+    if limit is not None and limit < 0:
+        raise ValueError("limit must not be negative")
+    return _run_query_get_selected_results(metaToken, startTime, timing, columns, limit)
+
+def _run_query_get_results(distMetaToken, startTime, timing=None):
     client = _get_client()
-    totalTime = 0
     total_nodes = 1
-    n_crashed_nodes = 0
-            
-    result_list = []
-    for result in distMetaToken:
-        try:
+    if timing is None:
+        timing = QueryTiming(start=startTime)
+
+    result_list = _get_node_results(distMetaToken, startTime, timing)
+    n_crashed_nodes = sum([result['error_message'] != '' for result in result_list])
+
+    return _make_result_set_handles(result_list, client, total_nodes, n_crashed_nodes, timing)
+
+# Same as _run_query_get_results, but the responses are fetched first: the names and sizes in them tell which
+# columns to open and how many rows each node contributes (the first limit rows, taking the nodes in order).
+# The columns that are not opened stay in the engine until the result is freed
+def _run_query_get_selected_results(distMetaToken, startTime, timing, columns, limit):
+    client = _get_client()
+    total_nodes = 1
+    if timing is None:
+        timing = QueryTiming(start=startTime)
+
+    result_list = _get_node_results(distMetaToken, startTime, timing, open_columns=False)
+    n_crashed_nodes = sum([result['error_message'] != '' for result in result_list])
+
+    remaining = limit
+    try:
+        for entry in result_list:
+            if entry['error_message'] != '':
+                continue
+            node_limit = remaining
+            if remaining is not None:
+                remaining = max(remaining - _result_rows(entry['resultSet']), 0)
+            _select_result_columns(entry['resultSet'], columns, node_limit)
+            _open_node_result(entry, timing)
+    except Exception:
+        for entry in result_list:
+            if entry['error_message'] == '':
+                _free_node_result(entry, client, timing)
+        raise
+
+    return _make_result_set_handles(result_list, client, total_nodes, n_crashed_nodes, timing)
+
+# nulls in the first size rows of a valid mask (one bit per row, least significant bit first)
+def _mask_null_count(mask, size):
+    bits = np.unpackbits(np.asarray(mask).view(np.uint8), bitorder='little')[:size]
+    return int(size - np.count_nonzero(bits))
+
+# Narrows a GetResult response to the given columns (by name, in that order) and to its first limit rows
+def _select_result_columns(resultSet, columns, limit):
+    names = [name.decode('utf-8') for name in resultSet.columnNames]
+    indices = list(range(len(names)))
+    if columns is not None:
+        missing = [name for name in columns if name not in names]
+        if len(missing) > 0:
+            raise ValueError("Unknown result columns: " + ", ".join(missing))
+        indices = [names.index(name) for name in columns]
+
+    selected = []
+    for i in indices:
+        c = resultSet.columns[i]
+        if limit is not None and c.size > limit:
+            # the nulls of the column may be past the limit, the readers count them from the valid mask
+            null_count = 0 if c.null_count == 0 else None
+            c = SimpleNamespace(dtype=c.dtype, size=limit, null_count=null_count,
+                                data=c.data, valid=c.valid, custrings_data=c.custrings_data)
+        selected.append(c)
+
+    columnTokens = None
+    if resultSet.columnTokens is not None:
+        # the engine only knows the tokens of whole columns
+        columnTokens = [resultSet.columnTokens[i] if limit is None else 0 for i in indices]
+
+    resultSet.columns = selected
+    resultSet.columnNames = [resultSet.columnNames[i] for i in indices]
+    resultSet.columnTokens = columnTokens
+
+# fetches the result of one node, errors are returned in the entry so a failing node does not affect the others
+# open_columns=False only fetches the GetResult response, see _open_node_result
+def _get_node_result(result, startTime, timing=None, open_columns=True):
+    error_message = ''
+    try:
+        if open_columns:
             resultSet, ipchandles = _private_get_result(result.resultToken,
                                                         result.nodeConnection.path.decode('utf8'),
                                                         result.nodeConnection.port,
-                                                        result.calciteTime)
-            
-            totalTime = (time.time() - startTime) * 1000  # in milliseconds
-            
-            result_list.append({'result': result, 'resultSet': resultSet, 'ipchandles': ipchandles, 'totalTime':totalTime, 'error_message':''})
-            
-        except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
-            error_message = error
-        except Error as error:
-            error_message = str(error)
-        except Exception as error:
-            error_message = "Unexpected error on " + _run_query_get_results.__name__ + ", " + str(error)
-            
-        if error_message is not '':
-            print(error_message)
-            result_list.append({'result': result, 'resultSet': None, 'ipchandles': None, 'totalTime':0, 'error_message':error_message})
-                    
-        if error_message is not '':            
-            print(error_message)
-            n_crashed_nodes = n_crashed_nodes + 1 
+                                                        result.calciteTime,
+                                                        timing)
+        else:
+            resultSet = _private_get_result_metadata(result.resultToken,
+                                                     result.nodeConnection.path.decode('utf8'),
+                                                     result.nodeConnection.port,
+                                                     timing)
+            ipchandles = []
+
+        return {'result': result, 'resultSet': resultSet, 'ipchandles': ipchandles, 'error_message':''}
+    except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
+        error_message = error
+    except Error as error:
+        error_message = str(error)
+    except Exception as error:
+        error_message = "Unexpected error on " + _get_node_result.__name__ + ", " + str(error)
+
+    print(error_message)
+    return {'result': result, 'resultSet': None, 'ipchandles': None, 'error_message':error_message}
+
+# fetches the results of all the nodes in parallel, so it takes as long as the slowest node instead of the sum of all of them.
+# The entries are returned in the same order as distMetaToken
+def _get_node_results(distMetaToken, startTime, timing=None, open_columns=True):
+    distMetaToken = list(distMetaToken)
+    if len(distMetaToken) <= 1:
+        return [_get_node_result(result, startTime, timing, open_columns) for result in distMetaToken]
+
+    # more workers than pooled connections per node would only wait on the pool
+    max_workers = min(len(distMetaToken), _get_client()._pool.max_size)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda result: _get_node_result(result, startTime, timing, open_columns), distMetaToken))
+
+# opens the columns of an entry fetched with open_columns=False
+def _open_node_result(entry, timing=None):
+    node = entry['result'].nodeConnection
+    entry['ipchandles'] = _open_result_columns(entry['resultSet'], timing, _node_name(node.path.decode('utf8'), node.port))
+    return entry['resultSet'].columns
+
+def iter_query_batches(metaToken, startTime, max_rows=None, max_bytes=None, timing=None):
+    _check_batch_limits(max_rows, max_bytes)
+    return _iter_query_batches(metaToken, startTime, max_rows, max_bytes, timing)
+
+def result_batches(gdf, max_rows=None, max_bytes=None):
+    _check_batch_limits(max_rows, max_bytes)
+    return _result_batches(gdf, max_rows, max_bytes)
+
+def _check_batch_limits(max_rows, max_bytes):
+    if max_rows is not None and max_rows <= 0:
+        raise ValueError("max_rows must be a positive number of rows")
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError("max_bytes must be a positive number of bytes")
+
+# yields deep copied batches of at most max_rows rows / max_bytes bytes of every node result, as soon as
+# that node's result arrives, so the client only holds the batches it keeps
+def _iter_query_batches(distMetaToken, startTime, max_rows, max_bytes, timing):
+    for gdf in _iter_node_frames(distMetaToken, startTime, timing):
+        for batch in _result_batches(gdf, max_rows, max_bytes):
+            yield batch
+
+# yields the DataFrame of every node result in the order the nodes answer. The DataFrame reads the engine
+# memory through IPC: it is only valid until the next one is requested, then its node result is freed in
+# the engine (also when the consumer stops early or a node fails)
+def _iter_node_frames(distMetaToken, startTime, timing):
+    client = _get_client()
+    distMetaToken = list(distMetaToken)
+    if timing is None:
+        timing = QueryTiming(start=startTime)
+    if len(distMetaToken) == 0:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(len(distMetaToken), client._pool.max_size))
+    futures = [executor.submit(_get_node_result, result, startTime, timing) for result in distMetaToken]
+    pending = set(futures)
+    try:
+        for future in as_completed(futures):
+            pending.discard(future)
+            entry = future.result()
+            if entry['error_message'] != '':
+                node = entry['result'].nodeConnection
+                raise RuntimeError("Node " + _node_name(node.path.decode('utf8'), node.port) + " failed: " + str(entry['error_message']))
+            try:
+                yield entry['resultSet'].columns
+            finally:
+                _free_node_result(entry, client, timing)
+        timing.finish()
+    finally:
+        for future in pending:
+            if not future.cancel():
+                entry = future.result()
+                if entry['error_message'] == '':
+                    _free_node_result(entry, client, timing)
+        executor.shutdown(wait=False)
+
+def iter_query_arrow_batches(metaToken, startTime, max_rows=None, timing=None):
+    _check_batch_limits(max_rows, None)
+    return _iter_query_arrow_batches(metaToken, startTime, max_rows, timing)
+
+def frame_arrow_batches(gdf, max_rows=None):
+    from . import arrow
+
+    _check_batch_limits(max_rows, None)
+    return arrow.split_record_batch(arrow.frame_to_record_batch(gdf), max_rows)
+
+def write_arrow_stream(sink, batches):
+    from . import arrow
+
+    return arrow.write_stream(sink, batches)
+
+# Arrow record batches copied to host straight from the IPC memory of every node result, see pyblazing.arrow
+def _iter_query_arrow_batches(distMetaToken, startTime, max_rows, timing):
+    from . import arrow
+
+    for gdf in _iter_node_frames(distMetaToken, startTime, timing):
+        for batch in arrow.split_record_batch(arrow.frame_to_record_batch(gdf), max_rows):
+            yield batch
+
+def _result_batches(gdf, max_rows, max_bytes):
+    from .apiv2.cache import frame_nbytes
+
+    nrows = len(gdf)
+    batch_rows = nrows
+    if max_rows is not None:
+        batch_rows = min(batch_rows, max_rows)
+    if max_bytes is not None and nrows > 0:
+        row_bytes = max(frame_nbytes(gdf) // nrows, 1)
+        batch_rows = min(batch_rows, max(max_bytes // row_bytes, 1))
+
+    for start in range(0, nrows, max(batch_rows, 1)):
+        # a copy, the node result it comes from is freed after its last batch
+        yield gdf[start:start + batch_rows].copy(deep=True)
+
+# same as ResultSetHandle.__del__ for a node result that never got a handle
+def _free_node_result(entry, client, timing):
+    for ipch in entry['ipchandles']:
+        ipch.close()
+    node = entry['result'].nodeConnection
+    path = node.path.decode('utf8')
+    if timing is None:
+        client.free_result(entry['result'].resultToken, path, node.port)
+        return
+    with timing.phase('free', node=_node_name(path, node.port)):
+        client.free_result(entry['result'].resultToken, path, node.port)
+
+# the same device memory as a numba device array, owned by owner: the views of the new array (slices of
+# the column, shallow copies of the DataFrame) keep a reference to owner like the array itself
+def _owned_array(array, owner):
+    from numba.cuda.cudadrv import driver
+    from numba.cuda.cudadrv.devicearray import DeviceNDArray
+
+    gpu_data = driver.MemoryPointer(array.gpu_data.context, array.device_ctypes_pointer, array.alloc_size, owner=owner)
+    return DeviceNDArray(array.shape, array.strides, array.dtype, gpu_data=gpu_data)
+
+class _ResultMemory:
+    """Owner of the fixed width column buffers of a _TransferredResult."""
+
+class _TransferredResult:
+    """A node result whose buffers were handed to the client instead of copied.
+
+    The fixed width columns are rebuilt over device arrays owned by one
+    _ResultMemory, so every DataFrame, Series, slice or device array derived
+    from them without a copy keeps it alive. Strings are tracked per nvstrings
+    object, the strings derived from them are copies. The engine result is
+    freed once all of them are garbage collected.
+    """
 
+    def __init__(self, entry, client, timing):
+        # not the resultSet, it references the DataFrame and would keep it alive
+        self.entry = {'result': entry['result'], 'ipchandles': entry['ipchandles']}
+        self.client = client
+        self.timing = timing
+        self.live = 0
+        self.key = None
+        self._lock = threading.Lock()
+
+    def track(self, gdf):
+        memory = _ResultMemory()
+        owners = []
+        fixed_width = False
+        for series in gdf._cols.values():
+            column = series._column
+            if column.dtype == 'object':
+                # nvstrings opened from the IPC handles
+                owners.append(column._data)
+                continue
+            if len(column) == 0:
+                # nothing was opened for it
+                continue
+            column._data.mem = _owned_array(column._data.mem, memory)
+            if column.has_null_mask:
+                column._mask.mem = _owned_array(column._mask.mem, memory)
+            fixed_width = True
+        if fixed_width:
+            owners.append(memory)
+
+        from .apiv2.cache import frame_nbytes
+
+        node = self.entry['result'].nodeConnection
+        self.key = self.client._results.track(self.entry['result'].resultToken, node.path.decode('utf8'), node.port, frame_nbytes(gdf))
+        self.live = len(owners)
+        if self.live == 0:
+            self._free()
+        for owner in owners:
+            weakref.finalize(owner, self._release)
+        return gdf
+
+    def _release(self):
+        with self._lock:
+            self.live = self.live - 1
+            if self.live > 0:
+                return
+        self._free()
+
+    # called from the finalizers, the request is sent by the reaper thread
+    def _free(self):
+        for ipch in self.entry['ipchandles']:
+            ipch.close()
+        self.client._results.release(self.key, self.timing)
+
+# totalTime is the same for every handle: from the start of the query until its results are ready on the client
+def _make_result_set_handles(result_list, client, total_nodes, n_crashed_nodes, timing):
     result_set_list = []
+    totalTime = timing.finish()
     
     for result in result_list:
         if result['error_message'] is not '':
@@ -716,10 +1367,11 @@ def _run_query_get_results(distMetaToken, startTime):
                                                    client,
                                                    result['result'].calciteTime,
                                                    None,
-                                                   0,
+                                                   totalTime,
                                                    result['error_message'],
                                                    total_nodes,  #total_nodes
-                                                   n_crashed_nodes   #n_crashed_nodes
+                                                   n_crashed_nodes,   #n_crashed_nodes
+                                                   timing
                                                    ))
         else:
             result_set_list.append(ResultSetHandle(result['resultSet'].columns,
@@ -731,10 +1383,11 @@ def _run_query_get_results(distMetaToken, startTime):
                                                    client,
                                                    result['result'].calciteTime,
                                                    result['resultSet'].metadata.time,
-                                                   result['totalTime'],
+                                                   totalTime,
                                                    result['error_message'],
                                                    total_nodes,  #total_nodes
-                                                   n_crashed_nodes   #n_crashed_nodes
+                                                   n_crashed_nodes,   #n_crashed_nodes
+                                                   timing
                                                    ))
 
     if len(result_set_list) == 1:
@@ -742,78 +1395,93 @@ def _run_query_get_results(distMetaToken, startTime):
 
     return result_set_list
 
+# asyncio variants of the query path, every protocol round trip is awaited on the event loop
 
-def _get_result_dask(resultToken, interpreter_path, interpreter_port, calciteTime,client):
+async def run_query_get_token_async(sql, timing=None):
+    error_message = ''
 
-    resultSet = client._get_result(resultToken, interpreter_path, interpreter_port)
+    try:
+        client = _get_async_client()
 
-    gdf_columns = []
-    ipchandles = []
-    for i, c in enumerate(resultSet.columns):
+        tableGroup = _create_dummy_table_group()
 
-        # todo: remove this if when C gdf struct is replaced by pyarrow object
-        # this workaround is only for the python object. The RAL knows the column_token and will know what its dtype actually is
-        if c.dtype == gdf_dtype.GDF_DATE32:
-            c.dtype = gdf_dtype.GDF_INT32
+        dispatchStart = time.time()
+        dist_token = await client.run_dml_query_token(sql, tableGroup)
+        _record_plan_and_dispatch(timing, dist_token, dispatchStart)
 
-        if c.dtype == gdf_dtype.GDF_DATE64:
-            np_dtype = np.dtype('datetime64[ms]')
-        else:
-            np_dtype = gdf_to_np_dtype(c.dtype)
+        return dist_token
+    except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
+        error_message = error
+    except Error as error:
+        error_message = str(error)
+    except Exception:
+        error_message = "Unexpected error on " + run_query_get_token_async.__name__
 
-        if c.size != 0 :
-            if c.dtype == gdf_dtype.GDF_STRING:
-                new_strs = nvstrings.create_from_ipc(c.custrings_data)
-                newcol = StringColumn(new_strs)
+    if error_message != '':
+        print(error_message)
 
-                gdf_columns.append(newcol.view(StringColumn, dtype='object'))
-            else:
-                if c.dtype == gdf_dtype.GDF_STRING_CATEGORY:
-                    print("ERROR _private_get_result received a GDF_STRING_CATEGORY")
+async def _private_get_result_async(resultToken, interpreter_path, interpreter_port, calciteTime, timing=None):
+    client = _get_async_client()
+    node = _node_name(interpreter_path, interpreter_port)
+
+    fetchStart = time.time()
+    resultSet = await client._get_result(resultToken, interpreter_path, interpreter_port)
+    _record_fetch(timing, resultSet, fetchStart, node)
+
+    ipchandles = _open_result_columns(resultSet, timing, node)
+    return resultSet, ipchandles
+
+async def _get_node_result_async(result, startTime, timing=None):
+    error_message = ''
+    try:
+        resultSet, ipchandles = await _private_get_result_async(result.resultToken,
+                                                                result.nodeConnection.path.decode('utf8'),
+                                                                result.nodeConnection.port,
+                                                                result.calciteTime,
+                                                                timing)
 
-                assert len(c.data) == 64,"Data ipc handle was not 64 bytes"
+        return {'result': result, 'resultSet': resultSet, 'ipchandles': ipchandles, 'error_message':''}
+    except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
+        error_message = error
+    except Error as error:
+        error_message = str(error)
+    except Exception as error:
+        error_message = "Unexpected error on " + run_query_get_results_async.__name__ + ", " + str(error)
 
-                ipch_data, data_ptr = _open_ipc_array(
-                        c.data, shape=c.size, dtype=np_dtype)
-                ipchandles.append(ipch_data)
+    print(error_message)
+    return {'result': result, 'resultSet': None, 'ipchandles': None, 'error_message':error_message}
 
-                valid_ptr = None
-                if (c.null_count > 0):
-                    assert len(c.valid) == 64,"Valid ipc handle was not 64 bytes"
-                    ipch_valid, valid_ptr = _open_ipc_array(
-                        c.valid, shape=calc_chunk_size(c.size, mask_bitsize), dtype=np.int8)
-                    ipchandles.append(ipch_valid)
+async def run_query_get_results_async(distMetaToken, startTime, timing=None):
+    import asyncio
 
-                if (valid_ptr is None):
-                    gdf_columns.append(build_column(Buffer(data_ptr), np_dtype))
-                else:
-                    gdf_columns.append(build_column(Buffer(data_ptr), np_dtype, Buffer(valid_ptr)))
+    client = _get_client()
+    total_nodes = 1
+    if timing is None:
+        timing = QueryTiming(start=startTime)
 
-        else:
-            if c.dtype == gdf_dtype.GDF_STRING:
-                gdf_columns.append(StringColumn(nvstrings.to_device([])))
-            else:
-                if c.dtype == gdf_dtype.GDF_DATE32:
-                    c.dtype = gdf_dtype.GDF_INT32
+    result_list = await asyncio.gather(*[_get_node_result_async(result, startTime, timing) for result in distMetaToken])
+    n_crashed_nodes = sum([result['error_message'] != '' for result in result_list])
 
-                gdf_columns.append(build_column(Buffer.null(np_dtype), np_dtype))
+    return _make_result_set_handles(result_list, client, total_nodes, n_crashed_nodes, timing)
 
-    gdf = DataFrame()
-    for k, v in zip(resultSet.columnNames, gdf_columns):
-        assert k != "", "Column name was an empty string"
-        gdf[k.decode("utf-8")] = v
 
+def _get_result_dask(resultToken, interpreter_path, interpreter_port, calciteTime,client):
+    resultSet = client._get_result(resultToken, interpreter_path, interpreter_port)
 
-    resultSet.columns = gdf
+    ipchandles = _open_result_columns(resultSet)
     return resultSet, ipchandles
 
-def convert_result_msg(metaToken,connection):
+# result is the DMLResult of the node next to the calling dask worker, a metaToken list means its first node
+def convert_result_msg(result,connection):
+    if isinstance(result, list):
+        result = result[0]
+    node = result.nodeConnection
 
-    resultSet, ipchandles = _get_result_dask(metaToken[0].resultToken,"127.0.0.1",8891,0,connection)
+    resultSet, ipchandles = _get_result_dask(result.resultToken,node.path.decode('utf8'),node.port,0,connection)
 
     totalTime = 0  # in milliseconds
 
-    result = {'result': metaToken[0], 'resultSet': resultSet, 'ipchandles': ipchandles}
+    result = {'result': result, 'resultSet': resultSet, 'ipchandles': ipchandles}
 
     return ResultSetHandle(result['resultSet'].columns,
                            result['resultSet'].columnTokens,
@@ -825,77 +1493,217 @@ def convert_result_msg(metaToken,connection):
                                                result['result'].calciteTime,
                                                result['resultSet'].metadata.time,
                                                totalTime,
-                                               ''
+                                               '',
+                                               1,  #total_nodes
+                                               0   #n_crashed_nodes
                                                )
 
 
-def convert_to_dask(metaToken,connection):
-    result_set = convert_result_msg(metaToken,connection)
+# runs on the dask worker next to the node of result and returns its partition
+def convert_to_dask(result,connection,transfer_ownership=False):
+    if isinstance(result, list):
+        result = result[0]
+
+    if transfer_ownership:
+        node = result.nodeConnection
+        resultSet, ipchandles = _get_result_dask(result.resultToken,node.path.decode('utf8'),node.port,0,connection)
+        entry = {'result': result, 'ipchandles': ipchandles}
+        return _TransferredResult(entry, connection, None).track(resultSet.columns)
+
+    result_set = convert_result_msg(result,connection)
     return result_set.columns.copy(deep=True)
 
-def run_query_get_concat_results(metaToken, startTime):
-    return _run_query_get_concat_results(metaToken, startTime)
+# the column readers build an empty column from a size 0 column without opening anything
+_EmptyColumn = namedtuple('EmptyColumn', ['size'])
+
+# Empty DataFrame with the columns and dtypes of the result, the meta of its dask partitions. Only the
+# GetResult response of the first node is read, no IPC memory is opened on the client
+def dask_result_meta(metaToken):
+    from cudf import DataFrame
+
+    result = metaToken[0]
+    node = result.nodeConnection
+    resultSet = _get_client()._get_result(result.resultToken, node.path.decode('utf8'), node.port)
 
-def _run_query_get_concat_results(distMetaToken, startTime):
+    readers = _get_column_readers()
+    empty = _EmptyColumn(0)
+    gdf_columns = []
+    for c in resultSet.columns:
+        reader, np_dtype = readers[c.dtype]
+        gdf_columns.append(reader(empty, np_dtype)[0])
+    return DataFrame(list(zip([name.decode('utf-8') for name in resultSet.columnNames], gdf_columns)))
+
+def _result_rows(resultSet):
+    if len(resultSet.columns) == 0:
+        return 0
+    return resultSet.columns[0].size
+
+# Output column of _concat_node_results, allocated once for the rows of all the nodes and filled node by node
+class _ConcatColumn:
+
+    def __init__(self, np_dtype, size, nullable):
+        from librmm_cffi import librmm as rmm
+
+        self.np_dtype = np_dtype
+        self.strings = []
+        self.data = None
+        self.valid = None
+        if np_dtype != np.dtype('object'):
+            self.data = rmm.device_array(size, dtype=np_dtype)
+            if nullable:
+                # one byte per row while filling, node masks do not start at byte boundaries
+                self.valid = rmm.device_array(size, dtype=np.bool_)
+
+    def copy(self, column, offset):
+        from cudf.utils import cudautils
+
+        size = len(column)
+        if self.data is None:
+            # nvstrings, copied out of the IPC memory of the node
+            if size > 0:
+                self.strings.append(column._data.copy())
+            return
+        if size == 0:
+            return
 
+        self.data[offset:offset + size].copy_to_device(column._data.mem)
+        if self.valid is not None:
+            if column.has_null_mask:
+                self.valid[offset:offset + size].copy_to_device(cudautils.expand_mask_bits(size, column._mask.mem))
+            else:
+                cudautils.fill_value(self.valid[offset:offset + size], True)
+
+    def build(self):
+        from cudf.dataframe.buffer import Buffer
+        from cudf.dataframe.columnops import build_column
+        from cudf.dataframe.string import StringColumn
+        from cudf.utils import cudautils
+        import nvstrings
+
+        if self.data is None:
+            strings = nvstrings.from_strings(*self.strings) if len(self.strings) > 0 else nvstrings.to_device([])
+            return StringColumn(strings).view(StringColumn, dtype='object')
+        if self.valid is None:
+            return build_column(Buffer(self.data), self.np_dtype)
+        return build_column(Buffer(self.data), self.np_dtype, Buffer(cudautils.compact_mask_bytes(self.valid)))
+
+# Concatenates node results fetched with open_columns=False. The output columns are allocated once from the
+# sizes and dtypes in the GetResult responses, then every node is opened, copied in and freed right away, so
+# the client never has more than one node result open and the engine releases them as the copy goes
+def _concat_node_results(entry_list, client, timing):
+    readers = _get_column_readers()
+
+    data_entries = [entry for entry in entry_list if _result_rows(entry['resultSet']) > 0]
+    dtypes = [c.dtype for c in data_entries[0]['resultSet'].columns]
+    if gdf_dtype.GDF_STRING_CATEGORY in dtypes or any([c.dtype for c in entry['resultSet'].columns] != dtypes for entry in data_entries):
+        return _concat_opened_node_results(entry_list, client, timing)
+
+    total_rows = sum(_result_rows(entry['resultSet']) for entry in data_entries)
+    columns = []
+    for i, dtype in enumerate(dtypes):
+        nullable = any(entry['resultSet'].columns[i].null_count > 0 for entry in data_entries)
+        columns.append(_ConcatColumn(readers[dtype][1], total_rows, nullable))
+    columnNames = data_entries[0]['resultSet'].columnNames
+
+    offset = 0
+    pending = list(entry_list)
+    try:
+        while len(pending) > 0:
+            entry = pending.pop(0)
+            try:
+                if _result_rows(entry['resultSet']) > 0:
+                    offset = _copy_node_columns(columns, entry, offset, timing)
+            finally:
+                _free_node_result(entry, client, timing)
+    finally:
+        for entry in pending:
+            _free_node_result(entry, client, timing)
+
+    return _make_result_frame(columnNames, [column.build() for column in columns])
+
+# the node columns only live in this call, they are gone when the node result is freed
+def _copy_node_columns(columns, entry, offset, timing):
+    node = entry['result'].nodeConnection
+    node_columns, entry['ipchandles'] = _read_result_columns(entry['resultSet'], timing,
+                                                             _node_name(node.path.decode('utf8'), node.port))
+    for column, node_column in zip(columns, node_columns):
+        column.copy(node_column, offset)
+    return offset + _result_rows(entry['resultSet'])
+
+# the nodes disagree on the dtypes: open them all and let cudf concat cast them
+def _concat_opened_node_results(entry_list, client, timing):
     from cudf.multi import concat
 
+    all_gdfs = [_open_node_result(entry, timing) for entry in entry_list]
+    gdf = concat(all_gdfs, ignore_index=True)
+    del all_gdfs
+    for entry in entry_list:
+        entry['resultSet'].columns = None
+        _free_node_result(entry, client, timing)
+    return gdf
+
+# transfer_ownership=True skips the copy when only one node returns data: the DataFrame uses the engine memory
+# and the node result is freed when the DataFrame is garbage collected, see _TransferredResult
+def run_query_get_concat_results(metaToken, startTime, timing=None, transfer_ownership=False):
+    return _run_query_get_concat_results(metaToken, startTime, timing, transfer_ownership)
+
+def _run_query_get_concat_results(distMetaToken, startTime, timing=None, transfer_ownership=False):
     client = _get_client()
 
     all_error_messages = ''
-    result_list = []
+    entry_list = []
     ral_count = 0
     sum_calcite_time = 0
     sum_ral_time = 0
-    sum_total_time = 0
     total_nodes = 0
     n_crashed_nodes = 0 
+    if timing is None:
+        timing = QueryTiming(start=startTime)
     
-    for result in distMetaToken:
+    # only the GetResult responses: the sizes and dtypes are enough to allocate the result,
+    # the IPC memory of a node is opened when it is copied in
+    for node_result in _get_node_results(distMetaToken, startTime, timing, open_columns=False):
         ral_count = ral_count + 1
-        error_message = ''
-        try:
-            totalTime = 0
-            resultSet, ipchandles = _private_get_result(result.resultToken,
-                                                        result.nodeConnection.path.decode('utf8'),
-                                                        result.nodeConnection.port,
-                                                        result.calciteTime)
-
-            totalTime = (time.time() - startTime) * 1000  # in milliseconds
-            
-            sum_calcite_time = sum_calcite_time + result.calciteTime
-            sum_ral_time =  sum_ral_time  + resultSet.metadata.time
-            sum_total_time =  sum_total_time + totalTime
-            
-            result_list.append(resultSet)
-        except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
-            error_message = error
-        except Error as error:
-            error_message = str(error)
-        except Exception as error:
-            error_message = "Unexpected error on " + _run_query_get_results.__name__ + ", " + str(error)
-    
         total_nodes = total_nodes + 1
-        
-        if error_message is not '':            
-            print(error_message)
+
+        error_message = node_result['error_message']
+        if error_message != '':
             all_error_messages = all_error_messages + " Node " + str(ral_count) + ":" + str(error_message)
             n_crashed_nodes = n_crashed_nodes + 1
-            
-    need_to_concat = sum([len(result.columns) > 0 for result in result_list]) > 1
+            continue
+
+        resultSet = node_result['resultSet']
+        sum_calcite_time = sum_calcite_time + node_result['result'].calciteTime
+        sum_ral_time =  sum_ral_time  + resultSet.metadata.time
+
+        entry_list.append(node_result)
+
+    need_to_concat = sum([_result_rows(entry['resultSet']) > 0 for entry in entry_list]) > 1
 
     gdf =  None
+    concatStart = time.time()
     
     if (need_to_concat):
-        all_gdfs = [result.columns for result in result_list]
-        gdf =  concat(all_gdfs, ignore_index=True)        
+        gdf = _concat_node_results(entry_list, client, timing)
     else:
-        for result in result_list:  # if we dont need to concatenate, likely we only have one, or only one that has data
-            if (len(result.columns) > 0): # this is the one we want to return, but we need to deep copy it first. We only need to deepcopy the non strings.
-                 gdf = result.columns
-                 for col_name, col in gdf._cols.items():
-                     if (col.dtype != 'object'):
-                         gdf[col_name] = gdf[col_name].copy(deep=True)
+        for entry in entry_list:  # if we dont need to concatenate, likely we only have one, or only one that has data
+            if _result_rows(entry['resultSet']) == 0:
+                _free_node_result(entry, client, timing)
+                continue
+            # this is the one we want to return, but we need to deep copy it first. We only need to deepcopy the non strings.
+            gdf = _open_node_result(entry, timing)
+            if transfer_ownership:
+                gdf = _TransferredResult(entry, client, timing).track(gdf)
+                continue
+            try:
+                for col_name, col in gdf._cols.items():
+                    if (col.dtype != 'object'):
+                        gdf[col_name] = gdf[col_name].copy(deep=True)
+            finally:
+                # the DataFrame does not use the engine memory anymore, like after _concat_node_results
+                entry['resultSet'].columns = None
+                _free_node_result(entry, client, timing)
+    timing.record('concat', concatStart, time.time(), nodes=len(entry_list))
 
     resultSetHandle = ResultSetHandle(gdf,
                                        None,
@@ -906,10 +1714,11 @@ def _run_query_get_concat_results(distMetaToken, startTime):
                                        None,
                                        sum_calcite_time,
                                        sum_ral_time,
-                                       sum_total_time,
+                                       timing.finish(),
                                        all_error_messages,
                                        total_nodes, #total_nodes
-                                       n_crashed_nodes  #n_crashed_nodes
+                                       n_crashed_nodes,  #n_crashed_nodes
+                                       timing
                                        )
 
     return resultSetHandle 
@@ -924,7 +1733,6 @@ from blazingdb.protocol.orchestrator import OrchestratorMessageType
 from blazingdb.protocol.io  import FileSystemRegisterRequestSchema, FileSystemDeregisterRequestSchema
 from blazingdb.protocol.io import DriverType, FileSystemType, EncryptionType, FileSchemaType
 import numpy as np
-import pandas as pd
 import pyblazing
 
 class SchemaFrom:
@@ -936,10 +1744,8 @@ class SchemaFrom:
     OrcFile = 5
 
 
-#cambiar para success or failed
-def create_table(tableName, **kwargs):
-    return_result = None
-    error_message = ''
+# the run_ddl_create_table arguments of a create_table call, also the tables of a table group (see _create_table_group)
+def _create_table_args(tableName, **kwargs):
     columnNames = kwargs.get('names', [])
     columnTypes = kwargs.get('dtypes', [])
     dbName = 'main'
@@ -969,16 +1775,32 @@ def create_table(tableName, **kwargs):
     else:
         csv_args = pyblazing.make_default_csv_arg(**kwargs)
 
+    return (tableName, columnNames, columnTypes, dbName, schemaType, blazing_table, files, resultToken,
+            csv_args, jsonLines, orc_args)
+
+#cambiar para success or failed
+def create_table(tableName, **kwargs):
+    return_result = None
+    error_message = ''
+    raise_errors = kwargs.get('raise_errors', False)
+
+    args = _create_table_args(tableName, **kwargs)
+
     try:
         client = _get_client()
-        return_result = client.run_ddl_create_table(tableName,columnNames,columnTypes,
-                        dbName,schemaType,blazing_table,files,resultToken,csv_args,jsonLines,orc_args)
+        return_result = client.run_ddl_create_table(*args)
 
     except (SyntaxError, RuntimeError, ValueError, ConnectionRefusedError, AttributeError) as error:
+        if raise_errors:
+            raise
         error_message = error
     except Error as error:
+        if raise_errors:
+            raise
         error_message = str(error)
     except Exception as error:
+        if raise_errors:
+            raise
         error_message = "Unexpected error on " + create_table.__name__ + ", " + str(error)
 
     if error_message is not '':
@@ -989,6 +1811,10 @@ def create_table(tableName, **kwargs):
     return return_result
 
 
+def drop_table(tableName):
+    client = _get_client()
+    return client.run_ddl_drop_table(tableName, 'main')
+
 def register_file_system(authority, type, root, params = None):
     if params is not None:
         params = namedtuple("FileSystemConnection", params.keys())(*params.values())
@@ -997,7 +1823,7 @@ def register_file_system(authority, type, root, params = None):
     request_buffer = MakeRequestBuffer(OrchestratorMessageType.RegisterFileSystem,
                                        client._accessToken,
                                        schema)
-    response_buffer = _send_request( client._orchestrator_path, client._orchestrator_port, request_buffer)
+    response_buffer = client._send_request(client._orchestrator_path, client._orchestrator_port, request_buffer)
     response = ResponseSchema.From(response_buffer)
     if response.status == Status.Error:
         raise RuntimeError(ResponseErrorSchema.From(response.payload).errors)
@@ -1009,12 +1835,19 @@ def deregister_file_system(authority):
     request_buffer = MakeRequestBuffer(OrchestratorMessageType.DeregisterFileSystem,
                                        client._accessToken,
                                        schema)
-    response_buffer = _send_request(client._orchestrator_path, client._orchestrator_port, request_buffer)
+    response_buffer = client._send_request(client._orchestrator_path, client._orchestrator_port, request_buffer)
     response = ResponseSchema.From(response_buffer)
     if response.status == Status.Error:
         raise RuntimeError(ResponseErrorSchema.From(response.payload).errors)
     return response.status
 
+# tables is {table name: create_table kwargs}, the table group has the fields of their create table requests
+def _create_table_group(tables):
+    database_name = 'main'
+    group_tables = [_table_fields(*_create_table_args(name, **kwargs)) for name, kwargs in tables.items()]
+    tableGroup = OrderedDict([('name', database_name), ('tables', group_tables)])
+    return tableGroup
+
 def _create_dummy_table_group():
     database_name = 'main'
     tableGroup = OrderedDict([('name', database_name), ('tables', [])])
@@ -1023,21 +1856,4 @@ def _create_dummy_table_group():
 def gdf_to_np_dtype(dtype):
     """Util to convert gdf dtype to numpy dtype.
     """
-    gdf_dtypes = {
-        gdf_dtype.GDF_FLOAT64: np.float64,
-        gdf_dtype.GDF_FLOAT32: np.float32,
-        gdf_dtype.GDF_INT64: np.int64,
-        gdf_dtype.GDF_INT32: np.int32,
-        gdf_dtype.GDF_INT16: np.int16,
-        gdf_dtype.GDF_INT8: np.int8,
-        gdf_dtype.GDF_BOOL8: np.bool_,
-        gdf_dtype.GDF_DATE64: np.datetime64,
-        gdf_dtype.GDF_TIMESTAMP: np.datetime64,
-        gdf_dtype.GDF_CATEGORY: np.int32,
-        gdf_dtype.GDF_STRING_CATEGORY: np.object_,
-        gdf_dtype.GDF_STRING: np.object_,
-        gdf_dtype.N_GDF_TYPES: np.int32
-    }
-    return np.dtype(gdf_dtypes[dtype])
-
-
+    return _gdf_to_np_dtypes[dtype]
@@ -1,26 +1,38 @@
 import pyblazing
 
 
-# TODO percy remove this one once we have the full port ready
-# this object should not have state and ultimately should stop existing
-class internal_api:
+# the type and function wrappers are resolved on first access, so importing
+# the apiv2 modules does not import pyblazing.api
+class _lazy_wrappers(type):
 
-    # Type wrappers
+    _wrapped = {
+        # Type wrappers
+        'SchemaFrom': 'SchemaFrom',
+        'DriverType': 'DriverType',
+        'S3EncryptionType': 'EncryptionType',
+        'FileSystemType': 'FileSystemType',
 
-    SchemaFrom = pyblazing.SchemaFrom
-    DriverType = pyblazing.DriverType
-    S3EncryptionType = pyblazing.EncryptionType
-    FileSystemType = pyblazing.FileSystemType
+        'ResultSetHandle': 'ResultSetHandle',
+        'gdf_dtype': 'gdf_dtype',
+        'get_dtype_values': 'get_dtype_values',
+        'get_np_dtype_to_gdf_dtype': 'get_np_dtype_to_gdf_dtype',
 
-    ResultSetHandle = pyblazing.ResultSetHandle
-    gdf_dtype = pyblazing.gdf_dtype
-    get_dtype_values = pyblazing.get_dtype_values
-    get_np_dtype_to_gdf_dtype = pyblazing.get_np_dtype_to_gdf_dtype
+        # Function/Method wrappers
+        '_get_client': '_get_client',
+        '_get_async_client': '_get_async_client',
+        'SetupOrchestratorConnection': 'SetupOrchestratorConnection',
+        'service_probe_requests': 'service_probe_requests',
+    }
 
-    # Function/Method wrappers
+    def __getattr__(cls, name):
+        if name not in cls._wrapped:
+            raise AttributeError("type object 'internal_api' has no attribute '%s'" % name)
+        return getattr(pyblazing, cls._wrapped[name])
 
-    _get_client = pyblazing._get_client
-    SetupOrchestratorConnection = pyblazing.SetupOrchestratorConnection
+
+# TODO percy remove this one once we have the full port ready
+# this object should not have state and ultimately should stop existing
+class internal_api(metaclass=_lazy_wrappers):
 
     @staticmethod
     def register_file_system(client, authority, type, root, params = None):
@@ -31,17 +43,57 @@ class internal_api:
         return pyblazing.create_table(table_name, **kwargs)
 
     @staticmethod
-    def run_query_get_token(client, sql):
-        return pyblazing.run_query_get_token(sql)
+    def drop_table(client, table_name):
+        return pyblazing.drop_table(table_name)
+
+    @staticmethod
+    def run_query_get_token(client, sql, timing=None):
+        return pyblazing.run_query_get_token(sql, timing)
+
+    @staticmethod
+    def run_query_get_planned_token(client, sql, plan_cache, catalog_version, tables, timing=None):
+        return pyblazing.run_query_get_planned_token(sql, plan_cache, catalog_version, tables, timing)
+
+    @staticmethod
+    def run_query_get_results(client, metaToken, startTime, timing=None, columns=None, limit=None):
+        return pyblazing.run_query_get_results(metaToken, startTime, timing, columns, limit)
+
+    @staticmethod
+    def run_query_get_token_async(client, sql, timing=None):
+        return pyblazing.run_query_get_token_async(sql, timing)
+
+    @staticmethod
+    def run_query_get_results_async(client, metaToken, startTime, timing=None):
+        return pyblazing.run_query_get_results_async(metaToken, startTime, timing)
+
+    @staticmethod
+    def run_query_get_concat_results(client, metaToken, startTime, timing=None, transfer_ownership=False):
+        return pyblazing.run_query_get_concat_results(metaToken, startTime, timing, transfer_ownership)
+
+    @staticmethod
+    def iter_query_batches(client, metaToken, startTime, max_rows, max_bytes, timing=None):
+        return pyblazing.iter_query_batches(metaToken, startTime, max_rows, max_bytes, timing)
+
+    @staticmethod
+    def result_batches(gdf, max_rows, max_bytes):
+        return pyblazing.result_batches(gdf, max_rows, max_bytes)
+
+    @staticmethod
+    def iter_query_arrow_batches(client, metaToken, startTime, max_rows, timing=None):
+        return pyblazing.iter_query_arrow_batches(metaToken, startTime, max_rows, timing)
+
+    @staticmethod
+    def frame_arrow_batches(gdf, max_rows):
+        return pyblazing.frame_arrow_batches(gdf, max_rows)
 
     @staticmethod
-    def run_query_get_results(client, metaToken, startTime):
-        return pyblazing.run_query_get_results(metaToken, startTime)
+    def write_arrow_stream(sink, batches):
+        return pyblazing.write_arrow_stream(sink, batches)
 
     @staticmethod
-    def run_query_get_concat_results(client, metaToken, startTime):
-        return pyblazing.run_query_get_concat_results(metaToken, startTime)
+    def convert_to_dask(result,connection,transfer_ownership=False):
+        return pyblazing.convert_to_dask(result,connection,transfer_ownership)
 
     @staticmethod
-    def convert_to_dask(metaToken,connection):
-        return pyblazing.convert_to_dask(metaToken,connection)
+    def dask_result_meta(client, metaToken):
+        return pyblazing.dask_result_meta(metaToken)
@@ -0,0 +1,222 @@
+from collections import OrderedDict
+import re
+import threading
+
+
+# SQL reserved words, the only unquoted words whose case never matters (identifiers may be case sensitive)
+_keywords = frozenset("""
+    all and any as between both by case cast cross current_date current_time current_timestamp day distinct
+    else end escape except exists extract false fetch filter for from full group having hour in inner intersect
+    interval is join lateral leading left like minute month natural not null offset on or order outer over
+    partition right row rows second select similar some then trailing true union unknown unnest using values
+    when where window with year
+""".split())
+
+# string literals ('' escapes a quote), quoted identifiers ("" or `` escape the quote) and comments are
+# single tokens, an unterminated one runs to the end of the statement
+_sql_token = re.compile(r"""
+    '(?:[^']|'')*'? | "(?:[^"]|"")*"? | `(?:[^`]|``)*`? | --[^\n]*\n? | /\*.*?(?:\*/|$)
+    | [a-z_][a-z0-9_$]* | \s+ | .
+""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+
+def normalize_sql(sql):
+    """Canonical form of a statement used as cache key.
+
+    Whitespace runs are collapsed, reserved words are lowercased and trailing
+    semicolons are dropped. Identifiers, string literals, quoted identifiers
+    and comments are kept as they are, so statements that only differ in
+    their case are different keys.
+    """
+    parts = []
+    pending_space = False
+    for token in _sql_token.findall(sql.strip().rstrip(';').strip()):
+        if token.isspace():
+            pending_space = True
+            continue
+        if pending_space and parts:
+            parts.append(' ')
+        pending_space = False
+        if token.lower() in _keywords:
+            token = token.lower()
+        parts.append(token)
+    return ''.join(parts)
+
+
+class PlanCache:
+    """Bounded LRU cache of Calcite logical plans.
+
+    Plans are keyed on the normalized statement and the catalog version, so
+    any create_table or drop_table makes the previous plans unreachable (they
+    age out of the LRU order).
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql, catalog_version):
+        key = (normalize_sql(sql), catalog_version)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                self.misses = self.misses + 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits = self.hits + 1
+            return plan
+
+    def put(self, sql, catalog_version, plan):
+        key = (normalize_sql(sql), catalog_version)
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._plans), 'max_size': self.max_size}
+
+
+_string_literal = re.compile(r"'[^']*'")
+_identifier = re.compile(r'[a-z_][a-z0-9_]*', re.IGNORECASE)
+
+
+def referenced_tables(sql, table_names):
+    """Names of table_names that appear as identifiers in sql.
+
+    This is a superset check (a column named like a table also matches), which
+    only costs an extra invalidation.
+    """
+    text = _string_literal.sub('', normalize_sql(sql)).replace('"', '')
+    words = set(word.lower() for word in _identifier.findall(text))
+    return sorted(name for name in table_names if name.lower() in words)
+
+
+def frame_nbytes(gdf):
+    """Device memory held by a cudf DataFrame (data, null masks and string chars)."""
+    nbytes = 0
+    for name in gdf.columns:
+        column = gdf[name]._column
+        size = len(column)
+        if column.dtype == 'object':
+            # nvstrings: chars plus int32 offsets
+            nbytes = nbytes + column._data.byte_count() + 4 * (size + 1)
+        else:
+            nbytes = nbytes + size * column.dtype.itemsize
+        if column.has_null_mask:
+            nbytes = nbytes + (size + 7) // 8
+    return nbytes
+
+
+class CachedResult:
+
+    def __init__(self, columns, nbytes, tables, calciteTime, ralTime, totalTime, total_nodes):
+        self.columns = columns
+        self.nbytes = nbytes
+        self.tables = tables
+        self.calciteTime = calciteTime
+        self.ralTime = ralTime
+        self.totalTime = totalTime
+        self.total_nodes = total_nodes
+        self.uses = 0
+
+
+class ResultCache:
+    """Opt-in cache of query results, bounded by the device memory they use.
+
+    Results are keyed on the normalized statement plus the version of every
+    table it references, and dropped as soon as one of those tables is
+    created or dropped again. When the cache is over max_bytes the least
+    recently used (policy='lru') or least used (policy='lfu') entries are
+    evicted first. The cache keeps its own copy of the data, so freeing the
+    engine result or modifying the returned DataFrame does not affect it.
+    """
+
+    def __init__(self, max_bytes, policy='lru'):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError("Unknown result cache policy: " + str(policy))
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, sql, table_versions):
+        tables = referenced_tables(sql, table_versions.keys())
+        return (normalize_sql(sql), tuple((name, table_versions[name]) for name in tables))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses = self.misses + 1
+                return None
+            self._entries.move_to_end(key)
+            entry.uses = entry.uses + 1
+            self.hits = self.hits + 1
+            return entry
+
+    def put(self, key, columns, calciteTime, ralTime, totalTime, total_nodes):
+        nbytes = frame_nbytes(columns)
+        if nbytes > self.max_bytes:
+            return None
+
+        # the table versions are part of the key, the entry keeps the names for invalidate_table
+        entry = CachedResult(columns.copy(deep=True), nbytes,
+                             [name for name, _ in key[1]],
+                             calciteTime, ralTime, totalTime, total_nodes)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self.nbytes = self.nbytes + nbytes
+            while self.nbytes > self.max_bytes:
+                self._remove(self._victim(key))
+                self.evictions = self.evictions + 1
+        return entry
+
+    def invalidate_table(self, table_name):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if table_name in entry.tables]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._entries), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes}
+
+    # must be called with the lock held
+    def _victim(self, new_key):
+        candidates = [item for item in self._entries.items() if item[0] != new_key]
+        if self.policy == 'lru':
+            return candidates[0][0]
+        # least used, the least recently used one among those
+        return min(candidates, key=lambda item: item[1].uses)[0]
+
+    # must be called with the lock held
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes = self.nbytes - entry.nbytes
@@ -1,17 +1,19 @@
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import partial
 from urllib.parse import urlparse
 from pathlib import PurePath
 
-import cudf
-import pandas
-import pyarrow
-
 from .bridge import internal_api
+from pyblazing.transport import probe
 
 from .filesystem import FileSystem
 from .sql import SQL
 from .sql import ResultSet
+from .cache import PlanCache
+from .cache import ResultCache
+from .partitions import discover_partitions
 from .datasource import from_cudf
 from .datasource import from_pandas
 from .datasource import from_arrow
@@ -21,10 +23,20 @@ from .datasource import from_json
 from .datasource import from_orc
 from .datasource import from_result_set
 from .datasource import from_distributed_result_set
+from .datasource import DEFAULT_MAX_PRUNED_TABLES
 import time
 import socket, errno
 import subprocess
 import os
+import sys
+
+
+# cudf, pandas and pyarrow are only imported on first use. An object cannot be
+# an instance of a library that was never imported, so checking the input type
+# does not need to import them.
+def _is_type(input, module_name, type_name):
+    module = sys.modules.get(module_name)
+    return module is not None and type(input) == getattr(module, type_name)
 
 def checkSocket(socketNum):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -42,6 +54,50 @@ def checkSocket(socketNum):
     s.close()
     return socket_free
 
+# request is a protocol request the service answers once it handles requests (see
+# pyblazing.transport.probe), without one a service is ready when it accepts connections
+def isServiceReady(port, host='127.0.0.1', timeout=0.5, request=None):
+    if request is not None:
+        return probe(host, port, request, timeout)
+    try:
+        connection = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return False
+    connection.close()
+    return True
+
+# services maps a name to (port, process), process can be None for services that were already running.
+# requests maps a name to the request its service is probed with, see isServiceReady.
+# Returns the seconds each service took to be ready
+def waitForServices(services, timeout=60, poll_interval=0.05, requests=None):
+    if requests is None:
+        requests = {}
+    startTime = time.time()
+    pending = OrderedDict(services)
+    ready_times = OrderedDict()
+    while len(pending) > 0:
+        for name, (port, process) in list(pending.items()):
+            if process is not None and process.poll() is not None:
+                raise RuntimeError("blazingsql-" + name + " exited with code " + str(process.returncode) + " while starting")
+            if isServiceReady(port, request=requests.get(name)):
+                ready_times[name] = time.time() - startTime
+                del pending[name]
+
+        if len(pending) > 0:
+            if time.time() - startTime > timeout:
+                raise RuntimeError("Timed out after " + str(timeout) + " seconds waiting for " + ", ".join(pending.keys()) + " to start")
+            time.sleep(poll_interval)
+
+    return ready_times
+
+def terminateProcesses(processes):
+    for process in processes:
+        if (process is not None):
+            process.terminate()
+
+# The services are started on TCP ports: their command lines take no unix socket path in this tree, so local
+# services are reached over loopback TCP. Only the node connections an engine reports with a socket path go
+# through unix sockets (see pyblazing.transport.resolve_endpoint)
 def runEngine(network_interface = 'lo', processes = None):
     process = None
     if(checkSocket(9100)):
@@ -114,6 +170,14 @@ class CsvArgs():
         self.delimiter = ','
         self.nrows = -1
 
+    # the options the column names and types of the files depend on (see schemas.read_schema),
+    # None when they are given or can not be found without the engine
+    def schema_options(self):
+        if len(self.column_types) > 0 or self.delim_whitespace:
+            return None
+        return {'delimiter': self.delimiter, 'quotechar': self.quotechar, 'skiprows': self.skiprows,
+                'header': self.header, 'names': list(self.column_names)}
+
     # Validate input params
     def validation(self):
 
@@ -314,42 +378,79 @@ class OrcArgs():
 
 class BlazingContext(object):
 
-    def __init__(self, connection = 'localhost:8889', dask_client = None, run_orchestrator=True, run_engine=True, run_algebra=True, network_interface='lo', leave_processes_running=False):
+    def __init__(self, connection = 'localhost:8889', dask_client = None, run_orchestrator=True, run_engine=True, run_algebra=True, network_interface='lo', leave_processes_running=False, pool_max_size=8, pool_idle_timeout=60, plan_cache_size=0, result_cache_bytes=0, result_cache_policy='lru', startup_timeout=60, listing_cache_ttl=60, metadata_cache_dir=None):
         """
         :param connection: BlazingSQL cluster URL to connect to
             (e.g. 125.23.14.1:8889, blazingsql-gateway:7887).
+        :param pool_max_size: max number of connections kept open to each
+            orchestrator/engine endpoint
+        :param pool_idle_timeout: seconds an unused connection is kept open
+        :param plan_cache_size: number of logical plans to keep, 0 disables the
+            plan cache. Queries with a cached plan are sent straight to the
+            engine, only when there is no dask client and the orchestrator
+            answered the last query with a single engine
+        :param result_cache_bytes: device memory the query result cache can use,
+            0 disables it. Not used when there is a dask client
+        :param result_cache_policy: 'lru' or 'lfu' eviction of cached results
+        :param startup_timeout: seconds to wait for the started services to
+            answer requests. The time each one took is kept in startup_times
+        :param listing_cache_ttl: seconds the directory listings used to expand
+            create_table globs and directories are kept, 0 disables the cache
+        :param metadata_cache_dir: directory where metadata read from files
+            (parquet statistics, the column names and types of file tables) is
+            cached across runs, e.g. ~/.cache/pyblazing. None keeps it in memory only
         """
-        processes = None
-        if not leave_processes_running:
-            processes = []
-
-        if(dask_client is None):
-            if run_orchestrator:
-                processes = runOrchestrator(processes=processes)
-                time.sleep(1)            
-            if run_engine:
-                processes = runEngine(network_interface=network_interface, processes=processes)                
+        # services are launched right away and then polled until they answer a request,
+        # the engine is the only one that has to wait: it registers with the orchestrator on start
+        launched = []
+        services = OrderedDict()
+        startTime = time.time()
+        try:
             if run_algebra:
-                processes = runAlgebra(processes=processes)                
-        else:
+                runAlgebra(processes=launched)
+                services['algebra'] = (8890, launched[-1])
             if run_orchestrator:
-                processes = runOrchestrator(processes=processes)
-                time.sleep(1)
-            setupDask(dask_client)
-            if run_algebra:
-                processes = runAlgebra(network_interface=network_interface, processes=processes)
+                runOrchestrator(processes=launched)
+                services['orchestrator'] = (8889, launched[-1])
+                waitForServices({'orchestrator': (9100, launched[-1])}, timeout=startup_timeout)
+
+            if(dask_client is None):
+                if run_engine:
+                    runEngine(network_interface=network_interface, processes=launched)
+                    services['engine'] = (8891, launched[-1])
+            else:
+                setupDask(dask_client)
+
+            self.startup_times = waitForServices(services, timeout=startup_timeout,
+                                                 requests=internal_api.service_probe_requests())
+        except Exception:
+            if not leave_processes_running:
+                terminateProcesses(launched)
+            raise
+        self.startup_times['total'] = time.time() - startTime
+
+        processes = None
+        if not leave_processes_running:
+            processes = launched
 
         # NOTE ("//"+) is a neat trick to handle ip:port cases
         parse_result = urlparse("//" + connection)
         orchestrator_host_ip = parse_result.hostname
         orchestrator_port = parse_result.port
+        internal_api._get_client().configure_pool(max_size=pool_max_size, idle_timeout=pool_idle_timeout)
         internal_api.SetupOrchestratorConnection(orchestrator_host_ip, orchestrator_port)
 
         # TODO percy handle errors (see above)
         self.connection = connection
         self.client = internal_api._get_client()
-        self.fs = FileSystem()
-        self.sqlObject = SQL()
+        self.fs = FileSystem(listing_cache_ttl, metadata_cache_dir)
+        plan_cache = None
+        if plan_cache_size > 0:
+            plan_cache = PlanCache(plan_cache_size)
+        result_cache = None
+        if result_cache_bytes > 0:
+            result_cache = ResultCache(result_cache_bytes, result_cache_policy)
+        self.sqlObject = SQL(plan_cache, result_cache)
         self.dask_client = dask_client
         self.processes = processes
 
@@ -359,10 +460,9 @@ class BlazingContext(object):
         # del self.sqlObject
         # del self.fs
         # del self.client
-        if (self.processes is not None):
-            for process in self.processes:
-                if (process is not None):
-                    process.terminate()
+        # processes is not set when __init__ raised before starting the services
+        if (getattr(self, 'processes', None) is not None):
+            terminateProcesses(self.processes)
 
         pass
 
@@ -390,24 +490,21 @@ class BlazingContext(object):
 
     # BEGIN SQL interface
 
-    #remove
-    def create_table(self, table_name, input, **kwargs):
-        datasource = None
-
-        if type(input) == cudf.DataFrame:
-            datasource = from_cudf(input, table_name)
-        elif type(input) == pandas.DataFrame:
-            datasource = from_pandas(input, table_name)
-        elif type(input) == pyarrow.Table:
-            datasource = from_arrow(input, table_name)
+    # validates the create_table arguments and returns the function that loads and registers the table,
+    # so invalid arguments are reported before anything is sent to the orchestrator
+    def _table_loader(self, table_name, input, **kwargs):
+        if _is_type(input, 'cudf', 'DataFrame'):
+            return partial(from_cudf, input, table_name)
+        elif _is_type(input, 'pandas', 'DataFrame'):
+            return partial(from_pandas, input, table_name)
+        elif _is_type(input, 'pyarrow', 'Table'):
+            return partial(from_arrow, input, table_name)
         elif type(input) == internal_api.ResultSetHandle:
-            datasource = from_result_set(input, table_name)
+            return partial(from_result_set, input, table_name)
         elif hasattr(input, 'metaToken'):
-            datasource = from_distributed_result_set(input.metaToken,table_name)
+            return partial(from_distributed_result_set, input.metaToken,table_name)
         elif type(input) == str or type(input) == list:
             if type(input) == str:
-                uri = urlparse(input)
-                path = PurePath(uri.path)
                 paths = [input]
             else: # its a list
                 if len(input) == 0:
@@ -415,27 +512,49 @@ class BlazingContext(object):
                 elif type(input[0]) != str:
                     raise Exception("If input into create_table is a list, it is expecting a list of path strings")
                 else:
-                    uri = urlparse(input[0])
-                    path = PurePath(uri.path)
                     paths = input
 
+            # globs and directories become the files they contain, the format comes from the first one
+            paths = self.fs.expand(paths)
+            uri = urlparse(paths[0])
+            path = PurePath(uri.path)
+
+            # key=value directories become partition columns that queries can prune files with
+            partitions = None
+            if kwargs.get('hive_partitions', True):
+                partitions = discover_partitions(paths)
+            max_pruned_tables = kwargs.get('max_pruned_tables', DEFAULT_MAX_PRUNED_TABLES)
+            if type(max_pruned_tables) != int or max_pruned_tables < 1:
+                raise ValueError("'max_pruned_tables' must be an integer >= 1")
+
             fileFormat = kwargs.get('file_format', None)
+            # with cache_schema=True the column names and types are sent to the engine, so it does not read the
+            # files to find them. They come from the footers of parquet and orc files and are inferred from the
+            # first rows of csv and json files, and replace the types the engine would find
+            cache_schema = kwargs.get('cache_schema', False) is True
             if path.suffix == '.parquet' or fileFormat == 'parquet':
-                datasource = from_parquet(self.client, table_name, paths)
+                # min/max of every row group, queries skip the files that can not have rows they filter on
+                return self._file_table_loader(from_parquet, table_name, paths, partitions = partitions, max_pruned_tables = max_pruned_tables,
+                                               schema_format = 'parquet' if cache_schema else None, statistics = kwargs.get('statistics', False))
             elif path.suffix == '.json' or fileFormat == 'json':
                 json_lines = kwargs.get('lines', True)
                 if(json_lines == False):
                     raise Exception("Only lines=True is currently supported, optionally you can read the file with Pandas")
-                datasource = from_json(self.client, table_name, paths, json_lines)
+                return self._file_table_loader(from_json, table_name, paths, json_lines, partitions = partitions, max_pruned_tables = max_pruned_tables,
+                                               schema_format = 'json' if cache_schema else None)
             elif path.suffix == '.orc' or fileFormat == 'orc':
                 orc_args = OrcArgs(**kwargs)
                 orc_args.validation()
-                datasource = from_orc(self.client, table_name, paths, orc_args)
+                return self._file_table_loader(from_orc, table_name, paths, orc_args, partitions = partitions, max_pruned_tables = max_pruned_tables,
+                                               schema_format = 'orc' if cache_schema else None)
             elif path.suffix == '.csv' or path.suffix == '.psv' or path.suffix == '.tbl' or fileFormat == 'csv':
                 # TODO percy duplicated code bud itnernal api desing remove this later
                 csv_args = CsvArgs(paths, **kwargs)
                 csv_args.validation()
-                datasource = from_csv(self.client, table_name, paths, csv_args)
+                schema_options = csv_args.schema_options()
+                return self._file_table_loader(from_csv, table_name, paths, csv_args, partitions = partitions, max_pruned_tables = max_pruned_tables,
+                                               schema_format = 'csv' if cache_schema and schema_options is not None else None,
+                                               schema_options = schema_options)
             else:
                 raise Exception("Unknown file format, optionally you can set the file format by passing it as a parameter like: bc.create_table(\"/path/\", file_format = 'csv')")
         else :
@@ -443,20 +562,145 @@ class BlazingContext(object):
 
             # TODO percy dir
 
+    # the loader of a file table. The file metadata it sends (see FileSystem.schema and FileSystem.statistics) is
+    # only read when it runs, so create_tables reads it for every table concurrently, once they are all validated
+    def _file_table_loader(self, builder, table_name, paths, *args, schema_format = None, schema_options = None, statistics = False, **kwargs):
+        def load(**load_kwargs):
+            if schema_format is not None:
+                load_kwargs['schema'] = self.fs.schema(paths, schema_format, schema_options)
+            if statistics:
+                load_kwargs['statistics'] = self.fs.statistics(paths)
+            return builder(self.client, table_name, paths, *args, **kwargs, **load_kwargs)
+        return load
+
+    #remove
+    def create_table(self, table_name, input, **kwargs):
+        datasource = self._table_loader(table_name, input, **kwargs)()
+
         self.sqlObject.create_table(table_name, datasource)
 
         # TODO percy raise exption here or manage the error
 
         return None
 
+    def create_tables(self, tables):
+        """
+        Registers many tables at once.
+
+        :param tables: dict of table name to the create_table input, or to a
+               (input, kwargs) tuple when the table needs create_table
+               arguments, e.g. {'nation': '/data/nation.psv',
+               'orders': (['/data/orders_0.csv'], {'delimiter': '|'})}.
+        :return: dict with 'tables' (table name to valid, error_message and
+                 time, in milliseconds, of each registration), 'n_failed' and
+                 'totalTime' in milliseconds.
+
+        All the arguments are validated before any table is registered, one
+        invalid table raises an Exception naming every invalid table. The
+        registrations are then sent concurrently, up to the connection pool
+        size, and a failed registration does not stop the others.
+        """
+        startTime = time.time()
+
+        loaders = OrderedDict()
+        errors = []
+        for table_name, table in tables.items():
+            input, kwargs = table, {}
+            if type(table) == tuple and len(table) == 2 and type(table[1]) == dict:
+                input, kwargs = table
+            try:
+                loaders[table_name] = self._table_loader(table_name, input, **kwargs)
+            except Exception as error:
+                errors.append(table_name + ": " + str(error))
+        if len(errors) > 0:
+            raise Exception("Invalid create_tables arguments, no table was created. " + "; ".join(errors))
+
+        def load(table_name):
+            tableStart = time.time()
+            try:
+                datasource = loaders[table_name](raise_errors = True)
+                error_message = ''
+            except Exception as error:
+                datasource = None
+                error_message = str(error)
+            return datasource, error_message, (time.time() - tableStart) * 1000
+
+        results = OrderedDict()
+        n_failed = 0
+        max_workers = max(min(len(loaders), internal_api._get_client()._pool.max_size), 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for table_name, (datasource, error_message, tableTime) in zip(loaders.keys(), executor.map(load, loaders.keys())):
+                valid = datasource is not None and bool(datasource.valid)
+                if valid:
+                    # the catalog is only changed from this thread
+                    self.sqlObject.create_table(table_name, datasource)
+                else:
+                    n_failed = n_failed + 1
+                    if error_message == '':
+                        error_message = "Table " + table_name + " could not be created"
+                results[table_name] = {'valid': valid, 'error_message': error_message, 'time': tableTime}
+
+        return {'tables': results, 'n_failed': n_failed, 'totalTime': (time.time() - startTime) * 1000}
+
     def drop_table(self, table_name):
+        datasource = self.sqlObject.tables.get(table_name, None)
+        if datasource is not None:
+            datasource.drop_pruned_tables()
         return self.sqlObject.drop_table(table_name)
 
     # async
-    def sql(self, sql, table_list=[]):
+    # prefetch=True starts fetching the result in the background as soon as the query is dispatched,
+    # so result.get() returns without waiting once it is done (see ResultSet.prefetch)
+    def sql(self, sql, table_list=[], prefetch=False):
         if (len(table_list) > 0):
             print("NOTE: You no longer need to send a table list to the .sql() funtion")
-        return self.sqlObject.run_query(self.client, sql,self.dask_client)
+        return self.sqlObject.run_query(self.client, sql,self.dask_client, prefetch)
+
+    def plan_cache_stats(self):
+        if self.sqlObject.plan_cache is None:
+            return None
+        return self.sqlObject.plan_cache.stats()
+
+    def listing_cache_stats(self):
+        return self.fs.expander.stats()
+
+    def statistics_cache_stats(self):
+        return self.fs.statistics_index.cache.stats()
+
+    def schema_cache_stats(self):
+        return self.fs.schema_index.cache.stats()
+
+    # schemas are found again when files change size or modification time, call this when a file
+    # was rewritten in place with both unchanged. paths are the first files of tables, None is every table
+    def clear_schema_cache(self, paths=None):
+        self.fs.schema_index.invalidate(paths)
+
+    # directory listings are cached for listing_cache_ttl seconds, call this when files were added or removed
+    def clear_listing_cache(self):
+        self.fs.expander.clear()
+
+    # engine results held by this process that were not released yet: count, bytes and one entry per result
+    def live_results(self):
+        return internal_api._get_client().live_results()
+
+    def result_cache_stats(self):
+        if self.sqlObject.result_cache is None:
+            return None
+        return self.sqlObject.result_cache.stats()
+
+    # usage: result = await bc.sql_async(sql); gdf = await result.get_async()
+    async def sql_async(self, sql, prefetch=False):
+        return await self.sqlObject.run_query_async(self.client, sql, self.dask_client, prefetch)
+
+    # hook(timing, span) is called every time a phase of a query of this context ends, see pyblazing.timing.
+    # The full breakdown of a query is in result.timing (or result_set.timing)
+    def add_timing_hook(self, hook):
+        if hook not in self.sqlObject.timing_hooks:
+            self.sqlObject.timing_hooks.append(hook)
+
+    def remove_timing_hook(self, hook):
+        if hook in self.sqlObject.timing_hooks:
+            self.sqlObject.timing_hooks.remove(hook)
 
     # END SQL interface
 
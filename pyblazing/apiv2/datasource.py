@@ -1,10 +1,16 @@
+from collections import OrderedDict
 from enum import IntEnum
-
-import cudf
+import copy
+import threading
 
 from .bridge import internal_api
+from .partitions import pruned_table_name
+
+# pruned tables kept per file table, see DataSource.pruned_table
+DEFAULT_MAX_PRUNED_TABLES = 8
 
-# TODO BIG TODO percy blazing-io didn't expose the wildcard API of FileSystem API
+# blazing-io doesn't expose the wildcard API of FileSystem, globs and directories
+# are expanded into file lists before they get here (see listing.PathExpander)
 
 
 class Type(IntEnum):
@@ -33,6 +39,25 @@ class DataSource:
         self.parquet = None
         self.path = None
 
+        # when set, a failed registration raises instead of being printed and leaving valid falsy
+        self.raise_errors = kwargs.pop('raise_errors', False)
+
+        # hive style partitions of a file table (see partitions.Partitions), None when it is not partitioned.
+        # Queries that filter on the partition keys read an engine table with only the matching files
+        self.partitions = kwargs.pop('partitions', None)
+        # every distinct set of files a query reads is an engine table, at most this many are kept
+        self.max_pruned_tables = kwargs.pop('max_pruned_tables', DEFAULT_MAX_PRUNED_TABLES)
+        # parquet footer statistics (see statistics.TableStatistics), queries skip files that can not match with them
+        self.statistics = kwargs.pop('statistics', None)
+        self.table_name = kwargs.get('table_name', None)
+        # the load args keep the schema of file tables (see _schema_args), pruned tables have the same one
+        self._load_args = kwargs
+        # create_table kwargs of the table, the engine gets them with queries it runs without the orchestrator
+        self.table_args = None
+        # pruned table name -> its DataSource, the least recently used first
+        self._pruned_tables = OrderedDict()
+        self._pruned_lock = threading.Lock()
+
         # init the data source
         self.valid = self._load(type, **kwargs)
 
@@ -99,6 +124,52 @@ class DataSource:
     def is_from_file(self):
         return self.type == Type.parquet or self.type == Type.csv
 
+    def pruned_table(self, files, max_tables=None):
+        """Name of an engine table with only files of this one, registered on first use.
+
+        The last max_tables (max_pruned_tables by default) of them are kept, an older one is dropped
+        from the engine and registered again when it is needed.
+        """
+        if max_tables is None:
+            max_tables = self.max_pruned_tables
+        name = pruned_table_name(self.table_name, files)
+        with self._pruned_lock:
+            if name in self._pruned_tables:
+                self._pruned_tables.move_to_end(name)
+                return name
+
+        args = dict(self._load_args)
+        args['table_name'] = name
+        args['path'] = files
+        table = DataSource(self.client, self.type, raise_errors = True, **args)
+
+        evicted = []
+        with self._pruned_lock:
+            self._pruned_tables[name] = table
+            while len(self._pruned_tables) > max_tables:
+                evicted.append(self._pruned_tables.popitem(last=False)[0])
+        self._drop_tables(evicted)
+        return name
+
+    def pruned_tables(self):
+        with self._pruned_lock:
+            return list(self._pruned_tables.values())
+
+    # drops every pruned table from the engine, when the table itself is dropped
+    def drop_pruned_tables(self):
+        with self._pruned_lock:
+            names = list(self._pruned_tables.keys())
+            self._pruned_tables.clear()
+        self._drop_tables(names)
+
+    def _drop_tables(self, names):
+        for name in names:
+            try:
+                internal_api.drop_table(self.client, name)
+            except Exception as error:
+                # the engine keeps an unused table
+                print("WARNING: could not drop the pruned table " + name + ": " + str(error))
+
     def dataframe(self):
         # TODO percy add more support
 
@@ -148,21 +219,21 @@ class DataSource:
         elif type == Type.csv:
             path = kwargs.get('path', None)
             csv_args = kwargs.get('csv_args', None)
-            return self._load_csv(table_name, path, csv_args)
+            return self._load_csv(table_name, path, csv_args, kwargs.get('schema', None))
         elif type == Type.parquet:
             table_name = kwargs.get('table_name', None)
             path = kwargs.get('path', None)
-            return self._load_parquet(table_name, path)
+            return self._load_parquet(table_name, path, kwargs.get('schema', None))
         elif type == Type.json:
             table_name = kwargs.get('table_name', None)
             path = kwargs.get('path', None)
             json_lines = kwargs.get('json_lines', True)
-            return self._load_json(table_name, path, json_lines)
+            return self._load_json(table_name, path, json_lines, kwargs.get('schema', None))
         elif type == Type.orc:
             table_name = kwargs.get('table_name', None)
             path = kwargs.get('path', None)
             orc_args = kwargs.get('orc_args', None)
-            return self._load_orc(table_name, path, orc_args)
+            return self._load_orc(table_name, path, orc_args, kwargs.get('schema', None))
         else:
             # TODO percy manage errors
             raise Exception("invalid datasource type")
@@ -176,8 +247,7 @@ class DataSource:
 
         column_names = list(cudf_df.dtypes.index)
         column_dtypes = [internal_api.get_np_dtype_to_gdf_dtype(x) for x in cudf_df.dtypes]
-        return_result = internal_api.create_table(
-            self.client,
+        return_result = self._create_table(
             table_name,
             type = internal_api.SchemaFrom.Gdf,
             names = column_names,
@@ -191,14 +261,19 @@ class DataSource:
         return self.valid
 
     def _load_pandas_df(self, table_name, pandas_df):
+        import cudf
+
         cudf_df = cudf.DataFrame.from_pandas(pandas_df)
 
         return self._load_cudf_df(table_name, cudf_df)
 
+    # straight from the Arrow buffers to the GPU, see pyblazing.arrow.ingest_table
     def _load_arrow_table(self, table_name, arrow_table):
-        pandas_df = arrow_table.to_pandas()
+        from pyblazing import arrow
 
-        return self._load_pandas_df(table_name, pandas_df)
+        cudf_df = arrow.table_to_frame(arrow_table)
+
+        return self._load_cudf_df(table_name, cudf_df)
 
     def _load_result_set(self, table_name, result_set):
         cudf_df = result_set.columns
@@ -207,8 +282,7 @@ class DataSource:
 
     def _load_distributed_result_set(self, table_name, distributed_result_set):
         print(distributed_result_set)
-        internal_api.create_table(
-            self.client,
+        self._create_table(
             table_name,
             type = internal_api.SchemaFrom.Distributed,
             resultToken = distributed_result_set[0].resultToken
@@ -219,14 +293,31 @@ class DataSource:
         return self.valid
 
 
-    def _load_csv(self, table_name, path, csv_args):
+    # registers the table in the engine, keeping the args for the table group of planned queries (see SQL.table_args)
+    def _create_table(self, table_name, **kwargs):
+        self.table_args = kwargs
+        return internal_api.create_table(self.client, table_name, raise_errors = self.raise_errors, **kwargs)
+
+    # names and dtypes create_table args of the (names, types) of a file table (see schemas.SchemaIndex),
+    # the engine only reads the files to find them when there are none
+    def _schema_args(self, schema):
+        if schema is None:
+            return {}
+        names, types = schema
+        return {'names': names, 'dtypes': internal_api.get_dtype_values(types)}
+
+    def _load_csv(self, table_name, path, csv_args, schema=None):
         if path == None:
             return False
 
         self.path = path
 
-        return_result = internal_api.create_table(
-            self.client,
+        if schema is not None:
+            # the bridge sends the names and types of the csv args
+            csv_args = copy.copy(csv_args)
+            csv_args.column_names, csv_args.column_types = schema
+
+        return_result = self._create_table(
             table_name,
             type = internal_api.SchemaFrom.CsvFile,
             path = path,
@@ -239,18 +330,18 @@ class DataSource:
 
         return self.valid
 
-    def _load_parquet(self, table_name, path):
+    def _load_parquet(self, table_name, path, schema=None):
         # TODO percy manage datasource load errors
         if path == None:
             return False
 
         self.path = path
 
-        return_result = internal_api.create_table(
-            self.client,
+        return_result = self._create_table(
             table_name,
             type = internal_api.SchemaFrom.ParquetFile,
-            path = path
+            path = path,
+            **self._schema_args(schema)
         )
 
         # TODO percy see if we need to perform sanity check for arrow_table object
@@ -259,19 +350,19 @@ class DataSource:
 
         return self.valid
 
-    def _load_json(self, table_name, path, lines):
+    def _load_json(self, table_name, path, lines, schema=None):
         # TODO percy manage datasource load errors
         if path == None:
             return False
 
         self.path = path
 
-        return_result = internal_api.create_table(
-            self.client,
+        return_result = self._create_table(
             table_name,
             type = internal_api.SchemaFrom.JsonFile,
             path = path,
-            lines = lines
+            lines = lines,
+            **self._schema_args(schema)
         )
 
         # TODO percy see if we need to perform sanity check for arrow_table object
@@ -280,19 +371,19 @@ class DataSource:
 
         return self.valid
 
-    def _load_orc(self, table_name, path, orc_args):
+    def _load_orc(self, table_name, path, orc_args, schema=None):
         # TODO percy manage datasource load errors
         if path == None:
             return False
 
         self.path = path
 
-        return_result = internal_api.create_table(
-            self.client,
+        return_result = self._create_table(
             table_name,
             type = internal_api.SchemaFrom.OrcFile,
             path = path,
-            orc_args = orc_args
+            orc_args = orc_args,
+            **self._schema_args(schema)
         )
 
         # TODO percy see if we need to perform sanity check for arrow_table object
@@ -305,35 +396,35 @@ class DataSource:
 # BEGIN DataSource builders
 
 
-def from_cudf(cudf_df, table_name):
-    return DataSource(None, Type.cudf, table_name = table_name, cudf_df = cudf_df)
+def from_cudf(cudf_df, table_name, **kwargs):
+    return DataSource(None, Type.cudf, table_name = table_name, cudf_df = cudf_df, **kwargs)
 
-def from_pandas(pandas_df, table_name):
-    return DataSource(None, Type.pandas, table_name = table_name, pandas_df = pandas_df)
+def from_pandas(pandas_df, table_name, **kwargs):
+    return DataSource(None, Type.pandas, table_name = table_name, pandas_df = pandas_df, **kwargs)
 
-def from_arrow(arrow_table, table_name):
-    return DataSource(None, Type.arrow, table_name = table_name, arrow_table = arrow_table)
+def from_arrow(arrow_table, table_name, **kwargs):
+    return DataSource(None, Type.arrow, table_name = table_name, arrow_table = arrow_table, **kwargs)
 
-def from_result_set(result_set, table_name):
-    return DataSource(None, Type.result_set, table_name = table_name, result_set = result_set)
+def from_result_set(result_set, table_name, **kwargs):
+    return DataSource(None, Type.result_set, table_name = table_name, result_set = result_set, **kwargs)
 
-def from_distributed_result_set(result_set, table_name):
-    return DataSource(None, Type.distributed_result_set, table_name = table_name, result_set = result_set)
+def from_distributed_result_set(result_set, table_name, **kwargs):
+    return DataSource(None, Type.distributed_result_set, table_name = table_name, result_set = result_set, **kwargs)
 
-def from_csv(client, table_name, path, csv_args):
+def from_csv(client, table_name, path, csv_args, **kwargs):
     return DataSource(client, Type.csv,
         table_name = table_name,
         path = path,
-        csv_args = csv_args
+        csv_args = csv_args,
+        **kwargs
     )
 
-# TODO percy path (with wildcard support) is file system transparent
-def from_parquet(client, table_name, path):
-    return DataSource(client, Type.parquet, table_name = table_name, path = path)
+def from_parquet(client, table_name, path, **kwargs):
+    return DataSource(client, Type.parquet, table_name = table_name, path = path, **kwargs)
 
-def from_json(client, table_name, path, lines):
-    return DataSource(client, Type.json, table_name = table_name, path = path, json_lines = lines)
+def from_json(client, table_name, path, lines, **kwargs):
+    return DataSource(client, Type.json, table_name = table_name, path = path, json_lines = lines, **kwargs)
 
-def from_orc(client, table_name, path, orc_args):
-    return DataSource(client, Type.orc, table_name = table_name, path = path, orc_args = orc_args)
+def from_orc(client, table_name, path, orc_args, **kwargs):
+    return DataSource(client, Type.orc, table_name = table_name, path = path, orc_args = orc_args, **kwargs)
 # END DataSource builders
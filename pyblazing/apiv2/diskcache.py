@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class DiskCache:
+    """JSON metadata about files, kept on disk under directory/namespace.
+
+    Every entry belongs to one file path and carries the signature of the
+    file it was computed from (e.g. its size and modification time), an
+    entry whose signature does not match the file anymore is a miss. Entries
+    are written atomically, so concurrent processes can share the directory.
+    Reads are also kept in memory. directory=None keeps everything in memory.
+    """
+
+    def __init__(self, directory, namespace):
+        self.directory = None
+        if directory is not None:
+            self.directory = os.path.join(directory, namespace)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        return os.path.join(self.directory, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, path, signature):
+        """The value stored for path, None when there is none for this signature."""
+        signature = list(signature)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None and self.directory is not None:
+            try:
+                with open(self._file(path)) as file:
+                    entry = json.load(file)
+            except (OSError, ValueError):
+                entry = None
+        with self._lock:
+            if entry is None or entry['path'] != path:
+                self.misses = self.misses + 1
+                return None
+            if entry['signature'] != signature:
+                self.misses = self.misses + 1
+                self.invalidations = self.invalidations + 1
+                self._entries.pop(path, None)
+                return None
+            self._entries[path] = entry
+            self.hits = self.hits + 1
+            return entry['value']
+
+    def put(self, path, signature, value):
+        entry = {'path': path, 'signature': list(signature), 'value': value}
+        with self._lock:
+            self._entries[path] = entry
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(entry, file)
+            os.replace(temporary, self._file(path))
+        except OSError as error:
+            # the cache is only an optimization
+            print("WARNING: could not write the metadata cache in " + self.directory + ": " + str(error))
+
+    def invalidate(self, paths=None):
+        """Drops the entries of paths, of every path when paths is None."""
+        with self._lock:
+            if paths is None:
+                self._entries.clear()
+                everything = True
+            else:
+                for path in paths:
+                    self._entries.pop(path, None)
+                everything = False
+        if self.directory is None:
+            return
+        if everything and os.path.isdir(self.directory):
+            names = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        else:
+            names = [self._file(path) for path in paths]
+        for name in names:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                    'size': len(self._entries), 'directory': self.directory}
@@ -2,12 +2,22 @@ from collections import OrderedDict
 from enum import Enum
 
 from .bridge import internal_api
+from .listing import LocalLister, PathExpander, authority, make_lister, split_path
+from .schemas import SchemaIndex
+from .statistics import StatisticsIndex
 
 
 class FileSystem(object):
 
-    def __init__(self):
+    def __init__(self, listing_ttl=60, metadata_cache_dir=None):
         self.file_systems = OrderedDict()
+        # expands globs and directories of create_table paths, see PathExpander
+        self.expander = PathExpander(ttl=listing_ttl)
+        # parquet footer statistics of file tables, cached in metadata_cache_dir
+        self.statistics_index = StatisticsIndex(metadata_cache_dir)
+        # column names and types of file tables, cached in metadata_cache_dir
+        self.schema_index = SchemaIndex(metadata_cache_dir)
+        self._listers = {}
 
     def __repr__(self):
         return "TODO"
@@ -27,6 +37,7 @@ class FileSystem(object):
 
         fs = OrderedDict()
         fs['type'] = 'local'
+        fs['root'] = root
 
         # TODO percy manage exceptions here ?
         self._register_localfs(client, prefix, root, fs)
@@ -45,6 +56,7 @@ class FileSystem(object):
 
         fs = OrderedDict()
         fs['type'] = 'hdfs'
+        fs['root'] = root
         fs['host'] = host
         fs['port'] = port
         fs['user'] = user
@@ -69,6 +81,7 @@ class FileSystem(object):
 
         fs = OrderedDict()
         fs['type'] = 's3'
+        fs['root'] = root
         fs['bucket_name'] = bucket_name
         fs['access_key_id'] = access_key_id
         fs['secret_key'] = secret_key
@@ -81,6 +94,33 @@ class FileSystem(object):
 
         return fs
 
+    def expand(self, paths):
+        """The files matched by paths (globs, directories or files) on the registered file systems."""
+        return self.expander.expand(paths, self._lister, self.file_systems)
+
+    def statistics(self, paths):
+        """statistics.TableStatistics of parquet files, read from their footers (or the metadata cache)."""
+        return self.statistics_index.build(paths, self._resolve)
+
+    def schema(self, paths, format, options=None):
+        """(names, types) of a table of files (see schemas.SchemaIndex), None when the engine has to find them."""
+        return self.schema_index.schema(paths, format, self._resolve, options)
+
+    # the lister a path is read through, and the path for it
+    def _resolve(self, path):
+        prefix, file_path = split_path(path, self.file_systems)
+        return self._lister(prefix), file_path
+
+    def _lister(self, prefix):
+        if prefix == '':
+            return LocalLister()
+        name = authority(prefix)
+        if name not in self._listers:
+            if name not in self.file_systems:
+                raise Exception("No file system registered for " + prefix + ", register it with localfs, hdfs or s3")
+            self._listers[name] = make_lister(self.file_systems[name])
+        return self._listers[name]
+
     def _verify_prefix(self, prefix):
         # TODO percy throw exception
         if prefix in self.file_systems:
@@ -0,0 +1,240 @@
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from urllib.parse import urlparse
+import os
+import posixpath
+import threading
+import time
+
+
+def has_magic(path):
+    return any(char in path for char in '*?[')
+
+
+# Spark/Hive bookkeeping files (_SUCCESS, _metadata, .crc) are not data,
+# they are only listed when the pattern asks for them explicitly. Partition
+# directories are data even when the key starts with _ (or is null, key=__HIVE_DEFAULT_PARTITION__)
+def _is_hidden(name):
+    return (name.startswith('.') or name.startswith('_')) and '=' not in name
+
+
+class LocalLister:
+    """Lists directories of the local file system, paths are relative to root (None for plain paths)."""
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def _real(self, path):
+        if self.root is None:
+            return path or '.'
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def list(self, path):
+        entries = []
+        with os.scandir(self._real(path)) as scan:
+            for entry in scan:
+                entries.append((entry.name, entry.is_dir()))
+        return entries
+
+    def is_dir(self, path):
+        return os.path.isdir(self._real(path))
+
+    # (size, modification time), what file metadata caches are keyed on
+    def info(self, path):
+        stat = os.stat(self._real(path))
+        return stat.st_size, stat.st_mtime_ns
+
+    def open(self, path):
+        return open(self._real(path), 'rb')
+
+
+class ArrowLister:
+    """Lists directories through a pyarrow.fs file system (hdfs, s3), paths are relative to root."""
+
+    def __init__(self, filesystem, root=''):
+        self.filesystem = filesystem
+        self.root = root.rstrip('/')
+
+    def _real(self, path):
+        return self.root + '/' + path.lstrip('/')
+
+    def list(self, path):
+        from pyarrow import fs
+
+        infos = self.filesystem.get_file_info(fs.FileSelector(self._real(path), recursive=False))
+        return [(posixpath.basename(info.path), info.type == fs.FileType.Directory) for info in infos]
+
+    def is_dir(self, path):
+        from pyarrow import fs
+
+        return self.filesystem.get_file_info(self._real(path)).type == fs.FileType.Directory
+
+    def info(self, path):
+        info = self.filesystem.get_file_info(self._real(path))
+        return info.size, info.mtime_ns
+
+    def open(self, path):
+        return self.filesystem.open_input_file(self._real(path))
+
+
+def make_lister(fs):
+    """Lister for a file system registered with FileSystem (the OrderedDict it keeps per prefix)."""
+    root = fs.get('root', '/')
+    if fs['type'] == 'local':
+        return LocalLister(root)
+    if fs['type'] == 'hdfs':
+        from pyarrow import fs as arrow_fs
+
+        filesystem = arrow_fs.HadoopFileSystem(fs['host'], fs['port'], user=fs['user'] or None,
+                                               kerb_ticket=fs['kerberos_ticket'] or None)
+        return ArrowLister(filesystem, root)
+    if fs['type'] == 's3':
+        from pyarrow import fs as arrow_fs
+
+        filesystem = arrow_fs.S3FileSystem(access_key=fs['access_key_id'] or None, secret_key=fs['secret_key'] or None,
+                                           session_token=fs['session_token'] or None)
+        return ArrowLister(filesystem, fs['bucket_name'] + '/' + root.strip('/'))
+    raise ValueError("Can not list files of a " + str(fs['type']) + " file system")
+
+
+def split_path(path, mounts=()):
+    """(prefix, path): 'hdfs://tpch/a/b' -> ('hdfs://tpch', '/a/b'), 'tpch:/a/b' -> ('tpch:', '/a/b'),
+    '/tpch/a/b' -> ('/tpch', '/a/b') when tpch is in mounts, any other plain path
+    has an empty prefix. The prefix names the registered file system."""
+    uri = urlparse(path)
+    if uri.netloc != '':
+        return uri.scheme + '://' + uri.netloc, path[len(uri.scheme) + 3 + len(uri.netloc):]
+    if uri.scheme != '' and len(uri.scheme) > 1:
+        # a one letter scheme is a windows drive, not a file system
+        return uri.scheme + ':', path[len(uri.scheme) + 1:]
+    if path.startswith('/'):
+        name = path.split('/')[1]
+        if name in mounts:
+            return '/' + name, path[len(name) + 1:]
+    return '', path
+
+
+def authority(prefix):
+    """The registered file system name of a prefix returned by split_path."""
+    if prefix.endswith(':'):
+        return prefix[:-1]
+    if prefix.startswith('/'):
+        return prefix[1:]
+    return urlparse(prefix).netloc
+
+
+class PathExpander:
+    """Expands globs and directories of create_table paths into the files they contain.
+
+    Patterns support *, ?, [...] in any path component and ** for any number
+    of directories, a directory (or a path ending with /) stands for every
+    file under it. Files and directories starting with . or _ are skipped
+    unless the pattern names them. Paths without wildcards that have a file
+    suffix are passed as they are, without any I/O. The directories of one
+    level of the pattern are listed concurrently, and listings are cached for
+    ttl seconds (0 disables the cache). The files of every input path are
+    returned sorted, in the order of the inputs, without duplicates.
+    """
+
+    def __init__(self, ttl=60, max_workers=16):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def expand(self, paths, lister_for, mounts=()):
+        """paths is a list of path strings, lister_for(prefix) returns the lister of a path
+        prefix (see split_path, mounts are the file systems addressed as /name/...)."""
+        expanded = []
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for path in paths:
+                prefix, file_path = split_path(path, mounts)
+                files = self._expand_one(prefix, file_path, lister_for, executor)
+                if len(files) == 0:
+                    raise Exception("No files found for path " + path)
+                for file in files:
+                    if file not in seen:
+                        seen.add(file)
+                        expanded.append(file)
+        return expanded
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+    def __len__(self):
+        return len(self._listings)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._listings), 'ttl': self.ttl}
+
+    def _expand_one(self, prefix, path, lister_for, executor):
+        if not has_magic(path) and not path.endswith('/') and posixpath.splitext(path)[1] != '':
+            return [prefix + path]
+
+        lister = lister_for(prefix)
+
+        if not has_magic(path):
+            if not lister.is_dir(path):
+                return [prefix + path]
+            path = path.rstrip('/') + '/**'
+
+        parts = [part for part in path.split('/') if part != '']
+        dirs = ['/' if path.startswith('/') else '']
+        for index, part in enumerate(parts):
+            last = index == len(parts) - 1
+            if part == '**':
+                dirs = self._walk(prefix, lister, dirs, executor)
+                if last:
+                    return sorted(prefix + file for file in self._match(prefix, lister, dirs, '*', False, executor))
+            elif not has_magic(part) and not last:
+                dirs = [posixpath.join(dir, part) for dir in dirs]
+            else:
+                matches = self._match(prefix, lister, dirs, part, not last, executor)
+                if last:
+                    return sorted(prefix + file for file in matches)
+                dirs = matches
+        return []
+
+    # entries of the directories that match pattern, directories or files
+    def _match(self, prefix, lister, dirs, pattern, want_dirs, executor):
+        matches = []
+        for dir, entries in zip(dirs, executor.map(lambda dir: self._list(prefix, lister, dir), dirs)):
+            for name, is_dir in entries:
+                if is_dir != want_dirs or not fnmatchcase(name, pattern):
+                    continue
+                if _is_hidden(name) and not _is_hidden(pattern):
+                    continue
+                matches.append(posixpath.join(dir, name))
+        return matches
+
+    # dirs and all the directories under them, a level at a time
+    def _walk(self, prefix, lister, dirs, executor):
+        found = list(dirs)
+        level = dirs
+        while len(level) > 0:
+            level = self._match(prefix, lister, level, '*', True, executor)
+            found.extend(level)
+        return found
+
+    def _list(self, prefix, lister, dir):
+        key = (prefix, dir)
+        now = time.time()
+        with self._lock:
+            entry = self._listings.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits = self.hits + 1
+                return entry[1]
+            self.misses = self.misses + 1
+        try:
+            entries = lister.list(dir)
+        except FileNotFoundError:
+            entries = []
+        if self.ttl > 0:
+            with self._lock:
+                self._listings[key] = (now + self.ttl, entries)
+        return entries
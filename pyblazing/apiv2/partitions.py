@@ -0,0 +1,601 @@
+from collections import OrderedDict
+from urllib.parse import unquote
+import hashlib
+import re
+
+# value Hive and Spark use for a null partition key
+HIVE_NULL = '__HIVE_DEFAULT_PARTITION__'
+
+_integer = re.compile(r'^[+-]?[0-9]+$')
+_float = re.compile(r'^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$')
+_date = re.compile(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$')
+
+
+def partition_keys(path):
+    """The key=value directories of path, in order: '/t/date=2026-10-01/region=eu/part-0.parquet'
+    -> OrderedDict(date='2026-10-01', region='eu'). A null partition has the value None."""
+    keys = OrderedDict()
+    for part in path.split('/')[:-1]:
+        if '=' in part:
+            key, value = part.split('=', 1)
+            value = unquote(value)
+            keys[unquote(key)] = None if value == HIVE_NULL else value
+    return keys
+
+
+def _infer_type(values):
+    values = [value for value in values if value is not None]
+    if len(values) == 0:
+        return 'string'
+    if all(_integer.match(value) for value in values):
+        return 'int64'
+    if all(_float.match(value) for value in values):
+        return 'float64'
+    if all(_date.match(value) for value in values):
+        return 'date'
+    return 'string'
+
+
+def _to_type(value, type):
+    """A partition value (a str) as a comparable value of its key type."""
+    if value is None:
+        return None
+    if type == 'int64':
+        if _integer.match(value):
+            return int(value)
+        if _float.match(value):
+            return float(value)
+        return None
+    if type == 'float64':
+        return float(value) if _float.match(value) else None
+    if type == 'date':
+        # ISO dates compare like the dates they are
+        return value if _date.match(value) else None
+    return value
+
+
+def literal_to_type(literal, type):
+    """A statement literal (a str for strings, int or float for numbers) as a comparable value of
+    a partition key type, None when the comparison is not a plain one for that type."""
+    if isinstance(literal, str):
+        # the engine casts a string compared with a number
+        return _to_type(literal, type)
+    if type in ('int64', 'float64'):
+        return literal
+    return None
+
+
+class Partitions:
+    """Hive style partitions of a file table: every file with the values of its key=value directories.
+
+    keys are the partition columns in directory order, types maps each one to
+    'int64', 'float64', 'date' or 'string', inferred from all its values. Like
+    Hive, the files do not have these columns, queries can only prune files
+    with them (see column_filters).
+    """
+
+    def __init__(self, files, keys, values):
+        self.files = files
+        self.keys = keys
+        self.values = values
+        self.types = OrderedDict((key, _infer_type([row[i] for row in values])) for i, key in enumerate(keys))
+
+    def __len__(self):
+        return len(self.files)
+
+    def applies(self, filter):
+        """Whether a (key, op, values) filter compares its key with literals of the key type."""
+        key, _, values = filter
+        return all(literal_to_type(value, self.types[key]) is not None for value in values)
+
+    def select(self, filters):
+        """The files whose partition values pass every (key, op, values) filter, see column_filters
+        and applies."""
+        typed = [(self.keys.index(key), op, [literal_to_type(value, self.types[key]) for value in values])
+                 for key, op, values in filters]
+        files = []
+        for file, row in zip(self.files, self.values):
+            passes = True
+            for index, op, values in typed:
+                if not _compare(_to_type(row[index], self.types[self.keys[index]]), op, values):
+                    passes = False
+                    break
+            if passes:
+                files.append(file)
+        return files
+
+
+def discover_partitions(paths):
+    """Partitions of paths when every one of them has the same key=value directories, None otherwise."""
+    if len(paths) == 0:
+        return None
+    keys = list(partition_keys(paths[0]).keys())
+    if len(keys) == 0:
+        return None
+    values = []
+    for path in paths:
+        path_keys = partition_keys(path)
+        if list(path_keys.keys()) != keys:
+            raise Exception("Inconsistent partition directories: " + paths[0] + " and " + path + " do not have the same keys")
+        values.append(tuple(path_keys.values()))
+    return Partitions(list(paths), keys, values)
+
+
+def _compare(value, op, values):
+    # SQL semantics: a comparison with null is not true, so null partitions never pass
+    if value is None:
+        return False
+    try:
+        if op == '=':
+            return value == values[0]
+        if op == '<>':
+            return value != values[0]
+        if op == '<':
+            return value < values[0]
+        if op == '<=':
+            return value <= values[0]
+        if op == '>':
+            return value > values[0]
+        if op == '>=':
+            return value >= values[0]
+        if op == 'in':
+            return value in values
+        if op == 'not in':
+            return value not in values
+        if op == 'between':
+            return values[0] <= value <= values[1]
+    except TypeError:
+        # a float key compared with an int literal compares fine, anything else keeps the file
+        return True
+    return True
+
+
+# Statement tokens, good enough to find the predicates on partition keys. Anything
+# that is not understood stops the pruning instead of risking a wrong result.
+
+_token = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>[0-9]+\.?[0-9]*(?:[eE][+-]?[0-9]+)?|\.[0-9]+(?:[eE][+-]?[0-9]+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<op><=|>=|<>|!=|\|\||.)
+""", re.VERBOSE | re.DOTALL)
+
+_set_operations = {'union', 'intersect', 'except', 'minus'}
+_clauses = {'select', 'from', 'where', 'group', 'having', 'order', 'limit', 'offset', 'fetch', 'window'}
+_not_aliases = _clauses | _set_operations | {'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural',
+                                            'on', 'using', 'lateral', 'as'}
+_comparisons = {'=', '<>', '!=', '<', '<=', '>', '>='}
+_flipped = {'=': '=', '<>': '<>', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+class _Token:
+
+    def __init__(self, kind, text, start, end, depth):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        self.depth = depth
+        self.lower = text.lower() if kind == 'word' else text
+
+    def is_word(self, *words):
+        return self.kind == 'word' and self.lower in words
+
+
+def _tokenize(sql):
+    tokens = []
+    depth = 0
+    for match in _token.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        text = match.group(kind)
+        if text == ')':
+            depth = depth - 1
+        tokens.append(_Token(kind, text, match.start(), match.end(), depth))
+        if text == '(':
+            depth = depth + 1
+    return tokens
+
+
+def _identifier(token):
+    if token.kind == 'quoted':
+        return token.text[1:-1].replace('""', '"')
+    if token.kind == 'word':
+        return token.text
+    return None
+
+
+def _same_name(token, name):
+    if token.kind == 'quoted':
+        return _identifier(token) == name
+    return token.kind == 'word' and token.lower == name.lower()
+
+
+class TableReference:
+    """Where a table is named in a statement: the character range of its name, its alias and the depth."""
+
+    def __init__(self, start, end, alias, depth):
+        self.start = start
+        self.end = end
+        self.alias = alias
+        self.depth = depth
+
+
+class _Columns:
+    """How partition columns can be named in a condition: their keys, the names they can be qualified with
+    and whether they have to be qualified (when the statement reads more than one table)."""
+
+    def __init__(self, keys, qualifiers, qualified):
+        self.keys = keys
+        self.qualifiers = qualifiers
+        self.qualified = qualified
+
+
+def _table_references(tokens, table_name):
+    references = []
+    clause = {}
+    for index, token in enumerate(tokens):
+        if token.kind == 'word' and token.lower in _clauses:
+            clause[token.depth] = token.lower
+            continue
+        if not _same_name(token, table_name) or clause.get(token.depth) != 'from':
+            continue
+        position = index - 1
+        if position >= 1 and tokens[position].text == '.':
+            # schema qualified, main.t
+            position = position - 2
+        if position < 0 or not (tokens[position].is_word('from', 'join') or tokens[position].text == ','):
+            continue
+        if index + 1 < len(tokens) and tokens[index + 1].text == '.':
+            continue
+        alias = None
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if following is not None and following.is_word('as') and index + 2 < len(tokens):
+            alias = _identifier(tokens[index + 2])
+        elif following is not None and following.kind in ('word', 'quoted') and following.lower not in _not_aliases:
+            alias = _identifier(following)
+        references.append(TableReference(token.start, token.end, alias, token.depth))
+    return references
+
+
+# whether the FROM of the outer statement reads more than one table
+def _has_joins(tokens):
+    clause = None
+    for token in tokens:
+        if token.depth != 0:
+            continue
+        if token.kind == 'word' and token.lower in _clauses:
+            clause = token.lower
+        elif clause == 'from' and (token.is_word('join') or token.text == ','):
+            return True
+    return False
+
+
+# whether the FROM of the outer statement has a LEFT, RIGHT or FULL join, a condition on a table of it
+# does not filter the rows of that table alone
+def _has_outer_joins(tokens):
+    clause = None
+    for token in tokens:
+        if token.depth != 0:
+            continue
+        if token.kind == 'word' and token.lower in _clauses:
+            clause = token.lower
+        elif clause == 'from' and token.is_word('left', 'right', 'full', 'outer'):
+            return True
+    return False
+
+
+def _from_tables(tokens):
+    """Names of the tables in the FROM clauses of the statement, of the outer one and of any subquery."""
+    names = []
+    clause = {}
+    for index, token in enumerate(tokens):
+        if token.kind == 'word' and token.lower in _clauses:
+            clause[token.depth] = token.lower
+            continue
+        if index == 0 or token.kind not in ('word', 'quoted') or clause.get(token.depth) != 'from':
+            continue
+        if not (tokens[index - 1].is_word('from', 'join') or tokens[index - 1].text == ','):
+            continue
+        if index + 2 < len(tokens) and tokens[index + 1].text == '.':
+            # schema qualified, main.t
+            token = tokens[index + 2]
+        names.append(_identifier(token))
+    return names
+
+
+def _names_key(token, tokens, index, columns):
+    """Whether tokens[index] is a partition column: a key qualified with the table or its alias, or an
+    unqualified key when the statement reads no other table. Qualifiers, aliases and DATE/TIMESTAMP
+    literals are not."""
+    if not any(_same_name(token, key) for key in columns.keys):
+        return False
+    if index + 1 < len(tokens) and tokens[index + 1].text == '.':
+        return False
+    if index >= 2 and tokens[index - 1].text == '.':
+        qualifier = _identifier(tokens[index - 2])
+        return qualifier is not None and qualifier.lower() in columns.qualifiers
+    if index >= 1 and tokens[index - 1].is_word('as'):
+        return False
+    if token.is_word('date', 'timestamp') and index + 1 < len(tokens) and tokens[index + 1].kind == 'string':
+        return False
+    return not columns.qualified
+
+
+def _check_partition_columns(tokens, table_name, partitions, spans):
+    """Raises when the statement uses a partition column of table_name outside of the conditions (spans) that
+    rewrite takes out of it: the engine table does not have the column."""
+    references = _table_references(tokens, table_name)
+    if len(references) == 0:
+        return
+    qualifiers = {table_name.lower()} | {reference.alias.lower() for reference in references if reference.alias is not None}
+    others = [name for name in _from_tables(tokens) if name is None or name.lower() != table_name.lower()]
+    columns = _Columns(partitions.keys, qualifiers, len(others) > 0)
+    for index, token in enumerate(tokens):
+        if any(start <= token.start < end for start, end in spans):
+            continue
+        if _names_key(token, tokens, index, columns):
+            raise Exception("Partition column " + _identifier(token) + " of table " + table_name + " is not in its files,"
+                            " it can only be used in AND terms of the outer WHERE that compare it with literals"
+                            " (=, <>, <, <=, >, >=, IN, BETWEEN) of a query without outer joins or UNION/INTERSECT/EXCEPT"
+                            " that reads the table once. When the files have the column register the table with"
+                            " create_table(..., hive_partitions=False)")
+
+
+def _where_clause(tokens):
+    """Tokens of the WHERE of the outer statement."""
+    start = None
+    for index, token in enumerate(tokens):
+        if token.depth != 0 or token.kind != 'word':
+            continue
+        if token.lower == 'where':
+            start = index + 1
+        elif start is not None and token.lower in _clauses:
+            return tokens[start:index]
+    if start is None:
+        return []
+    return tokens[start:]
+
+
+def _strip_parentheses(tokens):
+    while len(tokens) >= 2 and tokens[0].text == '(' and tokens[-1].text == ')':
+        depth = tokens[0].depth
+        # only when they enclose the whole expression, not (a) = (b)
+        if any(token.depth == depth for token in tokens[1:-1]):
+            break
+        tokens = tokens[1:-1]
+    return tokens
+
+
+def _conjuncts(tokens):
+    """The AND terms of tokens, None when the expression is not a conjunction (an OR at its top)."""
+    tokens = _strip_parentheses(tokens)
+    if len(tokens) == 0:
+        return []
+    depth = tokens[0].depth
+    terms = []
+    current = []
+    in_between = False
+    for token in tokens:
+        if token.depth == depth and token.is_word('or'):
+            return None
+        if token.depth == depth and token.is_word('between'):
+            in_between = True
+        if token.depth == depth and token.is_word('and'):
+            if in_between:
+                in_between = False
+            else:
+                terms.append(current)
+                current = []
+                continue
+        current.append(token)
+    terms.append(current)
+
+    conjuncts = []
+    for term in terms:
+        inner = _strip_parentheses(term)
+        if len(inner) < len(term):
+            nested = _conjuncts(inner)
+            # a parenthesized OR is one term that is not understood
+            conjuncts.extend([inner] if nested is None else nested)
+        else:
+            conjuncts.append(term)
+    return conjuncts
+
+
+def _number(text):
+    if _integer.match(text):
+        return int(text)
+    return float(text)
+
+
+def _literal(tokens, index):
+    """(value, next index) of a literal at tokens[index], None when there is none. Strings are
+    str, numbers int or float."""
+    if index >= len(tokens):
+        return None
+    token = tokens[index]
+    if token.is_word('date', 'timestamp') and index + 1 < len(tokens) and tokens[index + 1].kind == 'string':
+        return tokens[index + 1].text[1:-1].replace("''", "'"), index + 2
+    if token.kind == 'string':
+        return token.text[1:-1].replace("''", "'"), index + 1
+    if token.kind == 'number':
+        return _number(token.text), index + 1
+    if token.text in ('-', '+') and index + 1 < len(tokens) and tokens[index + 1].kind == 'number':
+        return _number(token.text + tokens[index + 1].text), index + 2
+    return None
+
+
+def _column(tokens, index, columns):
+    """(key, next index) of a partition column at tokens[index], None when there is none."""
+    if index >= len(tokens):
+        return None
+    if index + 2 < len(tokens) and tokens[index + 1].text == '.':
+        qualifier = _identifier(tokens[index])
+        if qualifier is None or qualifier.lower() not in columns.qualifiers:
+            return None
+        index = index + 2
+    elif columns.qualified:
+        return None
+    name = _identifier(tokens[index])
+    if name is None:
+        return None
+    for key in columns.keys:
+        if key.lower() == name.lower():
+            return key, index + 1
+    return None
+
+
+def _literal_list(tokens, index):
+    if index >= len(tokens) or tokens[index].text != '(':
+        return None
+    values = []
+    index = index + 1
+    while True:
+        literal = _literal(tokens, index)
+        if literal is None:
+            return None
+        values.append(literal[0])
+        index = literal[1]
+        if index < len(tokens) and tokens[index].text == ',':
+            index = index + 1
+        elif index < len(tokens) and tokens[index].text == ')':
+            return values, index + 1
+        else:
+            return None
+
+
+def _filter(tokens, columns):
+    """(key, op, values) of a conjunct that only compares a partition column with literals, None otherwise."""
+    column = _column(tokens, 0, columns)
+    if column is not None:
+        key, index = column
+        if index < len(tokens) and tokens[index].text in _comparisons:
+            op = '<>' if tokens[index].text == '!=' else tokens[index].text
+            literal = _literal(tokens, index + 1)
+            if literal is not None and literal[1] == len(tokens):
+                return key, op, [literal[0]]
+            return None
+        negated = index < len(tokens) and tokens[index].is_word('not')
+        if negated:
+            index = index + 1
+        if index < len(tokens) and tokens[index].is_word('in'):
+            values = _literal_list(tokens, index + 1)
+            if values is not None and values[1] == len(tokens):
+                return key, 'not in' if negated else 'in', values[0]
+            return None
+        if index < len(tokens) and tokens[index].is_word('between') and not negated:
+            low = _literal(tokens, index + 1)
+            if low is None or low[1] >= len(tokens) or not tokens[low[1]].is_word('and'):
+                return None
+            high = _literal(tokens, low[1] + 1)
+            if high is not None and high[1] == len(tokens):
+                return key, 'between', [low[0], high[0]]
+        return None
+
+    # literal op column
+    literal = _literal(tokens, 0)
+    if literal is None or literal[1] >= len(tokens) or tokens[literal[1]].text not in _comparisons:
+        return None
+    column = _column(tokens, literal[1] + 1, columns)
+    if column is None or column[1] != len(tokens):
+        return None
+    op = '<>' if tokens[literal[1]].text == '!=' else tokens[literal[1]].text
+    return column[0], _flipped[op], [literal[0]]
+
+
+class PrunedQuery:
+    """What column_filters found for one table of a statement.
+
+    filters are the (key, op, values) conditions the files of the table must
+    pass, reference is where the table is named and spans are the (start,
+    end) character ranges of the conditions in the statement.
+    """
+
+    def __init__(self, reference, filters, spans):
+        self.reference = reference
+        self.filters = filters
+        self.spans = spans
+
+
+def column_filters(sql, table_name, source):
+    """Conditions on the columns of source in the WHERE of sql, None when there is nothing to prune with.
+    source is the Partitions of table_name, or anything with keys and applies(filter) (statistics.TableStatistics).
+
+    Only used when the table is named once, in the FROM of the outer
+    statement, and the statement is not a UNION/INTERSECT/EXCEPT and has no
+    outer join. The conditions are the AND terms of the outer WHERE that
+    compare a key with literals of its type: =, <>, <, <=, >, >=, [NOT] IN and
+    BETWEEN. The key can be qualified with the table name or its alias, and
+    has to be when the statement joins other tables.
+
+    The engine tables of partitioned files do not have the partition columns,
+    rewrite takes the conditions on them out of the statement. A statement
+    that uses a partition column anywhere else (the select list, GROUP BY,
+    another condition, a join) raises an Exception, as the engine could not
+    run it.
+    """
+    tokens = _tokenize(sql)
+    pruned = _column_filters(tokens, table_name, source)
+    if isinstance(source, Partitions):
+        _check_partition_columns(tokens, table_name, source, [] if pruned is None else pruned.spans)
+    return pruned
+
+
+def _column_filters(tokens, table_name, source):
+    if any(token.depth == 0 and token.is_word(*_set_operations) for token in tokens):
+        return None
+    if _has_outer_joins(tokens):
+        return None
+    references = _table_references(tokens, table_name)
+    if len(references) != 1 or references[0].depth != 0:
+        return None
+    reference = references[0]
+    qualifiers = {table_name.lower()}
+    if reference.alias is not None:
+        qualifiers = {reference.alias.lower()}
+    columns = _Columns(source.keys, qualifiers, _has_joins(tokens))
+
+    conjuncts = _conjuncts(_where_clause(tokens))
+    if conjuncts is None:
+        return None
+    filters = []
+    spans = []
+    for conjunct in conjuncts:
+        found = _filter(conjunct, columns)
+        if found is not None and source.applies(found):
+            filters.append(found)
+            spans.append((conjunct[0].start, conjunct[-1].end))
+    if len(filters) == 0:
+        return None
+    return PrunedQuery(reference, filters, spans)
+
+
+def pruned_table_name(table_name, files):
+    """Name the engine table with only files is registered under, the same files always get the same name."""
+    digest = hashlib.sha1('\n'.join(files).encode('utf-8')).hexdigest()[:16]
+    return table_name + '__part_' + digest
+
+
+def rewrite(sql, table_name, reference, pruned_name, conditions):
+    """sql reading pruned_name instead of table_name (the same name when no file was pruned), with the
+    conditions, a {(start, end): text} of spans of column_filters, replaced.
+
+    A partition condition becomes 1 = 1 (every row of the remaining files
+    passes it, and the engine does not know the partition columns, see
+    column_filters), any condition becomes 1 = 0 when no file matched and
+    pruned_name only stands in for the schema.
+    """
+    edits = [(start, end, text) for (start, end), text in conditions.items()]
+    if pruned_name != table_name:
+        name = pruned_name
+        if reference.alias is None:
+            # column references qualified with the table name keep working
+            name = pruned_name + ' AS ' + table_name
+        edits.append((reference.start, reference.end, name))
+    for start, end, text in sorted(edits, reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
@@ -0,0 +1,132 @@
+import io
+import json
+
+from .diskcache import DiskCache
+
+# bytes of a csv or json file the column types are inferred from
+DEFAULT_SAMPLE_BYTES = 1 << 20
+
+
+def _type_name(arrow_type):
+    """The create_table dtype name (see pyblazing.get_dtype_values) of an arrow type, None when there is none."""
+    import pyarrow as pa
+
+    if pa.types.is_boolean(arrow_type):
+        return 'bool'
+    numbers = {pa.int8(): 'int8', pa.int16(): 'short', pa.int32(): 'int32', pa.int64(): 'int64',
+               pa.float32(): 'float32', pa.float64(): 'float64'}
+    if arrow_type in numbers:
+        return numbers[arrow_type]
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'str'
+    if pa.types.is_date32(arrow_type):
+        return 'date32'
+    if pa.types.is_date64(arrow_type):
+        return 'date64'
+    if pa.types.is_timestamp(arrow_type):
+        return 'date64' if arrow_type.unit == 'ms' else 'timestamp'
+    return None
+
+
+def _sample(file, sample_bytes):
+    """The first lines of file (a path or file object), up to about sample_bytes."""
+    if isinstance(file, str):
+        with open(file, 'rb') as opened:
+            return _sample(opened, sample_bytes)
+    data = file.read(sample_bytes)
+    if len(data) == sample_bytes:
+        end = data.rfind(b'\n')
+        if end > 0:
+            data = data[:end + 1]
+    return io.BytesIO(data)
+
+
+def _read_csv_schema(file, options, sample_bytes):
+    import pyarrow.csv as csv
+
+    header = options.get('header', 0)
+    names = options.get('names') or None
+    if header not in (-1, 0) or (header == -1 and names is None):
+        return None
+    skip_rows = options.get('skiprows', 0) + (1 if header == 0 and names is not None else 0)
+    read_options = csv.ReadOptions(skip_rows=skip_rows, column_names=names)
+    parse_options = csv.ParseOptions(delimiter=options.get('delimiter', ','), quote_char=options.get('quotechar', '"'))
+    return csv.read_csv(_sample(file, sample_bytes), read_options=read_options, parse_options=parse_options).schema
+
+
+def read_schema(file, format, options=None, sample_bytes=DEFAULT_SAMPLE_BYTES):
+    """Column names and create_table dtype names of a file (a path or file object) as a JSON friendly dict:
+
+        {'names': [column], 'types': [type]}
+
+    parquet and orc schemas come from the footer, csv and json types are
+    inferred from the first sample_bytes of the file. options are the csv
+    options the engine reads the file with (delimiter, quotechar, skiprows,
+    header and names). A type is null when a column has no dtype the engine
+    takes, types is null when the file can not be read that way.
+    """
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+
+        schema = pq.ParquetFile(file).schema_arrow
+    elif format == 'orc':
+        import pyarrow.orc as orc
+
+        schema = orc.ORCFile(file).schema
+    elif format == 'csv':
+        schema = _read_csv_schema(file, options or {}, sample_bytes)
+    elif format == 'json':
+        import pyarrow.json
+
+        schema = pyarrow.json.read_json(_sample(file, sample_bytes)).schema
+    else:
+        raise Exception("Unknown file format " + str(format) + " for a schema")
+    if schema is None:
+        return {'names': [], 'types': None}
+    names = list(schema.names)
+    # pandas indexes are not columns the engine reads
+    if any(name.startswith('__index_level_') for name in names):
+        return {'names': names, 'types': None}
+    return {'names': names, 'types': [_type_name(field.type) for field in schema]}
+
+
+class SchemaIndex:
+    """Resolves the schemas of file tables once, caching them on disk.
+
+    The schema of a table is the one of its first file, cached for the size
+    and modification time that file had when it was read and the options it
+    was read with (see DiskCache), so tables that are registered again, also
+    by another process, send their column names and types to the engine
+    instead of having it read the files to find them.
+    """
+
+    def __init__(self, cache_dir=None, sample_bytes=DEFAULT_SAMPLE_BYTES):
+        self.cache = DiskCache(cache_dir, 'schemas')
+        self.sample_bytes = sample_bytes
+
+    def schema(self, paths, format, resolve, options=None):
+        """(names, types) of a table of paths, None when they can not be resolved.
+
+        resolve(path) returns the (lister, path) to read a path through.
+        """
+        path = paths[0]
+        try:
+            lister, file_path = resolve(path)
+            signature = list(lister.info(file_path)) + [format, json.dumps(options, sort_keys=True)]
+            schema = self.cache.get(path, signature)
+            if schema is None:
+                with lister.open(file_path) as file:
+                    schema = read_schema(file, format, options, self.sample_bytes)
+                self.cache.put(path, signature, schema)
+        except Exception as error:
+            # the engine finds the schema itself
+            print("WARNING: could not read the schema of " + path + ": " + str(error))
+            return None
+        types = schema['types']
+        if types is None or len(types) == 0 or any(type is None for type in types):
+            return None
+        return schema['names'], types
+
+    def invalidate(self, paths=None):
+        """Forgets the schemas of tables starting with paths, of every table when paths is None."""
+        self.cache.invalidate(paths)
@@ -1,46 +1,243 @@
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 
 from .bridge import internal_api
+from .cache import referenced_tables
+from .partitions import column_filters, rewrite
+from pyblazing.timing import QueryTiming
+from pyblazing.transport import LOOPBACK_HOSTS
 
 import time
-import dask.dataframe as dd
 
 
 
 
+def _worker_host(address, info):
+    if 'host' in info:
+        return info['host']
+    # tcp://10.0.0.5:34567
+    return address.split('://')[-1].rsplit(':', 1)[0]
+
+# The dask worker that reads each node result: one on the same host as the node, round robin when a host
+# has several. Nodes that match no worker host (e.g. loopback addresses, when every worker runs its engine
+# on 127.0.0.1) are paired with the workers in order, like every worker reading its local engine
+def _node_workers(metaToken, workers_info):
+    addresses = sorted(workers_info)
+    if len(addresses) == 0:
+        raise RuntimeError("The dask client has no workers to read the query results")
+    by_host = OrderedDict()
+    for address in addresses:
+        by_host.setdefault(_worker_host(address, workers_info[address]), []).append(address)
+
+    workers = []
+    used = {}
+    for index, result in enumerate(metaToken):
+        host = result.nodeConnection.path.decode('utf8')
+        if host in by_host and host not in LOOPBACK_HOSTS:
+            count = used.get(host, 0)
+            used[host] = count + 1
+            workers.append(by_host[host][count % len(by_host[host])])
+        else:
+            workers.append(addresses[index % len(addresses)])
+    return workers
+
+
+_prefetch_executor = None
+_prefetch_lock = threading.Lock()
+
+# shared by all the prefetching result sets, created on first use
+def _get_prefetch_executor():
+    global _prefetch_executor
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='pyblazing-prefetch')
+        return _prefetch_executor
+
+
 # TODO we need to deal here with this metatokens stuff and many rals
 # Maintains the resulset and the token after the run_query
 class ResultSet:
 
-    def __init__(self, client, metaToken, startTime, dask_client):
+    def __init__(self, client, metaToken, startTime, dask_client, result_cache=None, cache_key=None, cached=None, timing=None):
         self.client = client
         self.metaToken = metaToken
         self.startTime = startTime
+        self.timing = timing
         self.dask_client = dask_client
+        self.result_cache = result_cache
+        self.cache_key = cache_key
+        self.cached = cached
+        # Future of what get() returns, see prefetch()
+        self.prefetched = None
 
     # this will call the get_result api
-    def get(self):
-        if(self.dask_client is None):
-            temp = internal_api.run_query_get_results(self.client, self.metaToken, self.startTime)
+    # With a dask client every node result becomes one partition, read by the worker on the same host as the
+    # node. The partitions are copies, transfer_ownership=True keeps the engine memory instead (see get_all).
+    # columns and limit only open the given columns (in that order) and the first limit rows of the result,
+    # counted over the nodes in order, the rest is never opened on the client
+    def get(self, transfer_ownership=False, columns=None, limit=None):
+        if self.cached is not None:
+            return self._cached_result(columns, limit)
+
+        selected = columns is not None or limit is not None
+        if selected and (self.dask_client is not None or self.prefetched is not None):
+            raise ValueError("columns and limit can not be used on a prefetched result or with a dask client")
+
+        if self.prefetched is not None:
+            temp = self.prefetched.result()
+            self._cache_result(temp)
+        elif(self.dask_client is None):
+            temp = internal_api.run_query_get_results(self.client, self.metaToken, self.startTime, self.timing, columns, limit)
+            if not selected:
+                self._cache_result(temp)
         else:
+            import dask.dataframe as dd
+
+            workers = _node_workers(self.metaToken, self.dask_client.scheduler_info()["workers"])
             dask_futures = []
-            for worker in list(self.dask_client.scheduler_info()["workers"]):
-                dask_futures.append(self.dask_client.submit(internal_api.convert_to_dask,self.metaToken,self.client, workers=[worker]))
-            temp = dd.from_delayed(dask_futures)
+            for result, worker in zip(self.metaToken, workers):
+                dask_futures.append(self.dask_client.submit(internal_api.convert_to_dask,result,self.client,transfer_ownership, workers=[worker], pure=False))
+            temp = dd.from_delayed(dask_futures, meta=internal_api.dask_result_meta(self.client, self.metaToken))
 
         return temp
 
+    # same as get() but awaits the protocol round trips instead of blocking the event loop
+    async def get_async(self):
+        if self.cached is not None:
+            return self._cached_result()
+
+        import asyncio
+
+        if self.prefetched is not None:
+            temp = await asyncio.wrap_future(self.prefetched)
+            self._cache_result(temp)
+            return temp
+
+        if(self.dask_client is None):
+            temp = await internal_api.run_query_get_results_async(self.client, self.metaToken, self.startTime, self.timing)
+            self._cache_result(temp)
+            return temp
+
+        # building the dask dataframe only submits work to the scheduler
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    # Starts fetching the result of every node (GetResult and IPC opens) in the background and returns a
+    # concurrent.futures.Future of what get() returns; get() then waits for it instead of fetching. The other
+    # ways to read the result fetch it differently and can not be used on a prefetched result set
+    def prefetch(self):
+        if self.dask_client is not None:
+            raise ValueError("prefetch is not supported when the context has a dask client, the workers read the results")
+
+        if self.prefetched is None:
+            if self.cached is not None:
+                self.prefetched = Future()
+                self.prefetched.set_result(self._cached_result())
+            else:
+                self.prefetched = _get_prefetch_executor().submit(internal_api.run_query_get_results, self.client,
+                                                                  self.metaToken, self.startTime, self.timing)
+        return self.prefetched
+
+    def _check_not_prefetched(self):
+        if self.prefetched is not None and self.cached is None:
+            raise ValueError("The result was prefetched, use get() to read it")
+
     # this assumes all ral are local. It will get all results and concatenamte them and only return the gdf.
     # It will not return a result object, therefore it will need to make a copy
-    def get_all(self):
-        return internal_api.run_query_get_concat_results(self.client, self.metaToken, self.startTime)
+    # unless transfer_ownership=True: when only one node returns data the DataFrame keeps its engine memory,
+    # which is freed when the DataFrame and everything derived from it without a copy (columns, slices) are
+    # garbage collected
+    def get_all(self, transfer_ownership=False):
+        if self.cached is not None:
+            return self._cached_result()
+        self._check_not_prefetched()
+
+        temp = internal_api.run_query_get_concat_results(self.client, self.metaToken, self.startTime, self.timing, transfer_ownership)
+        self._cache_result(temp)
+        return temp
+
+    # usage: for gdf in result.iter_batches(max_rows=1000000): writer.write(gdf)
+    # Batches come node by node, in the order the nodes return their results, and are copies that stay
+    # valid after the iteration. max_bytes is based on the average row size of each node result.
+    def iter_batches(self, max_rows=None, max_bytes=None):
+        if self.dask_client is not None:
+            raise ValueError("iter_batches is not supported when the context has a dask client, use get() instead")
+
+        if self.cached is not None:
+            return internal_api.result_batches(self.cached.columns, max_rows, max_bytes)
+        self._check_not_prefetched()
+
+        return internal_api.iter_query_batches(self.client, self.metaToken, self.startTime, max_rows, max_bytes, self.timing)
+
+    # Arrow record batches of the result, built from host copies of the result buffers without pandas
+    def iter_arrow_batches(self, max_rows=None):
+        if self.dask_client is not None:
+            raise ValueError("Arrow export is not supported when the context has a dask client, use get() instead")
+
+        if self.cached is not None:
+            return iter(internal_api.frame_arrow_batches(self.cached.columns, max_rows))
+        self._check_not_prefetched()
+
+        return internal_api.iter_query_arrow_batches(self.client, self.metaToken, self.startTime, max_rows, self.timing)
+
+    # the whole result as a pyarrow.Table, one record batch per node
+    def to_arrow(self):
+        import pyarrow
+
+        batches = list(self.iter_arrow_batches())
+        if len(batches) == 0:
+            return pyarrow.Table.from_batches([], schema=pyarrow.schema([]))
+        return pyarrow.Table.from_batches(batches)
+
+    # writes the result as an Arrow IPC stream, node by node as they answer, returns the number of rows written.
+    # sink can be a path, a file object or a pyarrow NativeFile (e.g. a socket wrapped with pyarrow.PythonFile)
+    def write_arrow_stream(self, sink, max_rows=None):
+        return internal_api.write_arrow_stream(sink, self.iter_arrow_batches(max_rows))
+
+    # a result from the cache looks like one that was just fetched, but has no engine token to free.
+    # Every hit gets its own copy, changing it in place does not change the cache
+    def _cached_result(self, columns=None, limit=None):
+        cached = self.cached
+        gdf = cached.columns if columns is None else cached.columns[list(columns)]
+        if limit is not None:
+            gdf = gdf.head(limit)
+        return internal_api.ResultSetHandle(gdf.copy(deep=True),
+                                            None,
+                                            None,
+                                            None,
+                                            None,
+                                            None,
+                                            None,
+                                            cached.calciteTime,
+                                            cached.ralTime,
+                                            cached.totalTime,
+                                            '',
+                                            cached.total_nodes,
+                                            0)
+
+    def _cache_result(self, result):
+        # only complete results are cached, a list means several nodes returned data separately
+        if self.result_cache is None or type(result) != internal_api.ResultSetHandle:
+            return
+        if result.columns is None or result.n_crashed_nodes > 0:
+            return
+        self.cached = self.result_cache.put(self.cache_key, result.columns, result.calciteTime,
+                                            result.ralTime, result.totalTime, result.total_nodes)
 
 
 
 class SQL(object):
 
-    def __init__(self):
+    def __init__(self, plan_cache=None, result_cache=None):
         self.tables = OrderedDict()
+        # bumped on every create/drop table, cached plans of older versions are not used anymore
+        self.catalog_version = 0
+        self.plan_cache = plan_cache
+        # per table version, part of the result cache keys
+        self.table_versions = {}
+        self.result_cache = result_cache
+        # hook(timing, span) of the queries of this catalog, see pyblazing.timing.QueryTiming
+        self.timing_hooks = []
 
     def __del__(self):
         all_table_names = list(self.tables.keys())
@@ -55,6 +252,8 @@ class SQL(object):
     def create_table(self, table_name, datasource):
 
         self.tables[table_name] = datasource
+        self.catalog_version = self.catalog_version + 1
+        self._table_changed(table_name)
 
         # # TODO percy create table result
         # output = OrderedDict()
@@ -75,12 +274,105 @@ class SQL(object):
     def drop_table(self, table_name):
         if table_name in self.tables:
             del self.tables[table_name]
+            self.catalog_version = self.catalog_version + 1
+            self._table_changed(table_name)
 
     # TODO percy
     def drop_view(self, view_name):
         pass
 
-    def run_query(self, client, sql,dask_client):
+    # {table name: create_table kwargs} of the registered tables and their pruned tables, only of the ones
+    # sql names when it is given
+    def table_args(self, sql=None):
+        tables = OrderedDict()
+        for table_name, table in list(self.tables.items()):
+            if table.table_args is not None:
+                tables[table_name] = table.table_args
+            for pruned in table.pruned_tables():
+                tables[pruned.table_name] = pruned.table_args
+        if sql is not None:
+            names = set(referenced_tables(sql, tables.keys()))
+            tables = OrderedDict((name, args) for name, args in tables.items() if name in names)
+        return tables
+
+    def _table_changed(self, table_name):
+        self.table_versions[table_name] = self.table_versions.get(table_name, 0) + 1
+        if self.result_cache is not None:
+            self.result_cache.invalidate_table(table_name)
+
+    # returns a ResultSet for the cached result of sql, or the cache key to store its result under
+    def _lookup_result(self, client, sql, startTime, dask_client):
+        if self.result_cache is None or dask_client is not None:
+            return None, None
+        cache_key = self.result_cache.key(sql, self.table_versions)
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return None, cache_key
+        return ResultSet(client, None, startTime, dask_client, self.result_cache, cache_key, cached), cache_key
+
+    # sql reading only the files (partitions) of every file table that can have rows it filters on
+    def _prune_files(self, sql, timing):
+        for table_name, datasource in list(self.tables.items()):
+            sources = [source for source in (getattr(datasource, 'partitions', None), getattr(datasource, 'statistics', None))
+                       if source is not None]
+            found = [(source, column_filters(sql, table_name, source)) for source in sources]
+            found = [(source, pruned) for source, pruned in found if pruned is not None]
+            if len(found) == 0:
+                continue
+            all_files = found[0][0].files
+            with timing.phase('prune', table=table_name, total_files=len(all_files)):
+                selected = set(all_files)
+                for source, pruned in found:
+                    selected.intersection_update(source.select(pruned.filters))
+                files = [file for file in all_files if file in selected]
+
+                conditions = {}
+                for source, pruned in found:
+                    for span in pruned.spans:
+                        if len(files) == 0:
+                            conditions[span] = '1 = 0'
+                        elif source is datasource.partitions:
+                            conditions[span] = '1 = 1'
+                if len(files) == len(all_files):
+                    pruned_name = table_name
+                else:
+                    # with no matching file the table still needs one for its schema, its rows are filtered out
+                    pruned_name = datasource.pruned_table(files if len(files) > 0 else all_files[:1])
+                sql = rewrite(sql, table_name, found[0][1].reference, pruned_name, conditions)
+        return sql
+
+    def run_query(self, client, sql,dask_client, prefetch=False):
+        if prefetch and dask_client is not None:
+            raise ValueError("prefetch is not supported when the context has a dask client, the workers read the results")
         startTime = time.time()
-        metaToken = internal_api.run_query_get_token(client, sql)
-        return ResultSet(client, metaToken, startTime,dask_client)
+        cached_result, cache_key = self._lookup_result(client, sql, startTime, dask_client)
+        if cached_result is not None:
+            return cached_result
+
+        timing = QueryTiming(sql, startTime, self.timing_hooks)
+        sql = self._prune_files(sql, timing)
+        if self.plan_cache is not None and dask_client is None:
+            metaToken = internal_api.run_query_get_planned_token(client, sql, self.plan_cache, self.catalog_version,
+                                                                 self.table_args(sql), timing)
+        else:
+            metaToken = internal_api.run_query_get_token(client, sql, timing)
+        result = ResultSet(client, metaToken, startTime,dask_client, self.result_cache, cache_key, timing=timing)
+        if prefetch:
+            result.prefetch()
+        return result
+
+    async def run_query_async(self, client, sql, dask_client, prefetch=False):
+        if prefetch and dask_client is not None:
+            raise ValueError("prefetch is not supported when the context has a dask client, the workers read the results")
+        startTime = time.time()
+        cached_result, cache_key = self._lookup_result(client, sql, startTime, dask_client)
+        if cached_result is not None:
+            return cached_result
+
+        timing = QueryTiming(sql, startTime, self.timing_hooks)
+        sql = self._prune_files(sql, timing)
+        metaToken = await internal_api.run_query_get_token_async(client, sql, timing)
+        result = ResultSet(client, metaToken, startTime, dask_client, self.result_cache, cache_key, timing=timing)
+        if prefetch:
+            result.prefetch()
+        return result
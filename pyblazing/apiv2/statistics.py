@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import math
+
+from .diskcache import DiskCache
+from .partitions import literal_to_type
+
+
+def _stat_value(value):
+    """(type, value) of a parquet statistics value as the index keeps it, None for what it does not compare."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return 'int64', value
+    if isinstance(value, float):
+        return None if math.isnan(value) else ('float64', value)
+    if isinstance(value, str):
+        return 'string', value
+    if isinstance(value, datetime.datetime):
+        return None
+    if isinstance(value, datetime.date):
+        return 'date', value.isoformat()
+    return None
+
+
+def read_statistics(file):
+    """Footer statistics of a parquet file (a path or file object), as a JSON friendly dict:
+
+        {'num_rows': n, 'types': {column: type},
+         'row_groups': [{'num_rows': n, 'columns': {column: [min, max, null_count]}}]}
+
+    types are 'int64', 'float64', 'string' or 'date' (ISO strings). Columns of
+    other types, and min/max a writer did not store, are null.
+    """
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(file).metadata
+    types = OrderedDict()
+    row_groups = []
+    for index in range(metadata.num_row_groups):
+        row_group = metadata.row_group(index)
+        columns = OrderedDict()
+        for column_index in range(row_group.num_columns):
+            column = row_group.column(column_index)
+            name = column.path_in_schema
+            statistics = column.statistics
+            minimum, maximum, null_count = None, None, None
+            if statistics is not None:
+                if statistics.has_null_count:
+                    null_count = statistics.null_count
+                if statistics.has_min_max:
+                    low, high = _stat_value(statistics.min), _stat_value(statistics.max)
+                    if low is not None and high is not None and low[0] == high[0] and types.get(name, low[0]) == low[0]:
+                        minimum, maximum = low[1], high[1]
+                        types[name] = low[0]
+            columns[name] = [minimum, maximum, null_count]
+        row_groups.append({'num_rows': row_group.num_rows, 'columns': columns})
+    return {'num_rows': metadata.num_rows, 'types': types, 'row_groups': row_groups}
+
+
+def _may_match(column, num_rows, op, values):
+    """Whether a row group with the [min, max, null_count] of a column can have rows passing op values,
+    values are None when they do not compare with the column."""
+    if column is None:
+        return True
+    minimum, maximum, null_count = column
+    # comparisons with null are never true
+    if num_rows == 0 or (null_count is not None and null_count >= num_rows):
+        return False
+    if values is None or minimum is None or maximum is None:
+        return True
+    try:
+        if op == '=':
+            return minimum <= values[0] <= maximum
+        if op == '<>':
+            return not (minimum == maximum == values[0])
+        if op == '<':
+            return minimum < values[0]
+        if op == '<=':
+            return minimum <= values[0]
+        if op == '>':
+            return maximum > values[0]
+        if op == '>=':
+            return maximum >= values[0]
+        if op == 'in':
+            return any(minimum <= value <= maximum for value in values)
+        if op == 'not in':
+            return not (minimum == maximum and minimum in values)
+        if op == 'between':
+            return maximum >= values[0] and minimum <= values[1]
+    except TypeError:
+        return True
+    return True
+
+
+class TableStatistics:
+    """The footer statistics of the files of a parquet table, see read_statistics.
+
+    Used like partitions.Partitions to select the files a query can need:
+    a file is kept when at least one of its row groups may have rows that
+    pass every filter. Files without statistics are always kept. Pruning is
+    file level only: the engine reads every row group of the files kept,
+    row_groups only tells which of them made a file match.
+    """
+
+    def __init__(self, files, statistics):
+        self.files = files
+        self.statistics = statistics
+        self.types = OrderedDict()
+        for file_statistics in statistics:
+            if file_statistics is None:
+                continue
+            for name, type in file_statistics['types'].items():
+                self.types.setdefault(name, type)
+        self.keys = list(self.types.keys())
+
+    def __len__(self):
+        return len(self.files)
+
+    # every comparison operator can be checked against min/max, only the column and the literals matter
+    def applies(self, filter):
+        key, _, values = filter
+        return key in self.types and all(literal_to_type(value, self.types[key]) is not None for value in values)
+
+    def row_groups(self, filters):
+        """{file: indices of the row groups that may have matching rows}, for every file that has some."""
+        matching = OrderedDict()
+        for file, file_statistics in zip(self.files, self.statistics):
+            if file_statistics is None:
+                matching[file] = None
+                continue
+            # the literals as values of the column types of this file
+            typed = []
+            for key, op, values in filters:
+                type = file_statistics['types'].get(key)
+                typed_values = None
+                if type is not None:
+                    typed_values = [literal_to_type(value, type) for value in values]
+                    if any(value is None for value in typed_values):
+                        typed_values = None
+                typed.append((key, op, typed_values))
+            indices = []
+            for index, row_group in enumerate(file_statistics['row_groups']):
+                columns = row_group['columns']
+                if all(_may_match(columns.get(key), row_group['num_rows'], op, values) for key, op, values in typed):
+                    indices.append(index)
+            if len(indices) > 0:
+                matching[file] = indices
+        return matching
+
+    def select(self, filters):
+        return list(self.row_groups(filters).keys())
+
+
+class StatisticsIndex:
+    """Builds TableStatistics from parquet footers, in parallel, caching them on disk.
+
+    Footers are cached per file path, for the size and modification time the
+    file had when it was read (see DiskCache), so an index is only built once
+    for files that do not change, also across processes.
+    """
+
+    def __init__(self, cache_dir=None, max_workers=16):
+        self.cache = DiskCache(cache_dir, 'parquet_statistics')
+        self.max_workers = max_workers
+
+    def build(self, paths, resolve):
+        """TableStatistics of paths, resolve(path) returns the (lister, path) to read a path through."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            statistics = list(executor.map(lambda path: self._file_statistics(path, resolve), paths))
+        return TableStatistics(list(paths), statistics)
+
+    def _file_statistics(self, path, resolve):
+        try:
+            lister, file_path = resolve(path)
+            signature = lister.info(file_path)
+            statistics = self.cache.get(path, signature)
+            if statistics is None:
+                with lister.open(file_path) as file:
+                    statistics = read_statistics(file)
+                self.cache.put(path, signature, statistics)
+            return statistics
+        except Exception as error:
+            # the file is still read, it just can not be skipped
+            print("WARNING: could not read the parquet statistics of " + path + ": " + str(error))
+            return None
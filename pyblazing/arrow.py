@@ -0,0 +1,291 @@
+"""Arrow export of query results and Arrow ingestion of tables.
+
+Result columns are copied once from device to host and turned into Arrow
+arrays from those host buffers, without going through pandas: fixed width data
+is wrapped without another copy, and the cudf null masks (same LSB bit order
+as Arrow validity bitmaps) are used as validity buffers as they are.
+
+Tables go the other way the same way: the Arrow buffers are uploaded as they
+are, chunk by chunk, into columns allocated once (see ingest_table).
+"""
+import numpy as np
+import pyarrow as pa
+
+
+class HostColumn:
+    """Host copy of one result column.
+
+    values is a numpy array (or a list of str for string columns), valid the
+    null mask as bytes (None when there are no nulls).
+    """
+
+    def __init__(self, values, valid=None, null_count=0):
+        self.values = values
+        self.valid = valid
+        self.null_count = null_count
+
+
+def host_column_to_arrow(column):
+    values = column.values
+    if isinstance(values, list):
+        if column.null_count > 0 and column.valid is not None:
+            bits = np.unpackbits(np.frombuffer(column.valid, dtype=np.uint8), bitorder='little')
+            values = [value if bits[i] else None for i, value in enumerate(values)]
+        return pa.array(values, type=pa.string())
+
+    length = len(values)
+    valid = None
+    if column.null_count > 0 and column.valid is not None:
+        valid = pa.py_buffer(column.valid)
+
+    if values.dtype == np.bool_:
+        # numpy stores one byte per bool, arrow one bit
+        mask = None
+        if valid is not None:
+            bits = np.unpackbits(np.frombuffer(column.valid, dtype=np.uint8), bitorder='little')[:length]
+            mask = bits == 0
+        return pa.array(values, type=pa.bool_(), mask=mask)
+
+    return pa.Array.from_buffers(pa.from_numpy_dtype(values.dtype), length,
+                                 [valid, pa.py_buffer(np.ascontiguousarray(values))],
+                                 column.null_count if valid is not None else 0)
+
+
+def host_columns_to_record_batch(names, columns):
+    return pa.RecordBatch.from_arrays([host_column_to_arrow(column) for column in columns], names)
+
+
+def frame_to_host_columns(gdf):
+    """Copies the columns of a cudf DataFrame to host, one device to host copy per buffer."""
+    host_columns = []
+    for name in gdf.columns:
+        column = gdf[name]._column
+        size = len(column)
+        if column.dtype == 'object':
+            # nvstrings
+            host_columns.append(HostColumn(column._data.to_host(), None, 0))
+            continue
+
+        values = column._data.mem[:size].copy_to_host() if size > 0 else np.empty(0, dtype=column.dtype)
+        valid = None
+        null_count = column.null_count
+        if column.has_null_mask and null_count > 0:
+            valid = column._mask.mem.copy_to_host().tobytes()[:(size + 7) // 8]
+        host_columns.append(HostColumn(values, valid, null_count))
+    return host_columns
+
+
+def frame_to_record_batch(gdf):
+    return host_columns_to_record_batch([str(name) for name in gdf.columns], frame_to_host_columns(gdf))
+
+
+def split_record_batch(batch, max_rows=None):
+    """Zero copy slices of batch with at most max_rows rows each."""
+    if max_rows is None or batch.num_rows <= max_rows:
+        return [batch]
+    return [batch.slice(start, max_rows) for start in range(0, batch.num_rows, max_rows)]
+
+
+def write_stream(sink, batches):
+    """Writes batches as an Arrow IPC stream to sink (a path, file object or NativeFile).
+
+    The schema is taken from the first batch. Returns the number of rows written.
+    """
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pa.RecordBatchStreamWriter(sink, batch.schema)
+            writer.write_batch(batch)
+            rows = rows + batch.num_rows
+        if writer is None:
+            # no batches, the stream still has to be readable
+            writer = pa.RecordBatchStreamWriter(sink, pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+# upload pieces are at most this big, so no host staging copy of a whole column is ever made
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+class IngestedColumn:
+    """A column uploaded by ingest_table.
+
+    data is what the target made of it (a device array, or strings), valid
+    the packed null mask (None when there are no nulls).
+    """
+
+    def __init__(self, dtype, data, valid=None, null_count=0):
+        self.dtype = dtype
+        self.data = data
+        self.valid = valid
+        self.null_count = null_count
+
+
+class DeviceTarget:
+    """Uploads to GPU memory, the columns end up in a cudf DataFrame (see table_to_frame)."""
+
+    def empty(self, size, dtype):
+        from librmm_cffi import librmm as rmm
+
+        return rmm.device_array(size, dtype=dtype)
+
+    def upload(self, array, offset, values):
+        array[offset:offset + len(values)].copy_to_device(values)
+
+    def strings(self, data, offsets, valid, null_count):
+        import nvstrings
+
+        return nvstrings.from_offsets(data, offsets, len(offsets) - 1, valid, null_count)
+
+    def concat_strings(self, parts):
+        import nvstrings
+
+        if len(parts) == 0:
+            return nvstrings.to_device([])
+        if len(parts) == 1:
+            return parts[0]
+        return nvstrings.from_strings(*parts)
+
+
+class HostTarget:
+    """Stand-in for the device that copies into numpy arrays, for tests and host side benchmarks."""
+
+    def empty(self, size, dtype):
+        return np.empty(size, dtype=dtype)
+
+    def upload(self, array, offset, values):
+        array[offset:offset + len(values)] = values
+
+    def strings(self, data, offsets, valid, null_count):
+        return [(np.array(data), np.array(offsets), valid, null_count)]
+
+    def concat_strings(self, parts):
+        return [piece for part in parts for piece in part]
+
+
+def _arrow_np_dtype(arrow_type):
+    if pa.types.is_boolean(arrow_type):
+        return np.dtype(np.bool_)
+    if pa.types.is_date32(arrow_type):
+        # days, stored like GDF_DATE64
+        return np.dtype('datetime64[ms]')
+    if pa.types.is_date64(arrow_type):
+        return np.dtype('datetime64[ms]')
+    if pa.types.is_timestamp(arrow_type):
+        # the engine only has millisecond timestamps (GDF_DATE64), like cudf's pandas conversion
+        return np.dtype('datetime64[ms]')
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return np.dtype(arrow_type.to_pandas_dtype())
+    raise ValueError("Arrow type " + str(arrow_type) + " can not be loaded as a table column")
+
+
+def _unpack_bits(buffer, offset, length):
+    bits = np.frombuffer(buffer, dtype=np.uint8, count=(offset + length + 7) // 8)
+    return np.unpackbits(bits, bitorder='little')[offset:offset + length].view(np.bool_)
+
+
+# zero copy view of the values of a fixed width chunk (a copy for bools, date32 and timestamps that are not in
+# milliseconds, which change layout)
+def _chunk_values(chunk, np_dtype):
+    length = len(chunk)
+    buffer = chunk.buffers()[1]
+    if pa.types.is_boolean(chunk.type):
+        return _unpack_bits(buffer, chunk.offset, length)
+    if pa.types.is_date32(chunk.type):
+        days = np.frombuffer(buffer, dtype=np.int32, count=chunk.offset + length)[chunk.offset:]
+        return days.astype('datetime64[D]').astype(np_dtype)
+    if pa.types.is_timestamp(chunk.type) and chunk.type.unit != 'ms':
+        values = np.frombuffer(buffer, dtype='datetime64[%s]' % chunk.type.unit, count=chunk.offset + length)[chunk.offset:]
+        return values.astype(np_dtype)
+    return np.frombuffer(buffer, dtype=np_dtype, count=chunk.offset + length)[chunk.offset:]
+
+
+def _ingest_fixed_width(chunks, np_dtype, size, null_count, target, chunk_bytes):
+    data = target.empty(size, np_dtype)
+    valid = np.ones(size, dtype=np.bool_) if null_count > 0 else None
+    rows_per_piece = max(chunk_bytes // np_dtype.itemsize, 1)
+
+    offset = 0
+    for chunk in chunks:
+        values = _chunk_values(chunk, np_dtype)
+        for start in range(0, len(values), rows_per_piece):
+            target.upload(data, offset + start, values[start:start + rows_per_piece])
+        if valid is not None and chunk.null_count > 0:
+            valid[offset:offset + len(chunk)] = _unpack_bits(chunk.buffers()[0], chunk.offset, len(chunk))
+        offset = offset + len(chunk)
+
+    if valid is not None:
+        valid = np.packbits(valid, bitorder='little')
+    return IngestedColumn(np_dtype, data, valid, null_count)
+
+
+def _ingest_strings(chunks, null_count, target, chunk_bytes):
+    parts = []
+    for chunk in chunks:
+        length = len(chunk)
+        buffers = chunk.buffers()
+        offsets = np.frombuffer(buffers[1], dtype=np.int32, count=chunk.offset + length + 1)[chunk.offset:]
+        data = np.frombuffer(buffers[2], dtype=np.uint8) if buffers[2] is not None else np.empty(0, dtype=np.uint8)
+        start = 0
+        while start < length:
+            # as many rows as fit in chunk_bytes, at least one
+            end = int(np.searchsorted(offsets, offsets[start] + chunk_bytes, side='right')) - 1
+            end = min(max(end, start + 1), length)
+            piece_offsets = offsets[start:end + 1] - offsets[start]
+            piece_data = data[offsets[start]:offsets[end]]
+            valid = None
+            piece_nulls = 0
+            if chunk.null_count > 0:
+                bits = _unpack_bits(buffers[0], chunk.offset + start, end - start)
+                piece_nulls = int(len(bits) - np.count_nonzero(bits))
+                valid = np.packbits(bits, bitorder='little')
+            parts.append(target.strings(piece_data, piece_offsets, valid, piece_nulls))
+            start = end
+    return IngestedColumn(np.dtype('object'), target.concat_strings(parts), None, null_count)
+
+
+def ingest_table(table, target, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Uploads the columns of a pyarrow.Table to target without going through pandas.
+
+    Every column is allocated once and filled chunk by chunk straight from the
+    Arrow buffers, in pieces of at most chunk_bytes. Dictionary encoded chunks
+    are decoded first. Returns a list of (name, IngestedColumn).
+    """
+    columns = []
+    for name, column in zip(table.schema.names, table.columns):
+        # a pyarrow.Column on older pyarrow, a ChunkedArray on newer
+        chunks = list(column.chunks if hasattr(column, 'chunks') else column.data.chunks)
+        chunks = [chunk.dictionary_decode() if pa.types.is_dictionary(chunk.type) else chunk for chunk in chunks]
+        arrow_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        size = sum(len(chunk) for chunk in chunks)
+        null_count = sum(chunk.null_count for chunk in chunks)
+
+        if pa.types.is_string(arrow_type):
+            columns.append((name, _ingest_strings(chunks, null_count, target, chunk_bytes)))
+        else:
+            columns.append((name, _ingest_fixed_width(chunks, _arrow_np_dtype(arrow_type), size, null_count, target, chunk_bytes)))
+    return columns
+
+
+def table_to_frame(table, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """cudf DataFrame with the data of a pyarrow.Table, see ingest_table."""
+    from cudf import DataFrame
+    from cudf.dataframe.buffer import Buffer
+    from cudf.dataframe.columnops import build_column
+    from cudf.dataframe.string import StringColumn
+    from numba import cuda
+
+    gdf_columns = []
+    for name, column in ingest_table(table, DeviceTarget(), chunk_bytes):
+        if column.dtype == np.dtype('object'):
+            gdf_columns.append((name, StringColumn(column.data).view(StringColumn, dtype='object')))
+        elif column.valid is None:
+            gdf_columns.append((name, build_column(Buffer(column.data), column.dtype)))
+        else:
+            gdf_columns.append((name, build_column(Buffer(column.data), column.dtype, Buffer(cuda.to_device(column.valid)))))
+    return DataFrame(gdf_columns)
@@ -0,0 +1,106 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultReaper:
+    """Keeps track of the live engine results of a connector and frees them on a background thread.
+
+    release() only queues the result, so neither an explicit release nor the
+    garbage collector wait on the network. The thread frees the queued results
+    in order. The protocol has no message to free several results, so every
+    result is one FreeResult request, over the pooled connection of its node.
+    free(token, path, port) does the actual request, errors are printed and
+    the result is dropped.
+    """
+
+    def __init__(self, free):
+        self.free = free
+        self.freed = 0
+        self.failed = 0
+
+        self._live = OrderedDict()
+        self._queue = []
+        self._next_key = 0
+        self._thread = None
+        self._busy = False
+        self._condition = threading.Condition()
+
+    def track(self, token, path, port, nbytes):
+        """Registers a live result, returns the key to release it with."""
+        with self._condition:
+            self._next_key = self._next_key + 1
+            key = self._next_key
+            self._live[key] = {'token': token, 'path': path, 'port': port, 'nbytes': nbytes, 'created': time.time()}
+        return key
+
+    def release(self, key, timing=None):
+        """Queues the result of key to be freed, releasing a key twice does nothing."""
+        with self._condition:
+            entry = self._live.pop(key, None)
+            if entry is None:
+                return
+            self._queue.append((entry, timing))
+            self._start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Waits until every released result was freed, returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while len(self._queue) > 0 or self._busy:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                self._condition.wait(remaining)
+        return True
+
+    def live(self):
+        """Report of the results that were not released yet."""
+        now = time.time()
+        with self._condition:
+            results = [{'token': entry['token'], 'node': '%s:%s' % (entry['path'], entry['port']),
+                        'nbytes': entry['nbytes'], 'seconds': now - entry['created']}
+                       for entry in self._live.values()]
+            pending = len(self._queue)
+        return {'count': len(results), 'nbytes': sum(result['nbytes'] for result in results),
+                'pending_free': pending, 'freed': self.freed, 'failed': self.failed, 'results': results}
+
+    # must be called with the condition held
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pyblazing-reaper', daemon=True)
+            self._thread.start()
+            # results released while the interpreter shuts down are still freed
+            atexit.register(self.flush, 10)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while len(self._queue) == 0:
+                    self._condition.wait()
+                self._busy = True
+                pending = self._queue
+                self._queue = []
+
+            for entry, timing in pending:
+                self._free(entry['token'], entry['path'], entry['port'], timing)
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def _free(self, token, path, port, timing):
+        try:
+            if timing is None:
+                self.free(token, path, port)
+            else:
+                with timing.phase('free', node='%s:%s' % (path, port)):
+                    self.free(token, path, port)
+            self.freed = self.freed + 1
+        except Exception as error:
+            self.failed = self.failed + 1
+            print("ERROR: could not free result " + str(token) + " on " + str(path) + ":" + str(port) + ": " + str(error))
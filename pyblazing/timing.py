@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+# in the order a query goes through them
+PHASES = ('prune', 'plan', 'dispatch', 'execute', 'fetch', 'ipc_open', 'column_build', 'assemble', 'concat', 'free')
+
+class Span(namedtuple('Span', ['name', 'start', 'end', 'attributes'])):
+
+    @property
+    def milliseconds(self):
+        return (self.end - self.start) * 1000
+
+
+class QueryTiming:
+    """Per phase timing record of one query.
+
+    Client side phases are timed around the call. plan (when the orchestrator
+    runs Calcite) and execute are timed by the services and recorded from the
+    durations they report. A phase that runs on several nodes has one span per
+    node (with a node attribute) and adds up in phases().
+
+    hook(timing, span) is called for every hook in hooks (the timing hooks of
+    the context that runs the query) each time a phase ends. span.start and
+    span.end are epoch seconds, so a hook can replay them as OpenTelemetry
+    spans (or log them, or feed a histogram). Hooks run on the thread that
+    finished the phase and must be fast; exceptions are printed and ignored.
+    """
+
+    def __init__(self, sql=None, start=None, hooks=()):
+        self.sql = sql
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.spans = []
+        self.hooks = hooks
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, **attributes):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.time(), **attributes)
+
+    def record(self, name, start, end, **attributes):
+        if name not in PHASES:
+            raise ValueError("Unknown query phase: " + str(name))
+        span = Span(name, start, end, attributes)
+        with self._lock:
+            self.spans.append(span)
+        for hook in list(self.hooks):
+            try:
+                hook(self, span)
+            except Exception as error:
+                print("ERROR: query timing hook failed: " + str(error))
+        return span
+
+    # the query is done on the client side, free only happens when the result is released
+    def finish(self):
+        self.end = time.time()
+        return self.total()
+
+    # in milliseconds, like calciteTime, ralTime and totalTime
+    def total(self):
+        end = self.end if self.end is not None else time.time()
+        return (end - self.start) * 1000
+
+    def phases(self):
+        totals = OrderedDict((name, 0) for name in PHASES)
+        with self._lock:
+            for span in self.spans:
+                totals[span.name] = totals[span.name] + span.milliseconds
+        return totals
+
+    def __str__(self):
+        lines = ['%-12s %10.3f ms' % (name, milliseconds) for name, milliseconds in self.phases().items()]
+        lines.append('%-12s %10.3f ms' % ('total', self.total()))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return str(self)
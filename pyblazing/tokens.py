@@ -0,0 +1,56 @@
+import threading
+import weakref
+
+DATA = 'data'
+VALID = 'valid'
+
+
+class ColumnTokenRegistry:
+    """Maps the buffers of result columns to the RAL column tokens they come from.
+
+    create_table uses it to send the token of a result column back instead of
+    an IPC handle to its memory (zero copy re-registration). Entries are keyed
+    on id() of the buffer but keep a weak reference to it: an entry goes away
+    as soon as its buffer is garbage collected, and a lookup checks that the
+    buffer is the one that was registered, so a reused id() never maps to a
+    stale token. Every PyConnector has its own registry.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, buffer, token, kind=DATA):
+        """Returns the key to discard the entry with, e.g. when the result is freed."""
+        key = (kind, id(buffer))
+        ref = weakref.ref(buffer, lambda ref, key=key: self._expire(key, ref))
+        with self._lock:
+            self._entries[key] = (ref, token)
+        return key
+
+    def lookup(self, buffer, kind=DATA):
+        """The token of buffer, None when it does not come from a live result."""
+        with self._lock:
+            entry = self._entries.get((kind, id(buffer)))
+        if entry is None or entry[0]() is not buffer:
+            return None
+        return entry[1]
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            kinds = [key[0] for key in self._entries]
+        return {'size': len(kinds), 'data': kinds.count(DATA), 'valid': kinds.count(VALID)}
+
+    # weakref callback, the entry may have been replaced by a new buffer with the same id() already
+    def _expire(self, key, ref):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is ref:
+                del self._entries[key]
@@ -0,0 +1,461 @@
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+
+def _is_alive(sock):
+    # an idle connection must not be readable: readable means the peer closed
+    # it (recv returns b'') or sent unexpected bytes, both make it unusable
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return not readable
+    except (OSError, ValueError):
+        return False
+
+
+def _set_keepalive(sock, idle, interval):
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    except OSError:
+        pass
+
+
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+def resolve_endpoint(host, port):
+    """Returns (path, None) for a node connection whose host is a unix socket path (IPC), (host, port) otherwise."""
+    if port is None or host.startswith('/'):
+        return host, None
+    return host, port
+
+
+class _TrackedSocket:
+    """A socket that remembers whether a request wrote to it, see SocketConnection."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.wrote = False
+
+    def send(self, data, *args):
+        self.wrote = True
+        return self._sock.send(data, *args)
+
+    def sendall(self, data, *args):
+        self.wrote = True
+        return self._sock.sendall(data, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class SocketConnection:
+    """A blazingdb.protocol connection over a socket the pool opened and owns.
+
+    blazingdb.protocol.Client writes and reads it through socket_, like the
+    TcpSocketConnection and UnixSocketConnection of the protocol. Writes are
+    tracked, so the pool knows when a failed request never reached the service.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.socket_ = _TrackedSocket(sock)
+
+    def wrote(self):
+        return self.socket_.wrote
+
+    def reset(self):
+        self.socket_.wrote = False
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+# port is None for unix sockets, see resolve_endpoint
+def _open_socket(host, port):
+    if port is not None:
+        return socket.create_connection((host, port))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(host)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def _make_connection(host, port):
+    import blazingdb.protocol
+
+    connection = SocketConnection(_open_socket(host, port))
+    return connection, blazingdb.protocol.Client(connection)
+
+
+class PooledConnection:
+
+    def __init__(self, key, connection, client):
+        self.key = key
+        self.connection = connection
+        self.client = client
+        self.last_used = time.time()
+        self.uses = 0
+
+    def socket(self):
+        return self.connection.sock
+
+    def send(self, requestBuffer):
+        self.connection.reset()
+        return self.client.send(requestBuffer)
+
+    def wrote(self):
+        return self.connection.wrote()
+
+    def close(self):
+        self.connection.close()
+        self.connection = None
+        self.client = None
+
+
+class ConnectionPool:
+    """Keeps protocol connections open between requests, keyed by (host, port).
+
+    Idle connections are health checked before being reused and evicted after
+    idle_timeout seconds. At most max_size connections are open per key, extra
+    senders wait up to acquire_timeout seconds for one to be released.
+    """
+
+    def __init__(self, max_size=8, idle_timeout=60, keepalive=True, keepalive_idle=30,
+                 keepalive_interval=10, acquire_timeout=30, connection_factory=_make_connection):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.acquire_timeout = acquire_timeout
+        self.connection_factory = connection_factory
+
+        self._idle = {}
+        self._open = {}
+        self._condition = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def configure(self, **kwargs):
+        with self._condition:
+            for name, value in kwargs.items():
+                if not hasattr(self, name) or name.startswith('_'):
+                    raise ValueError("Unknown connection pool option: " + name)
+                setattr(self, name, value)
+            self._condition.notify_all()
+
+    def send(self, host, port, requestBuffer):
+        pooled = self.acquire(host, port)
+        try:
+            response = pooled.send(requestBuffer)
+        except OSError:
+            wrote = pooled.wrote()
+            self.discard(pooled)
+            # the peer closed a connection that still looked healthy when it was taken from the
+            # pool. The request is sent again only when none of it was written: the service may
+            # already have run one it received, and DDL and DML requests must not run twice
+            if pooled.uses == 0 or wrote:
+                raise
+            pooled = self.acquire(host, port, fresh=True)
+            try:
+                response = pooled.send(requestBuffer)
+            except BaseException:
+                self.discard(pooled)
+                raise
+        except BaseException:
+            self.discard(pooled)
+            raise
+
+        self.release(pooled)
+        return response
+
+    def acquire(self, host, port, fresh=False):
+        key = (host, port)
+        deadline = None
+        if self.acquire_timeout is not None:
+            deadline = time.time() + self.acquire_timeout
+
+        with self._condition:
+            while True:
+                self._evict_idle(time.time())
+                idle = self._idle.get(key)
+                while idle and not fresh:
+                    pooled = idle.pop()
+                    if _is_alive(pooled.socket()):
+                        self.reused = self.reused + 1
+                        return pooled
+                    self._close(pooled)
+                    self.evicted = self.evicted + 1
+
+                if self._open.get(key, 0) < self.max_size:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+
+                if fresh and idle:
+                    # make room for the new connection
+                    self._close(idle.popleft())
+                    self._open[key] = self._open[key] + 1
+                    break
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise RuntimeError("Timed out waiting for a connection to %s:%s, all %d are in use" % (host, port, self.max_size))
+                self._condition.wait(remaining)
+
+        try:
+            connection, client = self._connect(host, port)
+        except BaseException:
+            with self._condition:
+                self._open[key] = self._open[key] - 1
+                self._condition.notify()
+            raise
+
+        pooled = PooledConnection(key, connection, client)
+        sock = pooled.socket()
+        if self.keepalive and sock.family != getattr(socket, 'AF_UNIX', None):
+            _set_keepalive(sock, self.keepalive_idle, self.keepalive_interval)
+
+        with self._condition:
+            self.created = self.created + 1
+        return pooled
+
+    def _connect(self, host, port):
+        return self.connection_factory(*resolve_endpoint(host, port))
+
+    def release(self, pooled):
+        pooled.uses = pooled.uses + 1
+        pooled.last_used = time.time()
+        with self._condition:
+            if self._open.get(pooled.key, 0) > self.max_size:
+                # the pool was shrunk while this connection was in use
+                self._close(pooled)
+            else:
+                self._idle.setdefault(pooled.key, deque()).append(pooled)
+            self._condition.notify()
+
+    def discard(self, pooled):
+        with self._condition:
+            self._close(pooled)
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            for idle in self._idle.values():
+                while idle:
+                    self._close(idle.pop())
+            self._idle.clear()
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'evicted': self.evicted,
+                'open': sum(self._open.values()),
+                'idle': sum(len(idle) for idle in self._idle.values()),
+            }
+
+    # must be called with the lock held
+    def _close(self, pooled):
+        pooled.close()
+        self._open[pooled.key] = max(self._open.get(pooled.key, 0) - 1, 0)
+
+    # must be called with the lock held
+    def _evict_idle(self, now):
+        if self.idle_timeout is None:
+            return
+        for idle in self._idle.values():
+            # connections are appended on release, so the oldest ones are on the left
+            while idle and now - idle[0].last_used > self.idle_timeout:
+                self._close(idle.popleft())
+                self.evicted = self.evicted + 1
+
+
+# Frames of the non-blocking transport: a little endian uint32 length followed by
+# the payload, the framing of blazingdb.protocol.Client. tests/test_transport.py
+# checks it against the protocol's Client when blazingdb.protocol is installed.
+_FRAME_HEADER = struct.Struct('<I')
+
+
+async def write_frame(writer, buffer):
+    writer.write(_FRAME_HEADER.pack(len(buffer)))
+    writer.write(buffer)
+    await writer.drain()
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(_FRAME_HEADER.size)
+    (length,) = _FRAME_HEADER.unpack(header)
+    return await reader.readexactly(length)
+
+
+def probe(host, port, requestBuffer, timeout):
+    """Whether the service at host, port starts answering requestBuffer within timeout.
+
+    A service accepts connections as soon as its socket is bound, it handles
+    requests once it finished starting. Any response, errors included, shows
+    it does: the response is not read past its first byte.
+    """
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return False
+    try:
+        sock.sendall(_FRAME_HEADER.pack(len(requestBuffer)) + requestBuffer)
+        return sock.recv(1) != b''
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class AsyncPooledConnection:
+
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.time()
+        self.uses = 0
+        self.answered = False
+
+    def is_alive(self):
+        if self.reader.at_eof() or self.writer.is_closing():
+            return False
+        # the event loop may not have read the EOF of a peer that closed the connection yet
+        sock = self.writer.get_extra_info('socket')
+        return sock is None or _is_alive(sock)
+
+    async def send(self, requestBuffer):
+        import asyncio
+
+        self.answered = False
+        await write_frame(self.writer, requestBuffer)
+        try:
+            header = await self.reader.readexactly(_FRAME_HEADER.size)
+        except asyncio.IncompleteReadError as error:
+            self.answered = len(error.partial) > 0
+            raise
+        self.answered = True
+        (length,) = _FRAME_HEADER.unpack(header)
+        return await self.reader.readexactly(length)
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncConnectionPool:
+    """asyncio version of ConnectionPool.
+
+    Connections are asyncio streams, so a request only holds the event loop
+    while its frames are written or read. At most max_size requests are in
+    flight per (host, port), the rest wait for a connection to be released.
+    Like ConnectionPool, idle connections are health checked before being reused.
+    """
+
+    def __init__(self, max_size=8, idle_timeout=60):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        self._idle = {}
+        self._slots = {}
+
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    # asyncio is imported inside the coroutines, it is already loaded once an
+    # event loop runs them and it is one of the slowest modules to import
+    async def send(self, host, port, requestBuffer):
+        import asyncio
+
+        key = (host, port)
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = asyncio.Semaphore(self.max_size)
+            self._slots[key] = slots
+
+        async with slots:
+            pooled = await self._acquire(key)
+            try:
+                response = await pooled.send(requestBuffer)
+            except (OSError, asyncio.IncompleteReadError):
+                pooled.close()
+                # the health check of _acquire can not see a peer that closes an idle connection while the
+                # request is written: the request fails before any of its answer was read and is sent once
+                # more on a new connection. A request that was answered in part is not sent again
+                if pooled.uses == 0 or pooled.answered:
+                    raise
+                self.evicted = self.evicted + 1
+                pooled = await self._acquire(key, fresh=True)
+                try:
+                    response = await pooled.send(requestBuffer)
+                except BaseException:
+                    pooled.close()
+                    raise
+            except BaseException:
+                pooled.close()
+                raise
+            self._release(pooled)
+            return response
+
+    async def _acquire(self, key, fresh=False):
+        now = time.time()
+        idle = self._idle.get(key)
+        while idle and not fresh:
+            pooled = idle.pop()
+            if pooled.is_alive() and (self.idle_timeout is None or now - pooled.last_used <= self.idle_timeout):
+                self.reused = self.reused + 1
+                return pooled
+            pooled.close()
+            self.evicted = self.evicted + 1
+
+        reader, writer = await self._connect(key[0], key[1])
+        self.created = self.created + 1
+        return AsyncPooledConnection(key, reader, writer)
+
+    async def _connect(self, host, port):
+        import asyncio
+
+        path, port = resolve_endpoint(host, port)
+        if port is None:
+            return await asyncio.open_unix_connection(path)
+        return await asyncio.open_connection(path, port)
+
+    def _release(self, pooled):
+        pooled.uses = pooled.uses + 1
+        pooled.last_used = time.time()
+        self._idle.setdefault(pooled.key, deque()).append(pooled)
+
+    async def close_all(self):
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
+        self._idle.clear()
+
+    def stats(self):
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'evicted': self.evicted,
+            'idle': sum(len(idle) for idle in self._idle.values()),
+        }
@@ -0,0 +1,150 @@
+import io
+import unittest
+
+import numpy as np
+import pyarrow as pa
+
+from pyblazing.arrow import DEFAULT_CHUNK_BYTES, HostColumn, HostTarget, host_columns_to_record_batch, ingest_table, split_record_batch, write_stream
+
+
+class TestHostColumns(unittest.TestCase):
+
+    def test_fixed_width(self):
+        batch = host_columns_to_record_batch(['a', 'b'], [HostColumn(np.arange(5, dtype=np.int64)),
+                                                         HostColumn(np.linspace(0, 1, 5))])
+        self.assertEqual(batch.schema.types, [pa.int64(), pa.float64()])
+        self.assertEqual(batch.column(0).to_pylist(), [0, 1, 2, 3, 4])
+
+    def test_null_mask(self):
+        # rows 1 and 3 are null, the mask is LSB first like cudf and arrow
+        batch = host_columns_to_record_batch(['a'], [HostColumn(np.arange(5, dtype=np.int32), bytes([0b10101]), 2)])
+        self.assertEqual(batch.column(0).to_pylist(), [0, None, 2, None, 4])
+        self.assertEqual(batch.column(0).null_count, 2)
+
+    def test_bool_and_dates(self):
+        dates = np.array(['2019-01-01', '2019-06-30'], dtype='datetime64[ms]')
+        batch = host_columns_to_record_batch(['flag', 'day'], [HostColumn(np.array([True, False]), bytes([0b01]), 1),
+                                                               HostColumn(dates)])
+        self.assertEqual(batch.column(0).to_pylist(), [True, None])
+        self.assertEqual(batch.schema.types[1], pa.timestamp('ms'))
+
+    def test_strings(self):
+        batch = host_columns_to_record_batch(['s'], [HostColumn(['x', 'yy', None])])
+        self.assertEqual(batch.column(0).to_pylist(), ['x', 'yy', None])
+        self.assertEqual(batch.schema.types, [pa.string()])
+
+
+class TestStream(unittest.TestCase):
+
+    def make_batch(self, rows):
+        return host_columns_to_record_batch(['a'], [HostColumn(np.arange(rows, dtype=np.int64))])
+
+    def test_split(self):
+        batches = split_record_batch(self.make_batch(10), max_rows=4)
+        self.assertEqual([batch.num_rows for batch in batches], [4, 4, 2])
+        self.assertEqual(split_record_batch(self.make_batch(3), max_rows=4)[0].num_rows, 3)
+
+    def test_write_stream(self):
+        sink = io.BytesIO()
+        rows = write_stream(sink, iter([self.make_batch(3), self.make_batch(2)]))
+
+        self.assertEqual(rows, 5)
+        table = pa.ipc.open_stream(sink.getvalue()).read_all()
+        self.assertEqual(table.column('a').to_pylist(), [0, 1, 2, 0, 1])
+
+    def test_write_empty_stream(self):
+        sink = io.BytesIO()
+        self.assertEqual(write_stream(sink, iter([])), 0)
+        self.assertEqual(pa.ipc.open_stream(sink.getvalue()).read_all().num_rows, 0)
+
+
+def host_strings(parts):
+    values = []
+    for data, offsets, valid, null_count in parts:
+        bits = np.ones(len(offsets) - 1, dtype=np.bool_) if valid is None else np.unpackbits(valid, bitorder='little').view(np.bool_)
+        for i in range(len(offsets) - 1):
+            values.append(bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') if bits[i] else None)
+    return values
+
+
+def host_values(column):
+    if column.valid is None:
+        return column.data.tolist()
+    bits = np.unpackbits(column.valid, bitorder='little')[:len(column.data)]
+    return [value if bit else None for value, bit in zip(column.data.tolist(), bits)]
+
+
+class TestIngest(unittest.TestCase):
+
+    def ingest(self, table, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        return dict(ingest_table(table, HostTarget(), chunk_bytes))
+
+    def test_fixed_width(self):
+        table = pa.table({'a': pa.array([1, 2, 3], pa.int64()), 'b': pa.array([0.5, None, 2.0])})
+        columns = self.ingest(table)
+
+        self.assertEqual(columns['a'].dtype, np.dtype(np.int64))
+        self.assertEqual(host_values(columns['a']), [1, 2, 3])
+        self.assertIsNone(columns['a'].valid)
+        self.assertEqual(host_values(columns['b']), [0.5, None, 2.0])
+        self.assertEqual(columns['b'].null_count, 1)
+
+    def test_chunked_and_sliced(self):
+        column = pa.chunked_array([pa.array(range(10), pa.int32()).slice(3, 4), pa.array([None, 20, None], pa.int32())])
+        columns = self.ingest(pa.table({'a': column}), chunk_bytes=8)
+
+        self.assertEqual(host_values(columns['a']), [3, 4, 5, 6, None, 20, None])
+        self.assertEqual(columns['a'].null_count, 2)
+
+    def test_bool_and_dates(self):
+        table = pa.table({'b': pa.array([True, None, False, True]).slice(1),
+                          'd': pa.array([0, 1, 2], pa.date32()),
+                          't': pa.array([1000, 2000, 3000], pa.timestamp('us'))})
+        columns = self.ingest(table)
+
+        self.assertEqual(host_values(columns['b']), [None, False, True])
+        self.assertEqual(columns['d'].dtype, np.dtype('datetime64[ms]'))
+        self.assertEqual(columns['d'].data.astype(np.int64).tolist(), [0, 86400000, 172800000])
+        self.assertEqual(columns['t'].dtype, np.dtype('datetime64[ms]'))
+        self.assertEqual(columns['t'].data.astype(np.int64).tolist(), [1, 2, 3])
+
+    def test_timestamps_are_milliseconds(self):
+        # GDF_DATE64 is the only timestamp type of the engine
+        nanoseconds = pa.array([1500000, None, 2999999999, 4000000000], pa.timestamp('ns')).slice(1)
+        table = pa.table({'ns': nanoseconds, 's': pa.array([1, 2, 3], pa.timestamp('s')),
+                          'ms': pa.array([4, 5, 6], pa.timestamp('ms', tz='UTC'))})
+        columns = self.ingest(table, chunk_bytes=8)
+
+        self.assertEqual([columns[name].dtype for name in ['ns', 's', 'ms']], [np.dtype('datetime64[ms]')] * 3)
+        self.assertEqual(columns['ns'].data.astype(np.int64)[1:].tolist(), [2999, 4000])
+        self.assertEqual(columns['ns'].null_count, 1)
+        self.assertEqual(columns['s'].data.astype(np.int64).tolist(), [1000, 2000, 3000])
+        self.assertEqual(columns['ms'].data.astype(np.int64).tolist(), [4, 5, 6])
+
+    def test_dictionary(self):
+        column = pa.chunked_array([pa.array(['x', 'y', 'x']).dictionary_encode(), pa.array([None, 'z']).dictionary_encode()])
+        columns = self.ingest(pa.table({'s': column, 'i': pa.array([5, 6, 5, 6, 5]).dictionary_encode()}))
+
+        self.assertEqual(host_strings(columns['s'].data), ['x', 'y', 'x', None, 'z'])
+        self.assertEqual(columns['s'].null_count, 1)
+        self.assertEqual(host_values(columns['i']), [5, 6, 5, 6, 5])
+
+    def test_strings_in_bounded_pieces(self):
+        values = ['aaaa', 'bb', None, '', 'cccccc', 'd']
+        columns = self.ingest(pa.table({'s': pa.array(values).slice(1)}), chunk_bytes=4)
+
+        self.assertEqual(host_strings(columns['s'].data), values[1:])
+        self.assertTrue(all(len(part[0]) <= 6 for part in columns['s'].data))
+        self.assertGreater(len(columns['s'].data), 1)
+
+    def test_empty_and_unsupported(self):
+        columns = self.ingest(pa.table({'a': pa.array([], pa.int64()), 's': pa.array([], pa.string())}))
+        self.assertEqual(len(columns['a'].data), 0)
+        self.assertEqual(columns['s'].data, [])
+
+        with self.assertRaises(ValueError):
+            self.ingest(pa.table({'l': pa.array([[1]])}))
+
+
+if __name__ == '__main__':
+    unittest.main()
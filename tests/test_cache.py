@@ -0,0 +1,120 @@
+import unittest
+from unittest import mock
+
+from pyblazing.apiv2 import cache
+from pyblazing.apiv2.cache import PlanCache, ResultCache, normalize_sql, referenced_tables
+
+
+class TestNormalizeSql(unittest.TestCase):
+
+    def test_whitespace_and_keywords(self):
+        self.assertEqual(normalize_sql('SELECT  a,\n b FROM main.t ;'), 'select a, b from main.t')
+        self.assertEqual(normalize_sql('select a, b from main.t'), normalize_sql('  Select a, b\tFROM main.t'))
+
+    def test_identifier_and_literal_case(self):
+        self.assertNotEqual(normalize_sql('select A from t'), normalize_sql('select a from t'))
+        self.assertNotEqual(normalize_sql('select a from T'), normalize_sql('select a from t'))
+        self.assertNotEqual(normalize_sql("select a from t where b = 'X'"), normalize_sql("select a from t where b = 'x'"))
+        self.assertNotEqual(normalize_sql('select "A" from t'), normalize_sql('select "a" from t'))
+
+    def test_quoted_text_is_kept(self):
+        self.assertEqual(normalize_sql("SELECT * FROM t WHERE name = 'Ab  C'"), "select * from t where name = 'Ab  C'")
+        self.assertEqual(normalize_sql("SELECT * FROM t WHERE name = 'It''s  FROM'"), "select * from t where name = 'It''s  FROM'")
+        self.assertEqual(normalize_sql('SELECT "Col A", `Col  B` FROM t'), 'select "Col A", `Col  B` from t')
+        self.assertEqual(normalize_sql('SELECT a -- Note  A\n FROM t /* WHERE  b */'), 'select a -- Note  A\n from t /* WHERE  b */')
+
+
+class TestPlanCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = PlanCache()
+        self.assertIsNone(cache.get('select * from t', 0))
+        cache.put('select * from t', 0, 'LogicalProject')
+        self.assertEqual(cache.get('SELECT *  FROM t', 0), 'LogicalProject')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_catalog_version(self):
+        cache = PlanCache()
+        cache.put('select * from t', 0, 'LogicalProject')
+        self.assertIsNone(cache.get('select * from t', 1))
+
+    def test_lru_eviction(self):
+        cache = PlanCache(max_size=2)
+        cache.put('select 1', 0, 'one')
+        cache.put('select 2', 0, 'two')
+        cache.get('select 1', 0)
+        cache.put('select 3', 0, 'three')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('select 2', 0))
+        self.assertEqual(cache.get('select 1', 0), 'one')
+
+
+class FakeFrame:
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def copy(self, deep=True):
+        return FakeFrame(self.nbytes)
+
+
+class TestReferencedTables(unittest.TestCase):
+
+    def test_referenced_tables(self):
+        tables = ['orders', 'nation', 'region']
+        self.assertEqual(referenced_tables('select * from main.Orders o join nation n on o.k = n.k', tables), ['nation', 'orders'])
+        self.assertEqual(referenced_tables("select * from orders where c = 'region'", tables), ['orders'])
+
+
+@mock.patch.object(cache, 'frame_nbytes', lambda frame: frame.nbytes)
+class TestResultCache(unittest.TestCase):
+
+    def put(self, result_cache, sql, versions, nbytes):
+        key = result_cache.key(sql, versions)
+        return result_cache.put(key, FakeFrame(nbytes), 1, 2, 3, 1)
+
+    def test_key_uses_table_versions(self):
+        result_cache = ResultCache(100)
+        self.put(result_cache, 'select * from orders', {'orders': 1, 'nation': 1}, 10)
+        self.assertIsNotNone(result_cache.get(result_cache.key('SELECT * FROM orders', {'orders': 1, 'nation': 2})))
+        self.assertIsNone(result_cache.get(result_cache.key('select * from orders', {'orders': 2, 'nation': 1})))
+
+    def test_invalidate_table(self):
+        result_cache = ResultCache(100)
+        self.put(result_cache, 'select * from orders', {'orders': 1, 'nation': 1}, 10)
+        self.put(result_cache, 'select * from nation', {'orders': 1, 'nation': 1}, 10)
+        result_cache.invalidate_table('orders')
+        self.assertEqual(len(result_cache), 1)
+        self.assertEqual(result_cache.stats()['nbytes'], 10)
+
+    def test_lru_eviction(self):
+        result_cache = ResultCache(25)
+        versions = {'t': 1}
+        self.put(result_cache, 'select 1 from t', versions, 10)
+        self.put(result_cache, 'select 2 from t', versions, 10)
+        result_cache.get(result_cache.key('select 1 from t', versions))
+        self.put(result_cache, 'select 3 from t', versions, 10)
+        self.assertIsNone(result_cache.get(result_cache.key('select 2 from t', versions)))
+        self.assertEqual(result_cache.stats()['evictions'], 1)
+
+    def test_lfu_eviction(self):
+        result_cache = ResultCache(25, policy='lfu')
+        versions = {'t': 1}
+        self.put(result_cache, 'select 1 from t', versions, 10)
+        self.put(result_cache, 'select 2 from t', versions, 10)
+        result_cache.get(result_cache.key('select 1 from t', versions))
+        result_cache.get(result_cache.key('select 1 from t', versions))
+        result_cache.get(result_cache.key('select 2 from t', versions))
+        self.put(result_cache, 'select 3 from t', versions, 10)
+        self.assertIsNotNone(result_cache.get(result_cache.key('select 1 from t', versions)))
+        self.assertIsNone(result_cache.get(result_cache.key('select 2 from t', versions)))
+
+    def test_too_large(self):
+        result_cache = ResultCache(5)
+        self.assertIsNone(self.put(result_cache, 'select * from t', {'t': 1}, 10))
+        self.assertEqual(len(result_cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,15 @@
+import os
+import shutil
+import tempfile
+import time
 import unittest
+from types import SimpleNamespace
+from unittest import mock
 
 import blazingsql
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.apiv2.filesystem import FileSystem
+from pyblazing.apiv2.sql import SQL
 
 from cudf import DataFrame
 import pandas as pd
@@ -151,6 +160,121 @@ class TestCreateTableFromGDF(unittest.TestCase):
         print(now)
 
 
+def slow_create_table(client, table_name, **kwargs):
+    time.sleep(0.2)
+    if table_name == 'missing':
+        raise RuntimeError('File not found')
+    return 1
+
+
+class TestCreateTables(unittest.TestCase):
+
+    def setUp(self):
+        # only the catalog is needed, no services are started
+        self.context = blazingsql.BlazingContext.__new__(blazingsql.BlazingContext)
+        self.context.client = None
+        self.context.processes = None
+        self.context.sqlObject = SQL()
+        self.context.fs = FileSystem()
+
+    @mock.patch.object(internal_api, '_get_client', return_value=SimpleNamespace(_pool=SimpleNamespace(max_size=8)))
+    @mock.patch.object(internal_api, 'create_table', side_effect=slow_create_table)
+    def test_registrations_are_concurrent(self, create_table, get_client):
+        tables = {'t%d' % i: '/data/t%d.parquet' % i for i in range(8)}
+        tables['missing'] = ('/data/missing.csv', {'names': ['a'], 'dtypes': ['int32']})
+
+        start = time.time()
+        report = self.context.create_tables(tables)
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(report['n_failed'], 1)
+        self.assertEqual(report['tables']['missing']['error_message'], 'File not found')
+        self.assertTrue(report['tables']['t0']['valid'])
+        self.assertEqual(list(self.context.sqlObject.tables.keys()), ['t%d' % i for i in range(8)])
+
+    @mock.patch.object(internal_api, 'create_table', side_effect=slow_create_table)
+    def test_arguments_are_validated_first(self, create_table):
+        with self.assertRaisesRegex(Exception, 'bad_format'):
+            self.context.create_tables({'ok': '/data/ok.parquet', 'bad_format': '/data/table.xyz'})
+        create_table.assert_not_called()
+
+    @mock.patch.object(internal_api, '_get_client', return_value=SimpleNamespace(_pool=SimpleNamespace(max_size=8)))
+    @mock.patch.object(internal_api, 'create_table', side_effect=slow_create_table)
+    def test_globs_are_expanded(self, create_table, get_client):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for name in ['part-1.parquet', 'part-0.parquet', '_SUCCESS']:
+            open(os.path.join(root, name), 'w').close()
+
+        self.context.create_tables({'glob': root + '/*.parquet', 'directory': root})
+
+        paths = [os.path.join(root, 'part-0.parquet'), os.path.join(root, 'part-1.parquet')]
+        self.assertEqual([call[1]['path'] for call in create_table.call_args_list], [paths, paths])
+
+    @mock.patch.object(internal_api, '_get_client', return_value=SimpleNamespace(_pool=SimpleNamespace(max_size=8)))
+    @mock.patch.object(internal_api, 'create_table', side_effect=slow_create_table)
+    def test_hive_partitions(self, create_table, get_client):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for date in ['2026-10-01', '2026-10-02']:
+            os.makedirs(os.path.join(root, 'date=' + date))
+            open(os.path.join(root, 'date=' + date, 'part-0.parquet'), 'w').close()
+
+        self.context.create_tables({'sales': root, 'flat': (root, {'hive_partitions': False}),
+                                    'few': (root, {'max_pruned_tables': 2})})
+
+        partitions = self.context.sqlObject.tables['sales'].partitions
+        self.assertEqual(partitions.keys, ['date'])
+        self.assertEqual(partitions.types['date'], 'date')
+        self.assertIsNone(self.context.sqlObject.tables['flat'].partitions)
+        self.assertEqual(self.context.sqlObject.tables['sales'].max_pruned_tables, 8)
+        self.assertEqual(self.context.sqlObject.tables['few'].max_pruned_tables, 2)
+        with self.assertRaises(Exception):
+            self.context.create_tables({'none': (root, {'max_pruned_tables': 0})})
+
+    @mock.patch.object(internal_api, '_get_client', return_value=SimpleNamespace(_pool=SimpleNamespace(max_size=8)))
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_footers_are_read_concurrently(self, create_table, get_client):
+        def slow_schema(paths, format, options=None):
+            time.sleep(0.2)
+            return ['id'], ['int64']
+
+        tables = {'t%d' % i: ('/data/t%d.parquet' % i, {'cache_schema': True}) for i in range(8)}
+        tables['plain'] = '/data/plain.parquet'
+        with mock.patch.object(self.context.fs, 'schema', side_effect=slow_schema) as schema:
+            start = time.time()
+            self.context.create_tables(tables)
+
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(schema.call_count, 8)
+        # the engine finds the types of the files itself unless cache_schema=True
+        sent = {call[0][1]: call[1] for call in create_table.call_args_list}
+        self.assertEqual(sent['t0']['names'], ['id'])
+        self.assertNotIn('names', sent['plain'])
+
+    @mock.patch.object(internal_api, '_get_client', return_value=SimpleNamespace(_pool=SimpleNamespace(max_size=8)))
+    @mock.patch.object(internal_api, 'create_table', side_effect=slow_create_table)
+    def test_schemas_are_cached(self, create_table, get_client):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, 'nation.psv')
+        with open(path, 'w') as file:
+            file.write('1|ALGERIA\n2|ARGENTINA\n')
+
+        for i in range(2):
+            self.context.create_tables({'nation': (path, {'names': ['id', 'name'], 'cache_schema': True})})
+
+        csv_args = create_table.call_args[1]['csv_args']
+        self.assertEqual((csv_args.column_names, csv_args.column_types), (['id', 'name'], ['int64', 'str']))
+        self.assertEqual(self.context.schema_cache_stats()['hits'], 1)
+
+        # the types of csv files are inferred from a sample, they are only sent on request
+        self.context.clear_schema_cache()
+        self.context.create_tables({'nation': (path, {'names': ['id', 'name']})})
+        self.assertEqual(create_table.call_args[1]['csv_args'].column_types, [])
+        self.assertEqual(self.context.schema_cache_stats()['size'], 0)
+
+
 if __name__ == '__main__':
     unittest.main()
 
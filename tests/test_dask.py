@@ -0,0 +1,57 @@
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.apiv2.sql import ResultSet, _node_workers
+
+
+def make_token(host, port=8891):
+    return SimpleNamespace(resultToken=port, nodeConnection=SimpleNamespace(path=host.encode('utf8'), port=port), calciteTime=1)
+
+
+class TestNodeWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = {
+            'tcp://10.0.0.5:40001': {'host': '10.0.0.5'},
+            'tcp://10.0.0.6:40001': {'host': '10.0.0.6'},
+            'tcp://10.0.0.6:40002': {},
+        }
+
+    def test_nodes_go_to_workers_on_their_host(self):
+        tokens = [make_token('10.0.0.6'), make_token('10.0.0.5'), make_token('10.0.0.6')]
+
+        self.assertEqual(_node_workers(tokens, self.workers),
+                         ['tcp://10.0.0.6:40001', 'tcp://10.0.0.5:40001', 'tcp://10.0.0.6:40002'])
+
+    def test_loopback_nodes_are_paired_in_order(self):
+        tokens = [make_token('127.0.0.1'), make_token('127.0.0.1'), make_token('10.0.0.9')]
+
+        self.assertEqual(_node_workers(tokens, self.workers),
+                         ['tcp://10.0.0.5:40001', 'tcp://10.0.0.6:40001', 'tcp://10.0.0.6:40002'])
+
+    def test_no_workers(self):
+        with self.assertRaises(RuntimeError):
+            _node_workers([make_token('10.0.0.5')], {})
+
+
+class TestDaskResult(unittest.TestCase):
+
+    @mock.patch.object(internal_api, 'dask_result_meta')
+    def test_partitions_are_copies_by_default(self, dask_result_meta):
+        dataframe = SimpleNamespace(from_delayed=mock.Mock())
+        dask_client = mock.Mock()
+        dask_client.scheduler_info.return_value = {'workers': {'tcp://10.0.0.5:40001': {'host': '10.0.0.5'}}}
+        result_set = ResultSet(None, [make_token('10.0.0.5')], 0, dask_client)
+
+        with mock.patch.dict(sys.modules, {'dask': SimpleNamespace(dataframe=dataframe), 'dask.dataframe': dataframe}):
+            result_set.get()
+            result_set.get(transfer_ownership=True)
+
+        self.assertEqual([call[0][3] for call in dask_client.submit.call_args_list], [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
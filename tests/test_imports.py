@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import unittest
+
+# importing blazingsql must not load the GPU stack, see benchmarks/import_time.py
+HEAVY_MODULES = ('cudf', 'nvstrings', 'numba', 'pandas', 'pyarrow', 'dask', 'blazingdb', 'pyblazing.api', 'asyncio')
+
+
+def imported_modules(statement):
+    code = 'import sys\n%s\nprint(" ".join(sorted(sys.modules)))' % statement
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return set(output.decode('utf-8').split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_blazingsql(self):
+        modules = imported_modules('import blazingsql')
+        self.assertEqual([name for name in HEAVY_MODULES if name in modules], [])
+
+    def test_create_context_class(self):
+        modules = imported_modules('from pyblazing.apiv2.context import BlazingContext, make_default_csv_arg')
+        self.assertEqual([name for name in HEAVY_MODULES if name in modules], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyblazing.apiv2.listing import LocalLister, PathExpander, split_path
+
+
+class CountingLister(LocalLister):
+
+    def __init__(self, root=None):
+        super().__init__(root)
+        self.calls = 0
+
+    def list(self, path):
+        self.calls = self.calls + 1
+        return super().list(path)
+
+
+class TestPathExpander(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path in ['lineitem/part-1.parquet', 'lineitem/part-0.parquet', 'lineitem/_SUCCESS', 'lineitem/.part-0.crc',
+                     'orders/2026/01/a.csv', 'orders/2026/02/b.csv', 'orders/2025/12/c.csv', 'orders/notes.txt']:
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+        self.lister = CountingLister(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def expand(self, paths, expander=None, mounts=()):
+        if expander is None:
+            expander = PathExpander()
+        return expander.expand(paths, lambda prefix: self.lister, mounts)
+
+    def test_split_path(self):
+        self.assertEqual(split_path('hdfs://tpch/lineitem/*.parquet'), ('hdfs://tpch', '/lineitem/*.parquet'))
+        self.assertEqual(split_path('tpch:/lineitem/*.parquet'), ('tpch:', '/lineitem/*.parquet'))
+        self.assertEqual(split_path('/data/a.csv'), ('', '/data/a.csv'))
+        self.assertEqual(split_path('/tpch/lineitem/a.csv', ['tpch']), ('/tpch', '/lineitem/a.csv'))
+
+    def test_glob(self):
+        self.assertEqual(self.expand(['tpch:/lineitem/*.parquet']),
+                         ['tpch:/lineitem/part-0.parquet', 'tpch:/lineitem/part-1.parquet'])
+        self.assertEqual(self.expand(['tpch:/orders/2026/*/?.csv']),
+                         ['tpch:/orders/2026/01/a.csv', 'tpch:/orders/2026/02/b.csv'])
+
+    def test_mounted_prefix(self):
+        self.assertEqual(self.expand(['/tpch/lineitem/*.parquet'], mounts=['tpch']),
+                         ['/tpch/lineitem/part-0.parquet', '/tpch/lineitem/part-1.parquet'])
+
+    def test_recursive(self):
+        self.assertEqual(self.expand(['/orders/**/*.csv']),
+                         ['/orders/2025/12/c.csv', '/orders/2026/01/a.csv', '/orders/2026/02/b.csv'])
+
+    def test_directory(self):
+        self.assertEqual(self.expand(['/lineitem']), ['/lineitem/part-0.parquet', '/lineitem/part-1.parquet'])
+        self.assertEqual(len(self.expand(['/orders/'])), 4)
+
+    def test_partition_directories_are_not_hidden(self):
+        for path in ['t/year=2026/p.parquet', 't/year=__HIVE_DEFAULT_PARTITION__/p.parquet']:
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+            open(os.path.join(self.root, path), 'w').close()
+
+        self.assertEqual(self.expand(['/t']), ['/t/year=2026/p.parquet', '/t/year=__HIVE_DEFAULT_PARTITION__/p.parquet'])
+
+    def test_hidden_files_when_asked(self):
+        self.assertEqual(self.expand(['/lineitem/_*']), ['/lineitem/_SUCCESS'])
+
+    def test_files_are_passed_without_listing(self):
+        paths = ['/lineitem/part-%d.parquet' % i for i in range(100)]
+        self.assertEqual(self.expand(paths), paths)
+        self.assertEqual(self.lister.calls, 0)
+
+    def test_order_and_duplicates(self):
+        self.assertEqual(self.expand(['/lineitem/part-1.parquet', '/lineitem/*.parquet']),
+                         ['/lineitem/part-1.parquet', '/lineitem/part-0.parquet'])
+
+    def test_no_match(self):
+        with self.assertRaises(Exception):
+            self.expand(['/lineitem/*.orc'])
+
+    def test_listing_cache(self):
+        expander = PathExpander(ttl=60)
+        self.expand(['/orders/**/*.csv'], expander)
+        calls = self.lister.calls
+        self.expand(['/orders/**/*.csv'], expander)
+        self.assertEqual(self.lister.calls, calls)
+        self.assertEqual(expander.stats()['misses'], calls)
+
+        open(os.path.join(self.root, 'orders/2026/01/d.csv'), 'w').close()
+        self.assertEqual(len(self.expand(['/orders/**/*.csv'], expander)), 3)
+        expander.clear()
+        self.assertEqual(len(self.expand(['/orders/**/*.csv'], expander)), 4)
+
+    def test_no_cache(self):
+        expander = PathExpander(ttl=0)
+        self.expand(['/lineitem/*.parquet'], expander)
+        self.expand(['/lineitem/*.parquet'], expander)
+        self.assertEqual(self.lister.calls, 2)
+        self.assertEqual(len(expander), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+from unittest import mock
+
+from pyblazing.apiv2 import datasource
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.apiv2.context import BlazingContext
+from pyblazing.apiv2.partitions import discover_partitions, column_filters, partition_keys, pruned_table_name, rewrite
+from pyblazing.apiv2.sql import SQL
+from pyblazing.timing import QueryTiming
+
+FILES = ['/data/sales/date=2026-10-01/region=eu/part-0.parquet',
+         '/data/sales/date=2026-10-01/region=us/part-0.parquet',
+         '/data/sales/date=2026-10-02/region=eu/part-0.parquet',
+         '/data/sales/date=2026-10-03/region=eu/part-0.parquet',
+         '/data/sales/date=2026-10-03/region=__HIVE_DEFAULT_PARTITION__/part-0.parquet']
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def test_keys(self):
+        self.assertEqual(list(partition_keys('/t/date=2026-10-01/city=New%20York/p.parquet').items()),
+                         [('date', '2026-10-01'), ('city', 'New York')])
+        self.assertEqual(list(partition_keys('/t/p.parquet').items()), [])
+
+    def test_types(self):
+        partitions = discover_partitions(['/t/year=2025/x=1.5/a=b/p', '/t/year=2026/x=2/a=c/p'])
+        self.assertEqual(dict(partitions.types), {'year': 'int64', 'x': 'float64', 'a': 'string'})
+        self.assertEqual(discover_partitions(FILES).types['date'], 'date')
+
+    def test_not_partitioned(self):
+        self.assertIsNone(discover_partitions(['/t/a.parquet', '/t/b.parquet']))
+
+    def test_inconsistent(self):
+        with self.assertRaises(Exception):
+            discover_partitions(['/t/year=2025/p', '/t/month=1/p'])
+
+
+class TestFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.partitions = discover_partitions(FILES)
+
+    def select(self, sql, table_name='sales'):
+        pruned = column_filters(sql, table_name, self.partitions)
+        if pruned is None:
+            return None
+        return [FILES.index(file) for file in self.partitions.select(pruned.filters)]
+
+    def test_equality(self):
+        self.assertEqual(self.select("select * from sales where date = '2026-10-01'"), [0, 1])
+        self.assertEqual(self.select("select * from main.sales where region = 'eu' and date = DATE '2026-10-01'"), [0])
+        self.assertEqual(self.select("select * from sales where '2026-10-02' = sales.date"), [2])
+
+    def test_ranges(self):
+        self.assertEqual(self.select("select * from sales where date >= '2026-10-02'"), [2, 3, 4])
+        self.assertEqual(self.select("select * from sales where date between '2026-10-01' and '2026-10-02' and x > 3"), [0, 1, 2])
+        self.assertEqual(self.select("select * from sales s where s.region in ('us', 'xx')"), [1])
+        self.assertEqual(self.select("select * from sales where region not in ('eu')"), [1])
+        self.assertEqual(self.select("select * from sales where (region <> 'eu')"), [1])
+
+    def test_not_pruned(self):
+        self.assertIsNone(self.select("select * from sales"))
+        self.assertIsNone(self.select("select * from sales where x = 1"))
+        # the key has to be qualified when other tables are read, an unqualified one can be a column of them
+        self.assertIsNone(self.select("select * from sales join other on sales.id = other.id where date = '2026-10-01'"))
+        self.assertIsNone(self.select("select * from other where date = '2026-10-01'"))
+
+    def test_keys_used_elsewhere(self):
+        # the engine table has no partition columns, the conditions on them can only be taken out
+        for sql in ["select date from sales where date = '2026-10-01'",
+                    "select region, count(*) from sales group by region",
+                    "select * from sales where date = '2026-10-01' and date is null",
+                    "select * from sales s join other o on o.region = s.region where s.date = '2026-10-01'",
+                    "select * from sales where date = '2026-10-01' or region = 'eu'",
+                    "select * from sales where not date = '2026-10-01'",
+                    "select * from sales where date = '2026-10-01' union all select * from sales",
+                    "select * from (select * from sales) where date = '2026-10-01'",
+                    # a number is not a date
+                    "select * from sales where date = 20261001",
+                    # outer joins keep the rows the condition does not match
+                    "select * from other o left join sales s on s.id = o.id where s.date = '2026-10-01'",
+                    "select * from sales s full outer join other o on s.id = o.id where s.date = '2026-10-01'"]:
+            with self.assertRaisesRegex(Exception, 'Partition column (date|region) of table sales'):
+                self.select(sql)
+        # names of other tables, aliases and literals are not partition columns
+        self.assertEqual(self.select("select x as region, o.date from sales join other o on sales.id = o.id "
+                                     "where sales.date = '2026-10-01' and o.y > DATE '2026-01-01'"), [0, 1])
+
+    def test_join(self):
+        sql = "select * from other o join sales s on s.id = o.id where s.date = '2026-10-03' and o.date = '2026-10-01'"
+        self.assertEqual(self.select(sql), [3, 4])
+
+    def test_partial_conjunction(self):
+        sql = "select * from sales where (x = 1 or x = 2) and region = 'us'"
+        self.assertEqual(self.select(sql), [1])
+
+    def test_numbers(self):
+        partitions = discover_partitions(['/t/year=2025/p', '/t/year=2026/p', '/t/year=2027/p'])
+        pruned = column_filters("select * from t where year > 2025 and year <> '2027'", 't', partitions)
+        self.assertEqual(partitions.select(pruned.filters), ['/t/year=2026/p'])
+
+    def test_rewrite(self):
+        sql = "select count(*) from main.sales where date = '2026-10-01' and x > 3"
+        pruned = column_filters(sql, 'sales', self.partitions)
+        self.assertEqual(rewrite(sql, 'sales', pruned.reference, 'sales__part_1', {pruned.spans[0]: '1 = 1'}),
+                         "select count(*) from main.sales__part_1 AS sales where 1 = 1 and x > 3")
+        self.assertEqual(rewrite(sql, 'sales', pruned.reference, 'sales', {pruned.spans[0]: '1 = 0'}),
+                         "select count(*) from main.sales where 1 = 0 and x > 3")
+
+        sql = "select s.x from sales s where s.region = 'us'"
+        pruned = column_filters(sql, 'sales', self.partitions)
+        self.assertEqual(rewrite(sql, 'sales', pruned.reference, 'sales__part_1', {}), "select s.x from sales__part_1 s where s.region = 'us'")
+
+
+class FakeDataSource:
+
+    def __init__(self, partitions, statistics=None):
+        self.partitions = partitions
+        self.statistics = statistics
+        self.registered = []
+
+    def pruned_table(self, files):
+        self.registered.append(files)
+        return pruned_table_name('sales', files)
+
+
+class TestPrune(unittest.TestCase):
+
+    def setUp(self):
+        self.sql = SQL()
+        self.datasource = FakeDataSource(discover_partitions(FILES))
+        self.sql.create_table('sales', self.datasource)
+
+    def test_prune(self):
+        timing = QueryTiming()
+        sql = self.sql._prune_files("select * from sales where date = '2026-10-02'", timing)
+
+        self.assertEqual(self.datasource.registered, [[FILES[2]]])
+        self.assertEqual(sql, "select * from %s AS sales where 1 = 1" % pruned_table_name('sales', [FILES[2]]))
+        self.assertEqual([span.name for span in timing.spans], ['prune'])
+
+    def test_no_match(self):
+        sql = self.sql._prune_files("select * from sales where date = '2025-01-01'", QueryTiming())
+
+        self.assertEqual(self.datasource.registered, [[FILES[0]]])
+        self.assertTrue(sql.endswith('where 1 = 0'))
+
+    def test_every_file_matches(self):
+        sql = self.sql._prune_files("select * from sales where date > '2026-01-01' and x = x", QueryTiming())
+
+        self.assertEqual(self.datasource.registered, [])
+        self.assertEqual(sql, "select * from sales where 1 = 1 and x = x")
+
+
+class TestPrunedTables(unittest.TestCase):
+
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_registered_once(self, create_table):
+        source = datasource.from_parquet(None, 'sales', FILES, partitions=discover_partitions(FILES))
+        name = source.pruned_table(FILES[:2])
+
+        self.assertEqual(name, pruned_table_name('sales', FILES[:2]))
+        self.assertEqual(source.pruned_table(FILES[:2]), name)
+        self.assertEqual(create_table.call_count, 2)
+        self.assertEqual(create_table.call_args[0][1], name)
+        self.assertEqual(create_table.call_args[1]['path'], FILES[:2])
+        self.assertTrue(create_table.call_args[1]['raise_errors'])
+
+    @mock.patch.object(internal_api, 'drop_table', return_value=True)
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_bounded(self, create_table, drop_table):
+        source = datasource.from_parquet(None, 'sales', FILES, partitions=discover_partitions(FILES), max_pruned_tables=2)
+        for file in FILES:
+            source.pruned_table([file])
+        source.pruned_table([FILES[0]])
+
+        self.assertEqual(create_table.call_count, 1 + len(FILES) + 1)
+        # the evicted tables are dropped from the engine
+        dropped = [call[0][1] for call in drop_table.call_args_list]
+        self.assertEqual(dropped, [pruned_table_name('sales', [file]) for file in FILES[:4]])
+        self.assertEqual(len(source.pruned_tables()), 2)
+        self.assertNotIn('max_pruned_tables', create_table.call_args[1])
+
+    @mock.patch.object(internal_api, 'drop_table', return_value=True)
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_dropped_with_the_table(self, create_table, drop_table):
+        context = BlazingContext.__new__(BlazingContext)
+        context.processes = None
+        context.sqlObject = SQL()
+        source = datasource.from_parquet(None, 'sales', FILES, partitions=discover_partitions(FILES))
+        context.sqlObject.create_table('sales', source)
+        names = [source.pruned_table(FILES[:2]), source.pruned_table(FILES[2:])]
+
+        context.drop_table('sales')
+
+        self.assertEqual([call[0][1] for call in drop_table.call_args_list], names)
+        self.assertEqual(source.pruned_tables(), [])
+        self.assertNotIn('sales', context.sqlObject.tables)
+
+
+if __name__ == '__main__':
+    unittest.main()
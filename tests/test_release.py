@@ -0,0 +1,67 @@
+import threading
+import unittest
+
+from pyblazing.release import ResultReaper
+from pyblazing.timing import QueryTiming
+
+
+class TestResultReaper(unittest.TestCase):
+
+    def setUp(self):
+        self.freed = []
+        self.reaper = ResultReaper(lambda token, path, port: self.freed.append((token, path, port)))
+
+    def test_live_results(self):
+        first = self.reaper.track(1, '10.0.0.5', 8891, 100)
+        self.reaper.track(2, '10.0.0.6', 8891, 50)
+
+        live = self.reaper.live()
+        self.assertEqual(live['count'], 2)
+        self.assertEqual(live['nbytes'], 150)
+        self.assertEqual([result['node'] for result in live['results']], ['10.0.0.5:8891', '10.0.0.6:8891'])
+
+        self.reaper.release(first)
+        self.assertEqual(self.reaper.live()['count'], 1)
+
+    def test_releases_are_freed_in_order(self):
+        keys = [self.reaper.track(token, '10.0.0.%d' % (5 + token % 2), 8891, 0) for token in range(4)]
+        for key in keys:
+            self.reaper.release(key)
+
+        self.assertTrue(self.reaper.flush(5))
+        self.assertEqual(self.freed, [(token, '10.0.0.%d' % (5 + token % 2), 8891) for token in range(4)])
+        self.assertEqual(self.reaper.live()['freed'], 4)
+
+    def test_release_twice(self):
+        key = self.reaper.track(1, '10.0.0.5', 8891, 0)
+        self.reaper.release(key)
+        self.reaper.release(key)
+
+        self.reaper.flush(5)
+        self.assertEqual(len(self.freed), 1)
+
+    def test_release_does_not_wait_for_the_request(self):
+        sent = threading.Event()
+        reaper = ResultReaper(lambda token, path, port: sent.wait(5))
+        key = reaper.track(1, '10.0.0.5', 8891, 0)
+
+        reaper.release(key)
+        self.assertFalse(reaper.flush(0.05))
+        sent.set()
+        self.assertTrue(reaper.flush(5))
+
+    def test_failures_are_counted(self):
+        def free(token, path, port):
+            raise RuntimeError('engine gone')
+
+        reaper = ResultReaper(free)
+        timing = QueryTiming()
+        reaper.release(reaper.track(1, '10.0.0.5', 8891, 0), timing)
+
+        reaper.flush(5)
+        self.assertEqual(reaper.live()['failed'], 1)
+        self.assertEqual(len(timing.spans), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
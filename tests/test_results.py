@@ -0,0 +1,572 @@
+import gc
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from pyblazing import api
+from pyblazing.apiv2 import cache, sql
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.release import ResultReaper
+from pyblazing.timing import QueryTiming
+
+
+def make_token(port, calciteTime=1):
+    return SimpleNamespace(resultToken=port,
+                           calciteTime=calciteTime,
+                           nodeConnection=SimpleNamespace(path=b'127.0.0.1', port=port))
+
+
+def slow_get_result(resultToken, interpreter_path, interpreter_port, calciteTime, timing=None):
+    time.sleep(0.2)
+    if interpreter_port == 9002:
+        raise RuntimeError('node crashed')
+    return SimpleNamespace(columns=[], metadata=SimpleNamespace(time=5)), []
+
+
+class TestNodeResults(unittest.TestCase):
+
+    @mock.patch.object(api, '_private_get_result', side_effect=slow_get_result)
+    def test_nodes_are_fetched_in_parallel(self, get_result):
+        tokens = [make_token(9000 + i) for i in range(4)]
+
+        start = time.time()
+        results = api._get_node_results(tokens, start)
+
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual([result['result'] for result in results], tokens)
+
+    @mock.patch.object(api, '_private_get_result', side_effect=slow_get_result)
+    def test_node_errors_are_isolated(self, get_result):
+        tokens = [make_token(9000 + i) for i in range(4)]
+
+        results = api._get_node_results(tokens, time.time())
+
+        errors = [str(result['error_message']) for result in results]
+        self.assertEqual(errors, ['', '', 'node crashed', ''])
+        self.assertIsNone(results[2]['resultSet'])
+        self.assertIsNotNone(results[3]['resultSet'])
+
+
+class FakeFrame:
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return FakeFrame(self.rows[index])
+
+    def copy(self, deep=True):
+        return FakeFrame(list(self.rows))
+
+
+class FakeIpcHandle:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+
+    def __init__(self):
+        self._pool = SimpleNamespace(max_size=8)
+        self._results = ResultReaper(self.free_result)
+        self.freed = []
+
+    def free_result(self, result_token, interpreter_path, interpreter_port):
+        self.freed.append(result_token)
+
+
+def node_result(resultToken, interpreter_path, interpreter_port, calciteTime, timing=None):
+    # node 9000 is the slowest one, 9002 has no rows
+    time.sleep(0.2 if interpreter_port == 9000 else 0.01)
+    rows = list(range(0 if interpreter_port == 9002 else 10))
+    resultSet = SimpleNamespace(columns=FakeFrame([(interpreter_port, row) for row in rows]), metadata=SimpleNamespace(time=5))
+    return resultSet, [FakeIpcHandle()]
+
+
+@mock.patch.object(api, '_private_get_result', side_effect=node_result)
+class TestIterBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch.object(api, '_get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batches_follow_node_arrival(self, get_result):
+        tokens = [make_token(9000 + i) for i in range(3)]
+
+        batches = list(api.iter_query_batches(tokens, time.time(), max_rows=4))
+
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2, 4, 4, 2])
+        self.assertEqual(batches[-1].rows[-1], (9000, 9))
+        self.assertEqual(sorted(self.client.freed), [9000, 9001, 9002])
+
+    def test_max_bytes(self, get_result):
+        with mock.patch.object(cache, 'frame_nbytes', side_effect=lambda frame: 8 * len(frame)):
+            batches = list(api.iter_query_batches([make_token(9001)], time.time(), max_bytes=24))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+
+    def test_results_are_freed_when_stopping_early(self, get_result):
+        tokens = [make_token(9000 + i) for i in range(3)]
+
+        batches = api.iter_query_batches(tokens, time.time(), max_rows=4)
+        next(batches)
+        batches.close()
+
+        self.assertEqual(sorted(self.client.freed), [9000, 9001, 9002])
+
+    def test_invalid_limits(self, get_result):
+        with self.assertRaises(ValueError):
+            api.iter_query_batches([make_token(9001)], time.time(), max_rows=0)
+
+
+def node_metadata(resultToken, interpreter_path, interpreter_port, timing=None):
+    rows = 0 if interpreter_port == 9002 else 10 + interpreter_port - 9000
+    column = SimpleNamespace(dtype=api.gdf_dtype.GDF_INT64, size=rows, null_count=1 if interpreter_port == 9003 else 0,
+                             data=b'', valid=b'', custrings_data=None)
+    return SimpleNamespace(columns=[column], columnNames=[b'a'], columnTokens=[7], metadata=SimpleNamespace(time=5))
+
+
+class FakeConcatColumn:
+
+    def __init__(self, np_dtype, size, nullable):
+        self.size = size
+        self.nullable = nullable
+        self.copies = []
+
+    def copy(self, column, offset):
+        self.copies.append((column, offset))
+
+    def build(self):
+        return self
+
+
+@mock.patch.object(api, '_private_get_result_metadata', side_effect=node_metadata)
+@mock.patch.object(api, '_ConcatColumn', FakeConcatColumn)
+@mock.patch.object(api, '_make_result_frame', side_effect=lambda names, columns: columns)
+class TestConcatResults(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch.object(api, '_get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def read(c, np_dtype):
+            # the nodes freed when the column is opened
+            return (c.size, list(self.client.freed)), (), 0
+
+        readers = {api.gdf_dtype.GDF_INT64: (read, 'int64')}
+        patcher = mock.patch.object(api, '_get_column_readers', return_value=readers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nodes_are_copied_and_freed_one_by_one(self, make_frame, get_metadata):
+        tokens = [make_token(9000 + i) for i in range(4)]
+        entries = api._get_node_results(tokens, time.time(), open_columns=False)
+
+        column, = api._concat_node_results(entries, self.client, QueryTiming())
+
+        self.assertEqual(column.size, 10 + 11 + 13)
+        self.assertTrue(column.nullable)
+        self.assertEqual(column.copies, [((10, []), 0), ((11, [9000]), 10), ((13, [9000, 9001, 9002]), 21)])
+        self.assertEqual(self.client.freed, [9000, 9001, 9002, 9003])
+
+    def test_single_node_result_is_copied_and_freed(self, make_frame, get_metadata):
+        column = SimpleNamespace(dtype='int64', copy=lambda deep: 'copy')
+        frame = mock.MagicMock(_cols={'a': column}, columns=SimpleNamespace(size=1))
+        frame.__getitem__.side_effect = lambda name: frame._cols[name]
+        frame.__setitem__.side_effect = lambda name, value: frame._cols.__setitem__(name, value)
+        tokens = [make_token(9002), make_token(9000)]
+
+        with mock.patch.object(api, '_open_node_result', return_value=frame):
+            result = api.run_query_get_concat_results(tokens, time.time())
+
+        self.assertEqual(result.columns._cols, {'a': 'copy'})
+        self.assertEqual(self.client.freed, [9002, 9000])
+
+    def test_results_are_freed_when_a_copy_fails(self, make_frame, get_metadata):
+        tokens = [make_token(9000 + i) for i in range(3)]
+        entries = api._get_node_results(tokens, time.time(), open_columns=False)
+
+        with mock.patch.object(FakeConcatColumn, 'copy', side_effect=RuntimeError('out of memory')):
+            with self.assertRaises(RuntimeError):
+                api._concat_node_results(entries, self.client, QueryTiming())
+        self.assertEqual(self.client.freed, [9000, 9001, 9002])
+
+
+def wide_result_set():
+    columns = [SimpleNamespace(dtype=api.gdf_dtype.GDF_INT64, size=10, null_count=0, data=name, valid=b'', custrings_data=None)
+               for name in 'abc']
+    return SimpleNamespace(columns=columns, columnNames=[b'a', b'b', b'c'], columnTokens=[1, 2, 3])
+
+
+class TestSelectedResults(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch.object(api, '_get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_select_columns(self):
+        resultSet = wide_result_set()
+        api._select_result_columns(resultSet, ['c', 'a'], None)
+
+        self.assertEqual([c.data for c in resultSet.columns], ['c', 'a'])
+        self.assertEqual(resultSet.columnNames, [b'c', b'a'])
+        self.assertEqual(resultSet.columnTokens, [3, 1])
+
+    def test_limit_drops_the_column_tokens(self):
+        resultSet = wide_result_set()
+        api._select_result_columns(resultSet, None, 4)
+
+        self.assertEqual([c.size for c in resultSet.columns], [4, 4, 4])
+        self.assertEqual(resultSet.columnTokens, [0, 0, 0])
+
+    def test_limit_recounts_the_nulls(self):
+        resultSet = wide_result_set()
+        resultSet.columns[0].null_count = 2
+        api._select_result_columns(resultSet, None, 4)
+
+        self.assertEqual([c.null_count for c in resultSet.columns], [None, 0, 0])
+        # rows 6 and 7 of 10 are null, a limit of 4 cuts them off
+        mask = api.np.array([0x3f, 0x03], dtype=api.np.int8)
+        self.assertEqual(api._mask_null_count(mask, 4), 0)
+        self.assertEqual(api._mask_null_count(mask, 10), 2)
+
+    @mock.patch.object(api, '_private_get_result_metadata', side_effect=node_metadata)
+    @mock.patch.object(api, '_make_result_set_handles', side_effect=lambda result_list, *args: result_list)
+    def test_limit_is_counted_over_the_nodes(self, make_handles, get_metadata):
+        opened = []
+        tokens = [make_token(9000 + i) for i in range(4)]
+        with mock.patch.object(api, '_open_node_result', side_effect=lambda entry, timing: opened.append(entry['resultSet'].columns[0].size)):
+            api.run_query_get_results(tokens, time.time(), columns=['a'], limit=15)
+
+        self.assertEqual(opened, [10, 5, 0, 0])
+
+    @mock.patch.object(api, '_private_get_result_metadata', side_effect=node_metadata)
+    def test_unknown_columns_free_the_results(self, get_metadata):
+        tokens = [make_token(9000 + i) for i in range(2)]
+        with self.assertRaises(ValueError):
+            api.run_query_get_results(tokens, time.time(), columns=['nope'])
+        self.assertEqual(sorted(self.client.freed), [9000, 9001])
+
+
+class FakeDeviceArray:
+
+    def __init__(self, owner=None):
+        self.owner = owner
+
+    # a view references the owner of the memory, like numba device arrays
+    def __getitem__(self, index):
+        return FakeDeviceArray(self.owner)
+
+
+class FakeColumn(SimpleNamespace):
+
+    def __len__(self):
+        return 2
+
+
+class FakeColumnFrame:
+
+    def __init__(self, n_columns):
+        self._cols = {}
+        for i in range(n_columns):
+            column = FakeColumn(dtype='int64', _data=SimpleNamespace(mem=FakeDeviceArray()), has_null_mask=i == 0,
+                                _mask=SimpleNamespace(mem=FakeDeviceArray()))
+            self._cols['column_%d' % i] = SimpleNamespace(_column=column)
+
+
+class TestTransferOwnership(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient()
+        self.ipch = FakeIpcHandle()
+        self.entry = {'result': make_token(9000), 'resultSet': None, 'ipchandles': [self.ipch], 'error_message': ''}
+        # not a Mock, it would keep the frame alive through its call arguments
+        patcher = mock.patch.object(cache, 'frame_nbytes', lambda gdf: 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(api, '_owned_array', lambda array, owner: FakeDeviceArray(owner))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_is_freed_with_the_last_buffer(self):
+        gdf = api._TransferredResult(self.entry, self.client, None).track(FakeColumnFrame(2))
+        series = gdf._cols['column_1']
+        self.assertEqual(self.client._results.live()['nbytes'], 64)
+
+        del gdf
+        gc.collect()
+        self.client._results.flush()
+        self.assertEqual(self.client.freed, [])
+
+        del series
+        gc.collect()
+        self.client._results.flush()
+        self.assertEqual(self.client.freed, [9000])
+        self.assertTrue(self.ipch.closed)
+        self.assertEqual(self.client._results.live()['count'], 0)
+
+    def test_slice_keeps_the_result(self):
+        gdf = api._TransferredResult(self.entry, self.client, None).track(FakeColumnFrame(2))
+        view = gdf._cols['column_1']._column._data.mem[1:]
+
+        del gdf
+        gc.collect()
+        self.client._results.flush()
+        self.assertEqual(self.client.freed, [])
+
+        del view
+        gc.collect()
+        self.client._results.flush()
+        self.assertEqual(self.client.freed, [9000])
+
+    def test_result_without_buffers_is_freed_at_once(self):
+        api._TransferredResult(self.entry, self.client, None).track(FakeColumnFrame(0))
+        self.client._results.flush()
+        self.assertEqual(self.client.freed, [9000])
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.fetched = threading.Event()
+        self.release = threading.Event()
+
+        def run_query_get_results(client, metaToken, startTime, timing=None):
+            self.fetched.set()
+            self.release.wait(5)
+            return 'handle'
+
+        patcher = mock.patch.object(internal_api, 'run_query_get_results', side_effect=run_query_get_results)
+        self.get_results = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_waits_for_the_prefetch(self):
+        result = sql.ResultSet(None, [make_token(9000)], time.time(), None)
+        future = result.prefetch()
+        self.assertTrue(self.fetched.wait(5))
+        self.assertFalse(future.done())
+
+        self.release.set()
+        self.assertEqual(result.get(), 'handle')
+        self.assertEqual(result.get(), 'handle')
+        self.assertIs(result.prefetch(), future)
+        self.assertEqual(self.get_results.call_count, 1)
+
+    def test_other_reads_are_rejected(self):
+        self.release.set()
+        result = sql.ResultSet(None, [make_token(9000)], time.time(), None)
+        result.prefetch().result()
+
+        with self.assertRaises(ValueError):
+            result.get_all()
+        with self.assertRaises(ValueError):
+            result.iter_batches(max_rows=10)
+
+    def test_dask_is_rejected(self):
+        with self.assertRaises(ValueError):
+            sql.ResultSet(None, [make_token(9000)], time.time(), object()).prefetch()
+
+
+class SharedFrame:
+    # a shallow copy shares the rows, like the buffers of a DataFrame
+    columns = SimpleNamespace(size=0)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def copy(self, deep=True):
+        return SharedFrame(list(self.rows) if deep else self.rows)
+
+
+class TestCachedResult(unittest.TestCase):
+
+    def test_hits_are_copies(self):
+        result_cache = cache.ResultCache(100)
+        with mock.patch.object(cache, 'frame_nbytes', return_value=10):
+            entry = result_cache.put(('select * from t', ()), SharedFrame([1, 2]), 1, 2, 3, 1)
+        result_set = sql.ResultSet(None, None, 0, None, result_cache, cached=entry)
+
+        result_set.get().columns.rows[0] = 7
+        self.assertEqual(result_set.get().columns.rows, [1, 2])
+        self.assertEqual(entry.columns.rows, [1, 2])
+
+
+class TestResultDtypes(unittest.TestCase):
+
+    def test_result_np_dtypes(self):
+        self.assertEqual(api._result_np_dtypes[api.gdf_dtype.GDF_DATE32], api.np.dtype('int32'))
+        self.assertEqual(api._result_np_dtypes[api.gdf_dtype.GDF_DATE64], api.np.dtype('datetime64[ms]'))
+        self.assertEqual(api._result_np_dtypes[api.gdf_dtype.GDF_STRING], api.np.dtype('object'))
+
+    def test_gdf_to_np_dtype(self):
+        self.assertEqual(api.gdf_to_np_dtype(api.gdf_dtype.GDF_INT64), api.np.dtype('int64'))
+        self.assertEqual(api.gdf_to_np_dtype(api.gdf_dtype.GDF_BOOL8), api.np.dtype('bool'))
+        with self.assertRaises(KeyError):
+            api.gdf_to_np_dtype(api.gdf_dtype.GDF_DATE32)
+
+
+class RecordingPool:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, host, port, requestBuffer):
+        self.sent.append((host, port))
+        return b''
+
+
+class TestAsyncConnector(unittest.TestCase):
+
+    @mock.patch.object(api, '_parse_dml_query_response', return_value=[])
+    @mock.patch.object(api, '_make_dml_query_request', side_effect=lambda token, query, tableGroup: token)
+    def test_session_follows_the_connector(self, make_request, parse_response):
+        import asyncio
+
+        connector = SimpleNamespace(_orchestrator_path='127.0.0.1', _orchestrator_port=8889, _accessToken=1, _count_engines=mock.Mock())
+        pool = RecordingPool()
+        client = api.AsyncPyConnector(connector, pool)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(client.run_dml_query_token('select 1', {}))
+            # PyConnector reconnected to another orchestrator and got a new token
+            connector._orchestrator_path, connector._accessToken = '10.0.0.2', 2
+            loop.run_until_complete(client.run_dml_query_token('select 1', {}))
+        finally:
+            loop.close()
+
+        self.assertEqual([call[0][0] for call in make_request.call_args_list], [1, 2])
+        self.assertEqual(pool.sent, [('127.0.0.1', 8889), ('10.0.0.2', 8889)])
+
+
+class SyncRecordingPool:
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, host, port, requestBuffer):
+        self.sent.append((host, port))
+        return b''
+
+    def close_all(self):
+        pass
+
+
+class TestPickledConnector(unittest.TestCase):
+
+    def test_copy_for_the_workers(self):
+        import pickle
+
+        client = api.PyConnector.__new__(api.PyConnector)
+        client.__init__()
+        client._accessToken = 7
+        client._algebra_path = '10.0.0.2'
+        with mock.patch.object(client, 'free_result'):
+            # the reaper thread is running
+            client._results.release(client._results.track(1, '10.0.0.2', 8891, 0))
+            client._results.flush(1)
+        buffer = FakeDeviceArray()
+        client._column_tokens.register(buffer, 3)
+
+        copy = pickle.loads(pickle.dumps(client))
+
+        self.assertEqual((copy._accessToken, copy._algebra_path), (7, '10.0.0.2'))
+        self.assertIsNot(copy._pool, client._pool)
+        self.assertEqual(copy._pool.stats()['open'], 0)
+        self.assertEqual(len(copy._column_tokens), 0)
+        self.assertEqual(copy.live_results()['count'], 0)
+
+        # the copy does not close the session of the client
+        copy._pool = SyncRecordingPool()
+        copy.__del__()
+        self.assertEqual(copy._pool.sent, [])
+        client._accessToken = None
+
+
+class TestPlannedQuery(unittest.TestCase):
+
+    def setUp(self):
+        engine = SimpleNamespace(path=b'10.0.0.3', port=8891)
+        self.nodes = [api.DMLResult(4, engine, 1)]
+        patcher = mock.patch.object(api, '_parse_dml_query_response', side_effect=lambda responseBuffer: list(self.nodes))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_queries(self, client, sql, count):
+        plan_cache = cache.PlanCache(4)
+        tables = {'nation': {'type': api.SchemaFrom.ParquetFile, 'path': ['/data/nation.parquet'],
+                             'names': ['id'], 'dtypes': api.get_dtype_values(['int32'])}}
+        with mock.patch.object(api, '_get_client', return_value=client):
+            return [api.run_query_get_planned_token(sql, plan_cache, 0, tables) for i in range(count)]
+
+    def connect(self):
+        client = api.PyConnector.__new__(api.PyConnector)
+        client.__init__()
+        client._pool = SyncRecordingPool()
+        client.connect('10.0.0.2', 8889)
+        client.run_dml_plan = mock.Mock(return_value=('plan', 1))
+        return client
+
+    @mock.patch('blazingdb.protocol.interpreter.ExecutePlanResponseSchema.From', return_value=SimpleNamespace(resultToken=5, nodeConnection=None))
+    @mock.patch('blazingdb.protocol.io.BuildFileSystemDMLRequestSchema')
+    @mock.patch('blazingdb.protocol.orchestrator.AuthResponseSchema.From', return_value=SimpleNamespace(accessToken=7))
+    @mock.patch('blazingdb.protocol.transport.channel.ResponseSchema.From', return_value=SimpleNamespace(status=None, payload=b''))
+    @mock.patch('blazingdb.protocol.transport.channel.MakeRequestBuffer', return_value=b'')
+    @mock.patch('blazingdb.protocol.transport.channel.MakeAuthRequestBuffer', return_value=b'')
+    def test_single_engine(self, make_auth, make_request, response, auth_response, build_request, execute_response):
+        client = self.connect()
+
+        tokens = self.run_queries(client, 'select id from nation', 3)
+
+        # the first run goes through the orchestrator, which answers with the only engine
+        self.assertEqual([token[0].resultToken for token in tokens], [4, 5, 5])
+        self.assertEqual(client.run_dml_plan.call_count, 1)
+        self.assertEqual(client._pool.sent, [('10.0.0.2', 8889), ('10.0.0.2', 8889), ('10.0.0.3', 8891), ('10.0.0.3', 8891)])
+        tableGroup = build_request.call_args[0][1]
+        self.assertEqual(tableGroup['name'], 'main')
+        self.assertEqual([table['name'] for table in tableGroup['tables']], ['nation'])
+        table = tableGroup['tables'][0]
+        self.assertEqual((table['files'], table['columnNames'], table['schemaType']),
+                         (['/data/nation.parquet'], ['id'], api.SchemaFrom.ParquetFile))
+
+    @mock.patch('blazingdb.protocol.orchestrator.AuthResponseSchema.From', return_value=SimpleNamespace(accessToken=7))
+    @mock.patch('blazingdb.protocol.transport.channel.ResponseSchema.From', return_value=SimpleNamespace(status=None, payload=b''))
+    @mock.patch('blazingdb.protocol.transport.channel.MakeRequestBuffer', return_value=b'')
+    @mock.patch('blazingdb.protocol.transport.channel.MakeAuthRequestBuffer', return_value=b'')
+    def test_several_engines(self, make_auth, make_request, response, auth_response):
+        self.nodes.append(api.DMLResult(6, SimpleNamespace(path=b'10.0.0.4', port=8891), 1))
+        client = self.connect()
+
+        tokens = self.run_queries(client, 'select id from nation', 2)
+
+        self.assertEqual([len(token) for token in tokens], [2, 2])
+        client.run_dml_plan.assert_not_called()
+        self.assertEqual(client._pool.sent, [('10.0.0.2', 8889)] * 3)
+
+
+class TestTableArgs(unittest.TestCase):
+
+    def test_tables_of_the_query(self):
+        catalog = sql.SQL()
+        for name in ['nation', 'region', 'orders']:
+            catalog.create_table(name, SimpleNamespace(table_args={'path': [name]}, pruned_tables=lambda: []))
+
+        self.assertEqual(list(catalog.table_args().keys()), ['nation', 'region', 'orders'])
+        self.assertEqual(list(catalog.table_args('select * from nation n join "REGION" r on n.r = r.r').keys()), ['nation', 'region'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pyblazing.apiv2 import datasource
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.apiv2.listing import LocalLister
+from pyblazing.apiv2.schemas import SchemaIndex, read_schema
+
+from tests.test_statistics import CountingLister
+
+
+class TestReadSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def test_parquet(self):
+        path = os.path.join(self.root, 'a.parquet')
+        pq.write_table(pa.table({'id': pa.array([1], pa.int32()), 'name': ['x'], 'day': [datetime.date(2026, 10, 1)],
+                                 'score': [1.5], 'ok': [True]}), path)
+
+        self.assertEqual(read_schema(path, 'parquet'), {'names': ['id', 'name', 'day', 'score', 'ok'],
+                                                        'types': ['int32', 'str', 'date32', 'float64', 'bool']})
+
+    def test_unsupported_types(self):
+        path = os.path.join(self.root, 'a.parquet')
+        pq.write_table(pa.table({'id': pa.array([1], pa.uint32()), 'tags': [['a']]}), path)
+
+        self.assertEqual(read_schema(path, 'parquet')['types'], [None, None])
+
+    def test_csv(self):
+        path = self.write('a.csv', 'id,name,score\n1,a,1.5\n2,b,2\n')
+        options = {'delimiter': ',', 'quotechar': '"', 'skiprows': 0, 'header': 0, 'names': []}
+
+        self.assertEqual(read_schema(path, 'csv', options), {'names': ['id', 'name', 'score'], 'types': ['int64', 'str', 'float64']})
+
+        options.update(names=['a', 'b', 'c'])
+        self.assertEqual(read_schema(path, 'csv', options)['names'], ['a', 'b', 'c'])
+        self.assertEqual(read_schema(path, 'csv', options)['types'], ['int64', 'str', 'float64'])
+
+    def test_csv_sample(self):
+        path = self.write('a.psv', ''.join('%d|x\n' % i for i in range(1000)))
+        options = {'delimiter': '|', 'quotechar': '"', 'skiprows': 0, 'header': -1, 'names': ['id', 'name']}
+
+        # the sample ends on the last complete line
+        schema = read_schema(path, 'csv', options, sample_bytes=100)
+        self.assertEqual(schema, {'names': ['id', 'name'], 'types': ['int64', 'str']})
+
+    def test_json(self):
+        path = self.write('a.json', '{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n')
+
+        self.assertEqual(read_schema(path, 'json'), {'names': ['id', 'name'], 'types': ['int64', 'str']})
+
+
+class TestSchemaIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lister = CountingLister()
+        self.files = []
+        for i in range(2):
+            path = os.path.join(self.root, 'part-%d.parquet' % i)
+            pq.write_table(pa.table({'id': pa.array([i], pa.int64()), 'name': ['n']}), path)
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def schema(self, index, format='parquet', options=None):
+        return index.schema(self.files, format, lambda path: (self.lister, path), options)
+
+    def test_first_file(self):
+        self.assertEqual(self.schema(SchemaIndex()), (['id', 'name'], ['int64', 'str']))
+        self.assertEqual(self.lister.opened, 1)
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.root, 'cache')
+        self.schema(SchemaIndex(cache_dir))
+
+        index = SchemaIndex(cache_dir)
+        self.assertEqual(self.schema(index), (['id', 'name'], ['int64', 'str']))
+        self.assertEqual(self.lister.opened, 1)
+        self.assertEqual(index.cache.stats()['hits'], 1)
+
+        # a rewritten file is read again
+        pq.write_table(pa.table({'id': pa.array([7], pa.int32())}), self.files[0])
+        os.utime(self.files[0], ns=(0, 0))
+        self.assertEqual(self.schema(index), (['id'], ['int32']))
+        self.assertEqual(self.lister.opened, 2)
+        self.assertEqual(index.cache.stats()['invalidations'], 1)
+
+        index.invalidate([self.files[0]])
+        self.schema(SchemaIndex(cache_dir))
+        self.assertEqual(self.lister.opened, 3)
+
+    def test_options_are_part_of_the_key(self):
+        path = os.path.join(self.root, 'a.csv')
+        with open(path, 'w') as file:
+            file.write('1;2\n3;4\n')
+        self.files = [path]
+        index = SchemaIndex()
+        options = {'delimiter': ';', 'quotechar': '"', 'skiprows': 0, 'header': -1, 'names': ['a', 'b']}
+
+        self.assertEqual(self.schema(index, 'csv', options), (['a', 'b'], ['int64', 'int64']))
+        options['names'] = ['c', 'd']
+        self.assertEqual(self.schema(index, 'csv', options), (['c', 'd'], ['int64', 'int64']))
+        self.assertEqual(index.cache.stats()['invalidations'], 1)
+
+    def test_unreadable_file(self):
+        open(self.files[0], 'w').close()
+
+        self.assertIsNone(self.schema(SchemaIndex()))
+        self.assertIsNone(SchemaIndex().schema(['/missing.parquet'], 'parquet', lambda path: (LocalLister(), path)))
+
+
+class TestRegistration(unittest.TestCase):
+
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_names_and_dtypes_are_sent(self, create_table):
+        datasource.from_parquet(None, 't', ['/a.parquet'], schema=(['id', 'name'], ['int64', 'str']))
+
+        self.assertEqual(create_table.call_args[1]['names'], ['id', 'name'])
+        self.assertEqual(create_table.call_args[1]['dtypes'], internal_api.get_dtype_values(['int64', 'str']))
+
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_csv_args(self, create_table):
+        csv_args = mock.Mock(column_names=[], column_types=[])
+        datasource.from_csv(None, 't', ['/a.csv'], csv_args, schema=(['id'], ['int64']))
+
+        sent = create_table.call_args[1]['csv_args']
+        self.assertEqual((sent.column_names, sent.column_types), (['id'], ['int64']))
+        # the args of the caller are not changed
+        self.assertEqual(csv_args.column_names, [])
+
+    @mock.patch.object(internal_api, 'create_table', return_value=True)
+    def test_without_schema(self, create_table):
+        datasource.from_parquet(None, 't', ['/a.parquet'])
+
+        self.assertNotIn('names', create_table.call_args[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import unittest
+
+from pyblazing.apiv2.context import isServiceReady, waitForServices
+
+
+class TestWaitForServices(unittest.TestCase):
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_ready(self):
+        ready_times = waitForServices({'orchestrator': (self.port, None)}, timeout=1)
+        self.assertEqual(list(ready_times.keys()), ['orchestrator'])
+
+    def test_timeout(self):
+        self.server.close()
+        with self.assertRaises(RuntimeError):
+            waitForServices({'orchestrator': (self.port, None)}, timeout=0.2)
+
+    def test_process_exited(self):
+        self.server.close()
+        process = subprocess.Popen([sys.executable, '-c', 'exit(3)'])
+        process.wait()
+        with self.assertRaisesRegex(RuntimeError, 'exited with code 3'):
+            waitForServices({'engine': (self.port, process)}, timeout=5)
+
+
+class FramedServer:
+    """Accepts connections and, once answering, replies to each framed request with an empty frame."""
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+        self.answering = False
+        self.requests = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            with connection:
+                try:
+                    (length,) = struct.unpack('<I', connection.recv(4, socket.MSG_WAITALL))
+                    self.requests.append(connection.recv(length, socket.MSG_WAITALL))
+                    if self.answering:
+                        connection.sendall(struct.pack('<I', 0))
+                    else:
+                        # still starting: the request is never answered
+                        connection.recv(1)
+                except (OSError, struct.error):
+                    pass
+
+    def close(self):
+        self.server.close()
+
+
+class TestServiceProbe(unittest.TestCase):
+
+    def setUp(self):
+        self.service = FramedServer()
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_answered(self):
+        self.service.answering = True
+        self.assertTrue(isServiceReady(self.service.port, request=b'probe', timeout=1))
+        self.assertEqual(self.service.requests, [b'probe'])
+
+    def test_accepted_but_not_answered(self):
+        self.assertTrue(isServiceReady(self.service.port, timeout=0.2))
+        self.assertFalse(isServiceReady(self.service.port, request=b'probe', timeout=0.2))
+
+    def test_closed(self):
+        self.service.close()
+        self.assertFalse(isServiceReady(self.service.port, request=b'probe', timeout=0.2))
+
+    def test_wait_for_an_answer(self):
+        timer = threading.Timer(0.3, setattr, (self.service, 'answering', True))
+        timer.start()
+        ready_times = waitForServices({'engine': (self.service.port, None)}, timeout=5,
+                                      requests={'engine': b'probe'})
+        timer.join()
+        self.assertGreaterEqual(ready_times['engine'], 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pyblazing.apiv2.diskcache import DiskCache
+from pyblazing.apiv2.listing import LocalLister
+from pyblazing.apiv2.partitions import column_filters, discover_partitions
+from pyblazing.apiv2.sql import SQL
+from pyblazing.apiv2.statistics import StatisticsIndex, read_statistics
+from pyblazing.timing import QueryTiming
+
+
+class CountingLister(LocalLister):
+
+    def __init__(self):
+        super().__init__()
+        self.opened = 0
+
+    def open(self, path):
+        self.opened = self.opened + 1
+        return super().open(path)
+
+
+class TestStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.lister = CountingLister()
+        self.files = []
+        # file i has ids 100 * i .. 100 * i + 99, in two row groups of 50
+        for i in range(4):
+            table = pa.table({'id': pa.array(range(100 * i, 100 * i + 100), pa.int64()),
+                              'name': ['n%03d' % (100 * i + j) for j in range(100)],
+                              'day': [datetime.date(2026, 10, 1 + i)] * 100,
+                              'score': pa.array([None] * 100 if i == 3 else [float(j) for j in range(100)], pa.float64())})
+            path = os.path.join(self.root, 'part-%d.parquet' % i)
+            pq.write_table(table, path, row_group_size=50)
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def build(self, index=None):
+        if index is None:
+            index = StatisticsIndex()
+        return index.build(self.files, lambda path: (self.lister, path))
+
+    def select(self, sql, statistics=None):
+        if statistics is None:
+            statistics = self.build()
+        pruned = column_filters(sql, 't', statistics)
+        if pruned is None:
+            return None
+        return [self.files.index(file) for file in statistics.select(pruned.filters)]
+
+    def test_read_statistics(self):
+        statistics = read_statistics(self.files[1])
+
+        self.assertEqual(statistics['num_rows'], 100)
+        self.assertEqual(dict(statistics['types']), {'id': 'int64', 'name': 'string', 'day': 'date', 'score': 'float64'})
+        self.assertEqual([row_group['columns']['id'][:2] for row_group in statistics['row_groups']], [[100, 149], [150, 199]])
+        self.assertEqual(statistics['row_groups'][0]['columns']['day'], ['2026-10-02', '2026-10-02', 0])
+
+    def test_select(self):
+        self.assertEqual(self.select("select * from t where id = 250"), [2])
+        self.assertEqual(self.select("select * from t where id between 150 and 210 and name > 'n000'"), [1, 2])
+        self.assertEqual(self.select("select * from t where day >= DATE '2026-10-03'"), [2, 3])
+        self.assertEqual(self.select("select * from t where name in ('n001', 'n399')"), [0, 3])
+        # every score of the last file is null
+        self.assertEqual(self.select("select * from t where score > 10"), [0, 1, 2])
+        self.assertEqual(self.select("select * from t where id = 1000"), [])
+        self.assertIsNone(self.select("select * from t where id = 1 or id = 2"))
+
+    def test_row_groups(self):
+        statistics = self.build()
+        pruned = column_filters("select * from t where id >= 140 and id < 160", 't', statistics)
+        self.assertEqual(dict(statistics.row_groups(pruned.filters)), {self.files[1]: [0, 1]})
+        pruned = column_filters("select * from t where id > 360", 't', statistics)
+        self.assertEqual(dict(statistics.row_groups(pruned.filters)), {self.files[3]: [1]})
+
+    def test_unreadable_file_is_kept(self):
+        open(os.path.join(self.root, 'broken.parquet'), 'w').close()
+        self.files.append(os.path.join(self.root, 'broken.parquet'))
+
+        self.assertEqual(self.select("select * from t where id = 250"), [2, 4])
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.root, 'cache')
+        self.build(StatisticsIndex(cache_dir))
+        self.assertEqual(self.lister.opened, 4)
+
+        index = StatisticsIndex(cache_dir)
+        self.build(index)
+        self.assertEqual(self.lister.opened, 4)
+        self.assertEqual(index.cache.stats()['hits'], 4)
+
+        # a rewritten file is read again
+        pq.write_table(pa.table({'id': pa.array([7], pa.int64())}), self.files[0])
+        os.utime(self.files[0], ns=(0, 0))
+        statistics = self.build(index)
+        self.assertEqual(self.lister.opened, 5)
+        self.assertEqual(index.cache.stats()['invalidations'], 1)
+        self.assertEqual(self.select("select * from t where id = 7", statistics), [0])
+
+    def test_prune(self):
+        sql = SQL()
+        datasource = FakeDataSource(None, self.build())
+        sql.create_table('t', datasource)
+
+        rewritten = sql._prune_files("select * from t where id = 250", QueryTiming())
+
+        self.assertEqual(datasource.registered, [[self.files[2]]])
+        # the condition stays, the files have the column
+        self.assertEqual(rewritten, "select * from pruned AS t where id = 250")
+        self.assertTrue(sql._prune_files("select * from t where id = 1000", QueryTiming()).endswith('where 1 = 0'))
+
+    def test_prune_with_partitions(self):
+        files = ['/d/day=%d/part.parquet' % i for i in range(4)]
+        statistics = self.build()
+        statistics.files = files
+        sql = SQL()
+        datasource = FakeDataSource(discover_partitions(files), statistics)
+        sql.create_table('t', datasource)
+
+        rewritten = sql._prune_files("select * from t where day <> 1 and id < 250", QueryTiming())
+
+        self.assertEqual(datasource.registered, [[files[0], files[2]]])
+        self.assertEqual(rewritten, "select * from pruned AS t where 1 = 1 and id < 250")
+
+
+class FakeDataSource:
+
+    def __init__(self, partitions, statistics):
+        self.partitions = partitions
+        self.statistics = statistics
+        self.registered = []
+
+    def pruned_table(self, files):
+        self.registered.append(files)
+        return 'pruned'
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_signature(self):
+        cache = DiskCache(self.root, 'test')
+        cache.put('/a', (1, 2), {'x': 1})
+
+        self.assertEqual(DiskCache(self.root, 'test').get('/a', (1, 2)), {'x': 1})
+        self.assertIsNone(DiskCache(self.root, 'test').get('/a', (1, 3)))
+        self.assertIsNone(DiskCache(self.root, 'other').get('/a', (1, 2)))
+
+    def test_invalidate(self):
+        cache = DiskCache(self.root, 'test')
+        cache.put('/a', (1,), 1)
+        cache.put('/b', (1,), 2)
+        cache.invalidate(['/a'])
+        self.assertIsNone(DiskCache(self.root, 'test').get('/a', (1,)))
+        self.assertEqual(DiskCache(self.root, 'test').get('/b', (1,)), 2)
+
+        cache.invalidate()
+        self.assertIsNone(cache.get('/b', (1,)))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'test')), [])
+
+    def test_memory_only(self):
+        cache = DiskCache(None, 'test')
+        cache.put('/a', (1,), 1)
+        self.assertEqual(cache.get('/a', (1,)), 1)
+        self.assertEqual(cache.stats()['directory'], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import time
+import unittest
+from unittest import mock
+
+from pyblazing.apiv2.bridge import internal_api
+from pyblazing.apiv2.sql import SQL
+from pyblazing.timing import QueryTiming, PHASES
+
+
+class TestQueryTiming(unittest.TestCase):
+
+    def setUp(self):
+        self.spans = []
+        self.hook = lambda query, span: self.spans.append((query, span))
+
+    def test_phases_add_up_per_node(self):
+        query = QueryTiming('select 1', hooks=[self.hook])
+        query.record('fetch', 10, 10.25, node='a')
+        query.record('fetch', 10, 10.5, node='b')
+        with query.phase('concat'):
+            time.sleep(0.01)
+
+        phases = query.phases()
+        self.assertEqual(list(phases.keys()), list(PHASES))
+        self.assertAlmostEqual(phases['fetch'], 750)
+        self.assertGreaterEqual(phases['concat'], 10)
+        self.assertEqual(phases['plan'], 0)
+
+    def test_hooks_see_every_phase(self):
+        query = QueryTiming('select 1', hooks=[self.hook])
+        query.record('plan', 1, 2)
+        with query.phase('free', node='127.0.0.1:8891'):
+            pass
+
+        self.assertEqual([span.name for q, span in self.spans], ['plan', 'free'])
+        self.assertIs(self.spans[0][0], query)
+        self.assertEqual(self.spans[1][1].attributes, {'node': '127.0.0.1:8891'})
+
+    def test_failing_hook_is_ignored(self):
+        def failing_hook(query, span):
+            raise RuntimeError('hook error')
+
+        QueryTiming(hooks=[failing_hook, self.hook]).record('dispatch', 1, 2)
+        self.assertEqual(len(self.spans), 1)
+
+    @mock.patch.object(internal_api, 'run_query_get_token', side_effect=lambda client, sql, timing: timing.record('dispatch', 1, 2))
+    def test_hooks_of_each_catalog(self, run_query_get_token):
+        sql, other = SQL(), SQL()
+        sql.timing_hooks.append(self.hook)
+
+        sql.run_query(None, 'select 1', None)
+        other.run_query(None, 'select 2', None)
+
+        self.assertEqual([(query.sql, span.name) for query, span in self.spans], [('select 1', 'dispatch')])
+
+    def test_unknown_phase(self):
+        with self.assertRaises(ValueError):
+            QueryTiming().record('parse', 1, 2)
+
+    def test_total(self):
+        query = QueryTiming(start=time.time() - 1)
+        total = query.finish()
+        self.assertGreaterEqual(total, 1000)
+        self.assertEqual(query.total(), total)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import gc
+import threading
+import unittest
+
+from pyblazing.tokens import ColumnTokenRegistry, DATA, VALID
+
+
+class FakeBuffer:
+    pass
+
+
+class TestColumnTokenRegistry(unittest.TestCase):
+
+    def test_lookup(self):
+        registry = ColumnTokenRegistry()
+        data = FakeBuffer()
+        mask = FakeBuffer()
+        registry.register(data, 11, DATA)
+        registry.register(mask, 11, VALID)
+
+        self.assertEqual(registry.lookup(data), 11)
+        self.assertEqual(registry.lookup(mask, VALID), 11)
+        self.assertIsNone(registry.lookup(mask, DATA))
+        self.assertIsNone(registry.lookup(FakeBuffer()))
+        self.assertEqual(registry.stats(), {'size': 2, 'data': 1, 'valid': 1})
+
+    def test_entries_go_away_with_their_buffer(self):
+        registry = ColumnTokenRegistry()
+        data = FakeBuffer()
+        registry.register(data, 11)
+
+        del data
+        gc.collect()
+        self.assertEqual(len(registry), 0)
+
+    def test_reused_id_is_not_a_stale_entry(self):
+        registry = ColumnTokenRegistry()
+        data = FakeBuffer()
+        key = registry.register(data, 11)
+        other = FakeBuffer()
+        # same id() as a buffer that was collected but whose entry is still there
+        registry._entries[(DATA, id(other))] = registry._entries.pop(key)
+
+        self.assertIsNone(registry.lookup(other))
+
+    def test_discard(self):
+        registry = ColumnTokenRegistry()
+        data = FakeBuffer()
+        key = registry.register(data, 11)
+        registry.discard(key)
+
+        self.assertIsNone(registry.lookup(data))
+        del data
+        gc.collect()
+        self.assertEqual(len(registry), 0)
+
+    def test_concurrent_registration(self):
+        registry = ColumnTokenRegistry()
+        buffers = [FakeBuffer() for i in range(800)]
+
+        def register(start):
+            for i in range(start, len(buffers), 8):
+                registry.register(buffers[i], i)
+
+        threads = [threading.Thread(target=register, args=(start,)) for start in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(registry), 800)
+        self.assertEqual([registry.lookup(buffer) for buffer in buffers], list(range(800)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+import asyncio
+import importlib.util
+import socket
+import threading
+import time
+import unittest
+
+from pyblazing.transport import ConnectionPool, AsyncConnectionPool, SocketConnection, read_frame, write_frame
+from pyblazing.transport import resolve_endpoint
+
+
+class EchoClient:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def send(self, buffer):
+        self.connection.socket_.sendall(buffer)
+        return self.connection.socket_.recv(1024)
+
+
+class EchoConnection(SocketConnection):
+
+    def __init__(self):
+        sock, self.peer = socket.socketpair()
+        super().__init__(sock)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        try:
+            while True:
+                data = self.peer.recv(1024)
+                if not data:
+                    break
+                self.peer.sendall(data)
+        except OSError:
+            # the client closed its end while the reply was sent
+            pass
+        self.peer.close()
+
+
+def echo_factory(connections, client=EchoClient):
+    def factory(host, port):
+        connection = EchoConnection()
+        connections.append(connection)
+        return connection, client(connection)
+    return factory
+
+
+class DroppedClient(EchoClient):
+    """Answers the first request, the peer is gone for the next ones."""
+
+    write_before_failing = False
+
+    def send(self, buffer):
+        if getattr(self, 'answered', False):
+            if self.write_before_failing:
+                self.connection.socket_.sendall(buffer)
+            raise ConnectionResetError()
+        self.answered = True
+        return super().send(buffer)
+
+
+class DroppedAfterWriteClient(DroppedClient):
+
+    write_before_failing = True
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+        self.pool = ConnectionPool(max_size=2, acquire_timeout=1, connection_factory=echo_factory(self.connections))
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def test_reuses_connection(self):
+        self.assertEqual(self.pool.send('127.0.0.1', 8889, b'a'), b'a')
+        self.assertEqual(self.pool.send('127.0.0.1', 8889, b'b'), b'b')
+        stats = self.pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_keyed_by_host_and_port(self):
+        self.pool.send('127.0.0.1', 8889, b'a')
+        self.pool.send('127.0.0.1', 8891, b'a')
+        self.assertEqual(self.pool.stats()['created'], 2)
+
+    def test_closed_connection_is_replaced(self):
+        self.pool.send('127.0.0.1', 8889, b'a')
+        self.connections[0].peer.shutdown(socket.SHUT_RDWR)
+        time.sleep(0.05)
+        self.assertEqual(self.pool.send('127.0.0.1', 8889, b'b'), b'b')
+        stats = self.pool.stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['evicted'], 1)
+
+    def test_retry_before_write(self):
+        pool = ConnectionPool(connection_factory=echo_factory(self.connections, DroppedClient))
+        pool.send('127.0.0.1', 8889, b'a')
+
+        self.assertEqual(pool.send('127.0.0.1', 8889, b'b'), b'b')
+        self.assertEqual(pool.stats()['created'], 2)
+        pool.close_all()
+
+    def test_no_retry_after_write(self):
+        # the service may have run the request already
+        pool = ConnectionPool(connection_factory=echo_factory(self.connections, DroppedAfterWriteClient))
+        pool.send('127.0.0.1', 8889, b'a')
+
+        with self.assertRaises(ConnectionResetError):
+            pool.send('127.0.0.1', 8889, b'create table')
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_idle_eviction(self):
+        self.pool.configure(idle_timeout=0)
+        self.pool.send('127.0.0.1', 8889, b'a')
+        time.sleep(0.01)
+        self.pool.send('127.0.0.1', 8889, b'b')
+        self.assertEqual(self.pool.stats()['created'], 2)
+
+    def test_max_size(self):
+        first = self.pool.acquire('127.0.0.1', 8889)
+        second = self.pool.acquire('127.0.0.1', 8889)
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire('127.0.0.1', 8889)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire('127.0.0.1', 8889), first)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            self.pool.configure(size=4)
+
+
+class TestResolveEndpoint(unittest.TestCase):
+
+    def test_tcp(self):
+        self.assertEqual(resolve_endpoint('127.0.0.1', 8889), ('127.0.0.1', 8889))
+        self.assertEqual(resolve_endpoint('10.0.0.2', 8891), ('10.0.0.2', 8891))
+
+    def test_ipc_node_connection(self):
+        self.assertEqual(resolve_endpoint('/tmp/ral.socket', 0), ('/tmp/ral.socket', None))
+
+    def test_pool_uses_unix_socket(self):
+        endpoints = []
+
+        def factory(host, port):
+            endpoints.append((host, port))
+            connection = EchoConnection()
+            return connection, EchoClient(connection)
+
+        pool = ConnectionPool(connection_factory=factory)
+        self.assertEqual(pool.send('/tmp/ral.socket', 0, b'a'), b'a')
+        self.assertEqual(endpoints, [('/tmp/ral.socket', None)])
+        pool.close_all()
+
+
+class FakeOrchestrator:
+
+    # drop maps a request to the bytes of its answer written before the connection is closed, once
+    def __init__(self, delay=0, close_after_response=False, drop=None):
+        self.delay = delay
+        self.close_after_response = close_after_response
+        self.drop = dict(drop or {})
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        # let the handlers see the clients disconnect
+        await asyncio.sleep(0.05)
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections = self.connections + 1
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request in self.drop:
+                    writer.write(self.drop.pop(request))
+                    await writer.drain()
+                    break
+                await asyncio.sleep(self.delay)
+                await write_frame(writer, request.upper())
+                if self.close_after_response:
+                    break
+            writer.close()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+
+class TestAsyncConnectionPool(unittest.TestCase):
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_reuses_connection(self):
+        async def scenario():
+            orchestrator = FakeOrchestrator()
+            port = await orchestrator.start()
+            pool = AsyncConnectionPool()
+            responses = [await pool.send('127.0.0.1', port, b'query') for i in range(3)]
+            await pool.close_all()
+            await orchestrator.stop()
+            return responses, pool.stats(), orchestrator.connections
+
+        responses, stats, connections = self.run_async(scenario())
+        self.assertEqual(responses, [b'QUERY'] * 3)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(connections, 1)
+
+    def test_concurrent_requests(self):
+        async def scenario():
+            orchestrator = FakeOrchestrator(delay=0.2)
+            port = await orchestrator.start()
+            pool = AsyncConnectionPool(max_size=50)
+            start = time.time()
+            responses = await asyncio.gather(*[pool.send('127.0.0.1', port, b'q%d' % i) for i in range(50)])
+            elapsed = time.time() - start
+            await pool.close_all()
+            await orchestrator.stop()
+            return responses, elapsed
+
+        responses, elapsed = self.run_async(scenario())
+        self.assertEqual(responses, [b'Q%d' % i for i in range(50)])
+        self.assertLess(elapsed, 2)
+
+    def test_closed_connection_is_replaced(self):
+        async def scenario():
+            orchestrator = FakeOrchestrator(close_after_response=True)
+            port = await orchestrator.start()
+            pool = AsyncConnectionPool()
+            first = await pool.send('127.0.0.1', port, b'a')
+            # the peer closed the connection, the event loop did not get to read its EOF
+            time.sleep(0.05)
+            second = await pool.send('127.0.0.1', port, b'b')
+            await pool.close_all()
+            await orchestrator.stop()
+            return [first, second], pool.stats()
+
+        responses, stats = self.run_async(scenario())
+        self.assertEqual(responses, [b'A', b'B'])
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['evicted'], 1)
+
+    def test_unanswered_request_is_retried(self):
+        async def scenario():
+            orchestrator = FakeOrchestrator(drop={b'b': b''})
+            port = await orchestrator.start()
+            pool = AsyncConnectionPool()
+            responses = [await pool.send('127.0.0.1', port, request) for request in (b'a', b'b')]
+            await pool.close_all()
+            await orchestrator.stop()
+            return responses, pool.stats()
+
+        responses, stats = self.run_async(scenario())
+        self.assertEqual(responses, [b'A', b'B'])
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['evicted'], 1)
+
+    def test_no_retry_after_partial_answer(self):
+        async def scenario():
+            orchestrator = FakeOrchestrator(drop={b'b': b'\x01\x00'})
+            port = await orchestrator.start()
+            pool = AsyncConnectionPool()
+            try:
+                await pool.send('127.0.0.1', port, b'a')
+                with self.assertRaises(asyncio.IncompleteReadError):
+                    await pool.send('127.0.0.1', port, b'b')
+            finally:
+                await pool.close_all()
+                await orchestrator.stop()
+            return pool.stats()
+
+        stats = self.run_async(scenario())
+        self.assertEqual(stats['created'], 1)
+
+
+@unittest.skipUnless(importlib.util.find_spec('blazingdb') is not None, 'blazingdb.protocol is not installed')
+class TestProtocolFraming(unittest.TestCase):
+    """The frames of the asyncio transport are the ones of blazingdb.protocol.Client."""
+
+    def test_protocol_client(self):
+        import blazingdb.protocol
+
+        loop = asyncio.new_event_loop()
+        orchestrator = FakeOrchestrator()
+        port = loop.run_until_complete(orchestrator.start())
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            connection = SocketConnection(socket.create_connection(('127.0.0.1', port)))
+            client = blazingdb.protocol.Client(connection)
+            # larger than a socket buffer, the length has to be honored on both sides
+            request = b'query' * 100000
+            self.assertEqual(client.send(request), request.upper())
+            self.assertEqual(client.send(b'again'), b'AGAIN')
+            connection.close()
+        finally:
+            asyncio.run_coroutine_threadsafe(orchestrator.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()